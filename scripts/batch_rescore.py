@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Batch re-scoring of archived Themis evaluations.
+
+Re-applies merge_scores' adjustment, weighting, clamping and tiering to an
+archive of council outputs after COMPONENT_WEIGHTS, TIER_THRESHOLDS or the
+adjustment caps change, and reports how every score moved.
+
+The archive is loaded once into columns (one array per component, sparse
+index/value arrays per adjustment source), so re-scoring is a handful of
+whole-column passes rather than one dict walk per evaluation. Columns can be
+saved to a compact binary file to skip JSON parsing on later runs.
+
+Archive records are JSON lines with the merge_council_scores inputs:
+
+    {"id": "...", "content_council": {...}, "market_council": {...},
+     "critic": {...}, "cross_council_content_response": {...},
+     "cross_council_market_response": {...}, "result": {<previous output>}}
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+from array import array
+
+from merge_scores import (
+    COMPONENT_WEIGHTS,
+    CONTENT_COMPONENTS,
+    CRITIC_TARGET_COMPONENTS,
+    MARKET_COMPONENTS,
+    MAX_CRITIC_ADJUSTMENT,
+    MAX_CROSS_COUNCIL_ADJUSTMENT,
+    TIER_THRESHOLDS,
+)
+
+
+COMPONENTS = CONTENT_COMPONENTS + MARKET_COMPONENTS
+TIERS = [tier for _, tier in TIER_THRESHOLDS]
+
+COLUMNS_MAGIC = b"THEMISC1"
+COLUMNS_VERSION = 1
+_HEADER_LEN = struct.Struct("<Q")
+
+# Adjustment sources, in the order merge_council_scores applies them
+CROSS_SOURCES = ("cross_council_content_response", "cross_council_market_response")
+ADJUSTMENT_SOURCES = CROSS_SOURCES + ("critic",)
+
+
+def scoring_config(overrides: dict | None = None) -> dict:
+    """Scoring constants from merge_scores, with optional overrides."""
+    config = {
+        "component_weights": dict(COMPONENT_WEIGHTS),
+        "tier_thresholds": [list(t) for t in TIER_THRESHOLDS],
+        "max_cross_council_adjustment": MAX_CROSS_COUNCIL_ADJUSTMENT,
+        "max_critic_adjustment": MAX_CRITIC_ADJUSTMENT,
+    }
+    for key, value in (overrides or {}).items():
+        if key not in config:
+            raise ValueError(f"Unknown scoring setting: {key}")
+        config[key] = value
+    unknown = set(config["component_weights"]) - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f"Unknown components in weights: {sorted(unknown)}")
+    unknown = {tier for _, tier in config["tier_thresholds"]} - set(TIERS)
+    if unknown:
+        raise ValueError(f"Unknown tiers in thresholds: {sorted(unknown)}")
+    return config
+
+
+class ScoreColumns:
+    """
+    Columnar view of an evaluation archive.
+
+    ``base[dim]`` holds council scores. Each adjustment layer is a pair of
+    arrays (record indices, rounded adjustments) holding only the records
+    that have that adjustment. Layers are kept in merge_council_scores order:
+    content cross-council, market cross-council, then the critic's first,
+    second, ... challenge to the component.
+    """
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.base = {dim: array("d") for dim in COMPONENTS}
+        # layers[dim] = [(source, depth, indices, values), ...] in application order
+        self.layers: dict[str, list[tuple[str, int, array, array]]] = {dim: [] for dim in COMPONENTS}
+        self.base_confidence = array("d")
+        self.critic_confidence = array("d")
+        self.old_score = array("h")  # -1 when the archive has no previous result
+        self.old_tier = array("b")   # index into TIERS, -1 when unknown
+        self.errors: list[dict] = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _layer(self, dim: str, source: str, depth: int) -> tuple[str, int, array, array]:
+        """The depth-th layer of a source for a component, created on demand."""
+        layers = self.layers[dim]
+        for layer in layers:
+            if layer[0] == source and layer[1] == depth:
+                return layer
+        layer = (source, depth, array("I"), array("i"))
+        layers.append(layer)
+        layers.sort(key=lambda l: (ADJUSTMENT_SOURCES.index(l[0]), l[1]))
+        return layer
+
+    def add(self, record: dict, record_id: str):
+        """Append one archived evaluation."""
+        cc = record.get("content_council") or {}
+        mc = record.get("market_council") or {}
+        critic = record.get("critic")
+        cc_scores = cc.get("consensus_scores", {})
+        mc_scores = mc.get("consensus_scores", {})
+
+        # Validate everything before appending so a bad record leaves no trace
+        base = {dim: float(cc_scores.get(dim, {}).get("score", 50)) for dim in CONTENT_COMPONENTS}
+        base.update({dim: float(mc_scores.get(dim, {}).get("score", 50)) for dim in MARKET_COMPONENTS})
+        adjustments = []
+        for source in CROSS_SOURCES:
+            response = record.get(source)
+            if response:
+                for dim, adj in response.get("score_adjustments", {}).items():
+                    if dim in base:
+                        adjustments.append((dim, source, 0, round(adj)))
+        if critic:
+            depth = {}
+            for challenge in critic.get("challenges", []):
+                adj = challenge.get("suggested_adjustment", "")
+                dim = CRITIC_TARGET_COMPONENTS.get(challenge.get("target_judge", ""))
+                if isinstance(adj, (int, float)) and dim:
+                    adjustments.append((dim, "critic", depth.get(dim, 0), round(adj)))
+                    depth[dim] = depth.get(dim, 0) + 1
+
+        confidences = [
+            score["confidence"]
+            for council in (cc, mc)
+            for score in council.get("consensus_scores", {}).values()
+            if isinstance(score, dict) and "confidence" in score
+        ]
+        previous = record.get("result") or {}
+        virality = previous.get("virality", previous)
+        old_tier = virality.get("tier")
+
+        i = len(self.ids)
+        self.ids.append(record_id)
+        for dim in COMPONENTS:
+            self.base[dim].append(base[dim])
+        for dim, source, level, adj in adjustments:
+            _, _, indices, values = self._layer(dim, source, level)
+            indices.append(i)
+            values.append(adj)
+        self.base_confidence.append(min(confidences) if confidences else 0.5)
+        self.critic_confidence.append(
+            critic.get("overall_confidence_adjustment", 0.0) if critic else 0.0
+        )
+        self.old_score.append(int(virality.get("score", -1)))
+        self.old_tier.append(TIERS.index(old_tier) if old_tier in TIERS else -1)
+
+    def save(self, path: str):
+        """Write the columns to a compact binary file."""
+        arrays = [("base_confidence", self.base_confidence),
+                  ("critic_confidence", self.critic_confidence),
+                  ("old_score", self.old_score), ("old_tier", self.old_tier)]
+        arrays += [(f"base:{dim}", col) for dim, col in self.base.items()]
+        for dim, layers in self.layers.items():
+            for source, depth, indices, values in layers:
+                arrays.append((f"layer:{dim}:{source}:{depth}:indices", indices))
+                arrays.append((f"layer:{dim}:{source}:{depth}:values", values))
+        header = {"version": COLUMNS_VERSION, "ids": self.ids, "tiers": TIERS, "arrays": []}
+        chunks = []
+        for name, col in arrays:
+            data = col.tobytes()
+            header["arrays"].append({"name": name, "typecode": col.typecode, "bytes": len(data)})
+            chunks.append(data)
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(COLUMNS_MAGIC + _HEADER_LEN.pack(len(raw)) + raw)
+            for data in chunks:
+                f.write(data)
+
+    @classmethod
+    def load(cls, path: str) -> "ScoreColumns":
+        """Read columns written by save()."""
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(COLUMNS_MAGIC):
+            raise ValueError(f"Not a Themis columns file: {path}")
+        pos = len(COLUMNS_MAGIC)
+        (header_len,) = _HEADER_LEN.unpack_from(data, pos)
+        pos += _HEADER_LEN.size
+        header = json.loads(data[pos:pos + header_len])
+        if header.get("version") != COLUMNS_VERSION or header.get("tiers") != TIERS:
+            raise ValueError("Columns file was written by an incompatible version")
+        pos += header_len
+
+        cols = cls()
+        cols.ids = header["ids"]
+        layers: dict[tuple[str, str, int], dict] = {}
+        for spec in header["arrays"]:
+            col = array(spec["typecode"])
+            col.frombytes(data[pos:pos + spec["bytes"]])
+            pos += spec["bytes"]
+            name = spec["name"]
+            if name.startswith("base:"):
+                cols.base[name[5:]] = col
+            elif name.startswith("layer:"):
+                _, dim, source, depth, part = name.split(":")
+                layers.setdefault((dim, source, int(depth)), {})[part] = col
+            else:
+                setattr(cols, name, col)
+        for (dim, source, depth), layer in layers.items():
+            cols.layers[dim].append((source, depth, layer["indices"], layer["values"]))
+        for dim_layers in cols.layers.values():
+            dim_layers.sort(key=lambda l: (ADJUSTMENT_SOURCES.index(l[0]), l[1]))
+        return cols
+
+
+def load_archive(paths: list[str]) -> ScoreColumns:
+    """
+    Load archive JSONL files (or one saved columns file) into columns.
+
+    Malformed records are skipped and listed in ``errors``.
+    """
+    if len(paths) == 1:
+        with open(paths[0], "rb") as f:
+            if f.read(len(COLUMNS_MAGIC)) == COLUMNS_MAGIC:
+                return ScoreColumns.load(paths[0])
+
+    cols = ScoreColumns()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    cols.add(record, str(record.get("id", f"{path}:{line_no}")))
+                except (ValueError, TypeError, AttributeError) as e:
+                    cols.errors.append({"source": f"{path}:{line_no}",
+                                        "error": f"{type(e).__name__}: {e}"})
+    return cols
+
+
+def tier_lookup(thresholds: list) -> list[int]:
+    """Tier index for every integer score 0-100 (score_to_tier as a table)."""
+    ordered = sorted(thresholds, key=lambda t: -t[0])
+    table = []
+    for score in range(101):
+        tier = next((name for threshold, name in ordered if score >= threshold), "low")
+        table.append(TIERS.index(tier) if tier in TIERS else len(TIERS) - 1)
+    return table
+
+
+def adjusted_components(cols: ScoreColumns, config: dict) -> dict[str, list]:
+    """Component columns after cross-council and critic adjustments."""
+    caps = {"critic": config["max_critic_adjustment"]}
+    for source in CROSS_SOURCES:
+        caps[source] = config["max_cross_council_adjustment"]
+    components = {}
+    for dim in COMPONENTS:
+        scores = cols.base[dim].tolist()
+        for source, _, indices, values in cols.layers[dim]:
+            cap = caps[source]
+            for i, adj in zip(indices, values):
+                score = scores[i] + max(-cap, min(cap, adj))
+                scores[i] = 0 if score < 0 else (100 if score > 100 else score)
+        components[dim] = scores
+    return components
+
+
+def weighted_scores(components: dict[str, list], weights: dict) -> list[int]:
+    """Clamped, rounded weighted virality score per evaluation."""
+    total = None
+    for dim, weight in weights.items():
+        col = components[dim]
+        if total is None:
+            total = [c * weight for c in col]
+        else:
+            total = [t + c * weight for t, c in zip(total, col)]
+    if total is None:
+        return []
+    return [max(0, min(100, round(t))) for t in total]
+
+
+def rescore(cols: ScoreColumns, config: dict | None = None) -> dict:
+    """Re-score every evaluation in the columns with ``config``."""
+    config = config or scoring_config()
+    components = adjusted_components(cols, config)
+    scores = weighted_scores(components, config["component_weights"])
+    table = tier_lookup(config["tier_thresholds"])
+    confidence = [
+        round(max(0.0, min(1.0, b + c)), 2)
+        for b, c in zip(cols.base_confidence, cols.critic_confidence)
+    ]
+    return {
+        "components": components,
+        "score": scores,
+        "tier": [table[s] for s in scores],
+        "confidence": confidence,
+    }
+
+
+def diff_summary(cols: ScoreColumns, result: dict) -> dict:
+    """Compare new scores and tiers with the archived ones."""
+    compared = changed = tier_changed = 0
+    abs_delta = max_delta = 0
+    transitions: dict[str, int] = {}
+    for old, new, old_tier, new_tier in zip(cols.old_score, result["score"],
+                                             cols.old_tier, result["tier"]):
+        if old < 0:
+            continue
+        compared += 1
+        delta = abs(new - old)
+        if delta:
+            changed += 1
+            abs_delta += delta
+            max_delta = max(max_delta, delta)
+        if old_tier >= 0 and old_tier != new_tier:
+            tier_changed += 1
+            key = f"{TIERS[old_tier]}->{TIERS[new_tier]}"
+            transitions[key] = transitions.get(key, 0) + 1
+    return {
+        "compared": compared,
+        "scores_changed": changed,
+        "tiers_changed": tier_changed,
+        "mean_abs_delta": round(abs_delta / compared, 3) if compared else 0.0,
+        "max_abs_delta": max_delta,
+        "tier_transitions": dict(sorted(transitions.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def _number(value: float):
+    """Render integral component scores as ints, as merge_scores does."""
+    return int(value) if value == int(value) else value
+
+
+def write_results(cols: ScoreColumns, result: dict, path: str,
+                  changed_only: bool = False) -> int:
+    """Write one JSON line per evaluation with its new score and diff."""
+    written = 0
+    components = result["components"]
+    with open(path, "w") as f:
+        for i, record_id in enumerate(cols.ids):
+            old = cols.old_score[i]
+            new = result["score"][i]
+            if changed_only and (old < 0 or old == new):
+                continue
+            old_tier = cols.old_tier[i]
+            f.write(json.dumps({
+                "id": record_id,
+                "score": new,
+                "tier": TIERS[result["tier"][i]],
+                "confidence": result["confidence"][i],
+                "components": {dim: _number(components[dim][i]) for dim in COMPONENTS},
+                "old_score": old if old >= 0 else None,
+                "old_tier": TIERS[old_tier] if old_tier >= 0 else None,
+                "delta": new - old if old >= 0 else None,
+            }))
+            f.write("\n")
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score archived Themis evaluations")
+    parser.add_argument("archive", nargs="+",
+                        help="Archive JSONL file(s), or one columns file from --save-columns")
+    parser.add_argument("-o", "--output", help="Write per-evaluation results as JSONL")
+    parser.add_argument("--config",
+                        help="JSON (string or file path) overriding component_weights, "
+                             "tier_thresholds, max_cross_council_adjustment or "
+                             "max_critic_adjustment")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Only write evaluations whose score changed")
+    parser.add_argument("--save-columns",
+                        help="Save the loaded columns for faster re-runs")
+    args = parser.parse_args()
+
+    try:
+        overrides = None
+        if args.config:
+            try:
+                overrides = json.loads(args.config)
+            except json.JSONDecodeError:
+                with open(args.config) as f:
+                    overrides = json.load(f)
+        config = scoring_config(overrides)
+
+        start = time.perf_counter()
+        cols = load_archive(args.archive)
+        load_sec = time.perf_counter() - start
+        print(f"  Loaded {len(cols):,} evaluations in {load_sec:.2f}s "
+              f"({len(cols.errors):,} skipped)", file=sys.stderr)
+        if args.save_columns:
+            cols.save(args.save_columns)
+            print(f"  Columns saved: {args.save_columns}", file=sys.stderr)
+
+        start = time.perf_counter()
+        result = rescore(cols, config)
+        rescore_sec = time.perf_counter() - start
+        print(f"  Re-scored in {rescore_sec:.2f}s", file=sys.stderr)
+
+        summary = {
+            "evaluations": len(cols),
+            "skipped": cols.errors[:20],
+            "skipped_count": len(cols.errors),
+            "config": config,
+            "diff": diff_summary(cols, result),
+            "load_sec": round(load_sec, 3),
+            "rescore_sec": round(rescore_sec, 3),
+        }
+        if args.output:
+            summary["written"] = write_results(cols, result, args.output, args.changed_only)
+            summary["output"] = args.output
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pre-flight cost governor for Themis evaluations.
+
+Projects the cost of an evaluation from the actual payload (token_tracker's
+payload-driven estimate, priced per stage) before any judge is dispatched,
+and enforces a per-evaluation limit and, with an evaluation store, a
+per-day budget. Over budget, it walks DEGRADATION_STEPS: budget-mode judge
+views at shrinking token ceilings (fewer keyframes, trimmed transcript),
+then the fast stage set. The first plan that fits is returned with the
+reason, to be passed on to merge_scores.py --governor.
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+
+from format_payload import JUDGE_TOKEN_BUDGETS, write_judge_files
+from payload_io import open_payload
+from token_tracker import estimate_pipeline_cost
+
+
+DEFAULT_MAX_COST_USD = 2.50
+
+# Plans tried in order: (mode, scale of JUDGE_TOKEN_BUDGETS or None for the
+# unbudgeted views)
+DEGRADATION_STEPS = [
+    ("full", None),
+    ("full", 1.0),
+    ("full", 0.5),
+    ("fast", None),
+    ("fast", 1.0),
+    ("fast", 0.5),
+    ("fast", 0.25),
+]
+
+
+def scaled_budgets(scale: float | None) -> dict[str, int] | None:
+    """Per-judge token ceilings at ``scale`` x JUDGE_TOKEN_BUDGETS."""
+    if scale is None:
+        return None
+    return {judge: int(tokens * scale) for judge, tokens in JUDGE_TOKEN_BUDGETS.items()}
+
+
+def describe_plan(mode: str, scale: float | None) -> str:
+    if scale is None:
+        return f"{mode} mode"
+    return f"{mode} mode, judge payloads at {scale:.0%} of token budgets"
+
+
+def daily_spend(store_path: str, day: str | None = None) -> float:
+    """Cost recorded in the evaluation store since the start of ``day`` (UTC, default today)."""
+    from eval_store import EvaluationStore
+
+    day = day or datetime.now(timezone.utc).date().isoformat()
+    with EvaluationStore(store_path) as store:
+        return store.spent_since(day)
+
+
+def govern(payload: dict, max_cost: float | None = DEFAULT_MAX_COST_USD,
+           daily_budget: float | None = None, spent_today: float = 0.0,
+           requested_mode: str = "full", cache_ttl: str = "5m") -> dict:
+    """
+    Choose the first plan in DEGRADATION_STEPS whose projected cost fits.
+
+    The limit is the smaller of ``max_cost`` and what is left of
+    ``daily_budget``. Returns the decision: approved, mode, budgets,
+    projected cost, the plans tried and the reason for any degradation.
+    """
+    limits = []
+    if max_cost is not None:
+        limits.append(max_cost)
+    if daily_budget is not None:
+        limits.append(max(daily_budget - spent_today, 0.0))
+    limit = min(limits) if limits else None
+
+    steps = [s for s in DEGRADATION_STEPS if requested_mode == "full" or s[0] == "fast"]
+    tried = []
+    chosen = None
+    for mode, scale in steps:
+        budgets = scaled_budgets(scale)
+        cost = estimate_pipeline_cost(mode, payload=payload, budgets=budgets,
+                                      cache_ttl=cache_ttl)["estimated_cost_usd"]
+        tried.append({"plan": describe_plan(mode, scale), "projected_cost_usd": cost})
+        if limit is None or cost <= limit:
+            chosen = (mode, scale, budgets, cost)
+            break
+
+    baseline_cost = tried[0]["projected_cost_usd"]
+    binding = "remaining per-day budget" if (
+        daily_budget is not None and limit == max(daily_budget - spent_today, 0.0)
+        and (max_cost is None or limit < max_cost)
+    ) else "per-evaluation limit"
+    decision = {
+        "approved": chosen is not None,
+        "limit_usd": limit,
+        "max_cost_usd": max_cost,
+        "daily_budget_usd": daily_budget,
+        "spent_today_usd": round(spent_today, 2),
+        "baseline_cost_usd": baseline_cost,
+        "plans_tried": tried,
+    }
+    if chosen is None:
+        decision.update(mode=None, token_budgets=None, projected_cost_usd=None,
+                        degraded=True,
+                        reason=f"Projected ${tried[-1]['projected_cost_usd']:.2f} even with "
+                               f"{tried[-1]['plan']} exceeds the {binding} (${limit:.2f})")
+        return decision
+
+    mode, scale, budgets, cost = chosen
+    degraded = len(tried) > 1
+    decision.update(
+        mode=mode,
+        budget_scale=scale,
+        token_budgets=budgets,
+        projected_cost_usd=cost,
+        degraded=degraded,
+        reason=(f"Projected ${baseline_cost:.2f} for {tried[0]['plan']} exceeds the "
+                f"{binding} (${limit:.2f}); using {describe_plan(mode, scale)} "
+                f"(${cost:.2f})") if degraded else None,
+    )
+    return decision
+
+
+def metadata_entry(decision: dict) -> dict:
+    """The governor fields recorded in the final output's metadata."""
+    return {k: decision.get(k) for k in (
+        "mode", "budget_scale", "projected_cost_usd", "baseline_cost_usd",
+        "limit_usd", "degraded", "reason",
+    )}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project evaluation cost and pick a plan within budget")
+    parser.add_argument("payload", help="Preprocessed payload (.json or .themis)")
+    parser.add_argument("--max-cost", type=float, default=DEFAULT_MAX_COST_USD,
+                        help=f"Per-evaluation limit in USD (default {DEFAULT_MAX_COST_USD:.2f})")
+    parser.add_argument("--daily-budget", type=float,
+                        help="Per-day budget in USD (needs --store for today's spend)")
+    parser.add_argument("--store", help="Evaluation store (SQLite) to read today's spend from")
+    parser.add_argument("--mode", default="full", choices=["full", "fast"],
+                        help="Requested mode (fast is never upgraded)")
+    parser.add_argument("--cache-ttl", default="5m", choices=["5m", "1h"])
+    parser.add_argument("--output-dir",
+                        help="Also write the chosen judge views (format_payload --output-dir)")
+    parser.add_argument("-o", "--output", help="Write the decision JSON here")
+    args = parser.parse_args()
+
+    try:
+        if args.daily_budget is not None and not args.store:
+            raise ValueError("--daily-budget needs --store to know today's spend")
+        spent = daily_spend(args.store) if args.store else 0.0
+        payload = open_payload(args.payload)
+        decision = govern(payload, args.max_cost, args.daily_budget, spent,
+                          args.mode, args.cache_ttl)
+        if decision["approved"] and args.output_dir:
+            decision["judge_files"] = write_judge_files(payload, args.output_dir,
+                                                        budgets=decision["token_budgets"])
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(decision, f, indent=2)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for step in decision["plans_tried"]:
+        print(f"  {step['plan']:50s} ${step['projected_cost_usd']:.2f}", file=sys.stderr)
+    print(json.dumps(decision, indent=2))
+    if not decision["approved"]:
+        print(f"Error: {decision['reason']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
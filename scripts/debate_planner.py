@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Adaptive debate planning from Round 1 judge outputs.
+
+Full mode runs Round 2 for every judge and a cross-council exchange even
+when Round 1 already agrees. The planner checks each council's Round 1
+outputs (pairwise primary and shared sub-score spreads, outliers from
+the confidence-weighted mean, low confidence) and decides per council
+whether Round 2 is needed and which judges revise, then whether the
+cross-council exchange is warranted. In a split, only the judge farther
+from the council median revises, so one outlier does not send the whole
+council to Round 2. Skipped stages are listed so token_tracker and
+latency_sim can cost the plan.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from merge_scores import confidence_weighted_average
+from token_tracker import JUDGE_COUNCILS, TokenTracker
+
+
+DISAGREEMENT_THRESHOLD = 20   # same threshold merge_scores uses
+UNANIMOUS_SPREAD = 10         # all judges within this: high-confidence consensus
+OUTLIER_POINTS = 15           # distance from the council mean that triggers a revision
+LOW_CONFIDENCE = 0.6
+CROSS_COUNCIL_GAP = 20        # content vs market mean score gap that warrants the exchange
+PRESERVED_SPREAD = 30         # spread flagged for the critic; always goes to cross-council
+
+
+def load_outputs(paths: list[str]) -> list[dict]:
+    """Judge outputs from JSON files (one output or a list each) or directories of them."""
+    outputs = []
+    for path in paths:
+        files = sorted(Path(path).glob("*.json")) if Path(path).is_dir() else [Path(path)]
+        for file in files:
+            with open(file) as f:
+                data = json.load(f)
+            outputs.extend(data if isinstance(data, list) else [data])
+    return [o for o in outputs if isinstance(o, dict) and "judge" in o]
+
+
+def _score(output: dict) -> int:
+    return output.get("scores", {}).get("primary_score", 0)
+
+
+def _split_side(a: tuple[str, float], b: tuple[str, float], center: float) -> list[str]:
+    """The judge of a disagreeing pair farther from ``center`` (both if equally far)."""
+    da, db = abs(a[1] - center), abs(b[1] - center)
+    if da == db:
+        return [a[0], b[0]]
+    return [a[0] if da > db else b[0]]
+
+
+def plan_council(outputs: list[dict]) -> dict:
+    """Round 2 decision for one council's Round 1 outputs."""
+    reasons = []
+    revise = set()
+    if not outputs:
+        return {"round_2": False, "revise": [], "reasons": ["no Round 1 outputs"],
+                "mean_score": None, "spread": 0, "min_confidence": None}
+
+    scores = [(o["judge"], _score(o)) for o in outputs]
+    values = [score for _, score in scores]
+    spread = max(values) - min(values)
+    if any(o.get("confidence", 0.0) > 0 for o in outputs):
+        mean, min_confidence = confidence_weighted_average(
+            [(_score(o), o.get("confidence", 0.0)) for o in outputs])
+    else:
+        # No confidence to weight by; a zero mean would make every judge an outlier
+        mean, min_confidence = round(statistics.mean(values)), 0.0
+
+    center = statistics.median(values)
+    for i, a in enumerate(scores):
+        for b in scores[i + 1:]:
+            if abs(a[1] - b[1]) > DISAGREEMENT_THRESHOLD:
+                reasons.append(f"Overall assessment ({a[0]} vs {b[0]}): "
+                               f"{abs(a[1] - b[1])}-point spread")
+                revise.update(_split_side(a, b, center))
+
+    # Sub-scores that more than one judge reports
+    sub_scores: dict[str, list[tuple[str, int]]] = {}
+    for o in outputs:
+        for key, value in o.get("scores", {}).get("sub_scores", {}).items():
+            if isinstance(value, (int, float)):
+                sub_scores.setdefault(key, []).append((o["judge"], value))
+    for key, values in sub_scores.items():
+        if len(values) < 2:
+            continue
+        lo, hi = min(values, key=lambda v: v[1]), max(values, key=lambda v: v[1])
+        if hi[1] - lo[1] > DISAGREEMENT_THRESHOLD:
+            reasons.append(f"{key}: {hi[1] - lo[1]}-point spread ({lo[0]} vs {hi[0]})")
+            revise.update(_split_side(lo, hi, statistics.median(v for _, v in values)))
+
+    for o in outputs:
+        if abs(_score(o) - mean) > OUTLIER_POINTS:
+            reasons.append(f"{o['judge']} is {abs(_score(o) - mean)} points from the council mean")
+            revise.add(o["judge"])
+        if o.get("confidence", 0.0) < LOW_CONFIDENCE:
+            reasons.append(f"{o['judge']} confidence {o.get('confidence', 0.0):.2f} "
+                           f"< {LOW_CONFIDENCE}")
+            revise.add(o["judge"])
+
+    result = {
+        "round_2": bool(revise),
+        "revise": [o["judge"] for o in outputs if o["judge"] in revise],
+        "reasons": reasons,
+        "mean_score": mean,
+        "spread": spread,
+        "min_confidence": min_confidence,
+    }
+    if spread <= UNANIMOUS_SPREAD and not revise:
+        result["consensus"] = "unanimous"
+    return result
+
+
+def plan_debate(outputs: list[dict]) -> dict:
+    """Plan Round 2 per council and the cross-council exchange."""
+    by_judge = {o["judge"]: o for o in outputs}
+    councils = {
+        name: plan_council([by_judge[j] for j in judges if j in by_judge])
+        for name, judges in JUDGE_COUNCILS.items()
+    }
+
+    content, market = councils["content"], councils["market"]
+    cross_reasons = []
+    if content["mean_score"] is not None and market["mean_score"] is not None:
+        gap = abs(content["mean_score"] - market["mean_score"])
+        if gap > CROSS_COUNCIL_GAP:
+            cross_reasons.append(f"content ({content['mean_score']}) and market "
+                                 f"({market['mean_score']}) councils are {gap} points apart")
+    for name, council in councils.items():
+        if council["spread"] > PRESERVED_SPREAD:
+            cross_reasons.append(f"{name} council spread {council['spread']} > {PRESERVED_SPREAD}")
+
+    skipped = []
+    for name, judges in JUDGE_COUNCILS.items():
+        skipped += [f"{j}_r2" for j in judges if j not in councils[name]["revise"]]
+    if not cross_reasons:
+        skipped += ["cross_council_content", "cross_council_market"]
+
+    return {
+        "councils": councils,
+        "cross_council": {"run": bool(cross_reasons), "reasons": cross_reasons},
+        "debate_rounds": 2 if any(c["round_2"] for c in councils.values()) else 1,
+        "skipped_stages": skipped,
+    }
+
+
+def plan_cost(plan: dict) -> dict:
+    """Full-mode cost estimate with and without the plan's skipped stages."""
+    tracker = TokenTracker("full")
+    tracker.estimate_all()
+    tracker.apply_cache_estimates()
+    full = tracker.summary()
+    for stage in plan["skipped_stages"]:
+        tracker.stages.pop(stage, None)
+    planned = tracker.summary()
+    return {
+        "full_tokens": full["total_tokens"],
+        "planned_tokens": planned["total_tokens"],
+        "full_cost_usd": full["estimated_cost_usd"],
+        "planned_cost_usd": planned["estimated_cost_usd"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan Round 2 and cross-council from Round 1 outputs")
+    parser.add_argument("outputs", nargs="+",
+                        help="Round 1 judge output JSON files or directories of them")
+    parser.add_argument("-o", "--output", help="Write the plan JSON here")
+    args = parser.parse_args()
+
+    try:
+        outputs = load_outputs(args.outputs)
+        if not outputs:
+            raise ValueError("No judge outputs found")
+        plan = plan_debate(outputs)
+        plan["estimate"] = plan_cost(plan)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(plan, f, indent=2)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for name, council in plan["councils"].items():
+        if council["round_2"]:
+            print(f"  {name}: Round 2 for {', '.join(council['revise'])}", file=sys.stderr)
+        else:
+            print(f"  {name}: skip Round 2 ({council.get('consensus', 'agreement')})",
+                  file=sys.stderr)
+    print(f"  cross-council: {'run' if plan['cross_council']['run'] else 'skip'}",
+          file=sys.stderr)
+    print(json.dumps(plan, indent=2))
+
+
+if __name__ == "__main__":
+    main()
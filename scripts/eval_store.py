@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Persistent evaluation store for Themis (SQLite, WAL mode).
+
+Final merge_scores outputs are kept one row per evaluation with the fields
+we query on as indexed columns (time, virality score and tier, AI
+probability, content hash) and the complete output as JSON. Inserts are
+batched into single transactions; WAL lets readers query while an
+evaluation run is writing.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+
+STORE_BATCH_SIZE = 500
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    evaluated_at TEXT NOT NULL,
+    content_hash TEXT,
+    source_file TEXT,
+    content_type TEXT,
+    mode TEXT,
+    virality_score INTEGER NOT NULL,
+    tier TEXT NOT NULL,
+    confidence REAL,
+    hook_effectiveness INTEGER,
+    emotional_resonance INTEGER,
+    production_quality INTEGER,
+    trend_alignment INTEGER,
+    shareability INTEGER,
+    ai_probability REAL,
+    authenticity_verdict TEXT,
+    disagreement_count INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cache_hit_tokens INTEGER,
+    estimated_cost_usd REAL,
+    disagreements TEXT,
+    forensics TEXT,
+    output TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eval_time_score ON evaluations (evaluated_at, virality_score);
+CREATE INDEX IF NOT EXISTS idx_eval_score_time ON evaluations (virality_score, evaluated_at);
+CREATE INDEX IF NOT EXISTS idx_eval_tier_score ON evaluations (tier, virality_score, evaluated_at);
+CREATE INDEX IF NOT EXISTS idx_eval_tier_ai ON evaluations (tier, ai_probability);
+CREATE INDEX IF NOT EXISTS idx_eval_hash ON evaluations (content_hash);
+"""
+
+COLUMNS = (
+    "evaluated_at", "content_hash", "source_file", "content_type", "mode",
+    "virality_score", "tier", "confidence",
+    "hook_effectiveness", "emotional_resonance", "production_quality",
+    "trend_alignment", "shareability",
+    "ai_probability", "authenticity_verdict", "disagreement_count",
+    "input_tokens", "output_tokens", "cache_hit_tokens", "estimated_cost_usd",
+    "disagreements", "forensics", "output",
+)
+COMPONENT_COLUMNS = COLUMNS[8:13]
+
+# Columns returned by queries (the full output is fetched on request)
+SUMMARY_COLUMNS = ("id",) + COLUMNS[:16]
+
+
+def evaluation_row(output: dict, content_hash: str | None = None,
+                   source_file: str | None = None,
+                   content_type: str | None = None) -> tuple:
+    """Flatten a merge_scores output into a store row."""
+    virality = output.get("virality", {})
+    components = virality.get("components", {})
+    authenticity = output.get("authenticity") or {}
+    metadata = output.get("metadata", {})
+    source = output.get("input", {})
+    disagreements = output.get("disagreements", [])
+    forensics = authenticity.get("statistical_metrics")
+    return (
+        metadata.get("evaluation_timestamp") or datetime.now(timezone.utc).isoformat(),
+        content_hash or output.get("content_hash"),
+        source_file or source.get("source_file"),
+        content_type or source.get("content_type"),
+        metadata.get("mode"),
+        virality["score"],
+        virality["tier"],
+        virality.get("confidence"),
+        *(components.get(dim) for dim in COMPONENT_COLUMNS),
+        authenticity.get("ai_probability"),
+        authenticity.get("verdict"),
+        len(disagreements),
+        metadata.get("input_tokens"),
+        metadata.get("output_tokens"),
+        metadata.get("cache_hit_tokens"),
+        metadata.get("estimated_cost_usd"),
+        json.dumps(disagreements),
+        json.dumps(forensics) if forensics is not None else None,
+        json.dumps(output),
+    )
+
+
+class EvaluationStore:
+    """
+    Indexed store of final evaluation outputs.
+
+    ``add()`` buffers rows and writes them in batches of ``batch_size``;
+    call ``flush()`` (or use the store as a context manager) to commit the
+    remainder.
+    """
+
+    def __init__(self, path: str, batch_size: int = STORE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: list[tuple] = []
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"Unsupported evaluation store version {version}: {path}")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, output: dict, content_hash: str | None = None,
+            source_file: str | None = None, content_type: str | None = None):
+        """Queue one evaluation output for insertion."""
+        self._pending.append(evaluation_row(output, content_hash, source_file, content_type))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Insert all queued rows in one transaction; returns the count."""
+        if not self._pending:
+            return 0
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO evaluations ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                self._pending,
+            )
+        count = len(self._pending)
+        self._pending = []
+        return count
+
+    def close(self):
+        self.flush()
+        # Refresh planner statistics so range vs. score index choice stays good
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+
+    def _query(self, where: list[str], params: list, order: str, limit: int,
+               full: bool) -> list[dict]:
+        columns = "*" if full else ", ".join(SUMMARY_COLUMNS)
+        sql = f"SELECT {columns} FROM evaluations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        rows = self.conn.execute(sql, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def top_by_virality(self, k: int = 10, since: str | None = None,
+                        until: str | None = None, tier: str | None = None,
+                        full: bool = False) -> list[dict]:
+        """Highest virality scores, optionally within [since, until) and a tier."""
+        where, params = [], []
+        if since:
+            where.append("evaluated_at >= ?")
+            params.append(since)
+        if until:
+            where.append("evaluated_at < ?")
+            params.append(until)
+        if tier:
+            where.append("tier = ?")
+            params.append(tier)
+        return self._query(where, params, "virality_score DESC, evaluated_at DESC", k, full)
+
+    def filter(self, tier: str | None = None, min_ai: float | None = None,
+               max_ai: float | None = None, limit: int = 100,
+               full: bool = False) -> list[dict]:
+        """Evaluations by tier and AI-probability range, most AI-like first."""
+        where, params = [], []
+        if tier:
+            where.append("tier = ?")
+            params.append(tier)
+        if min_ai is not None:
+            where.append("ai_probability >= ?")
+            params.append(min_ai)
+        if max_ai is not None:
+            where.append("ai_probability <= ?")
+            params.append(max_ai)
+        return self._query(where, params, "ai_probability DESC", limit, full)
+
+    def by_hash(self, content_hash: str, full: bool = False) -> list[dict]:
+        """All evaluations of the same content, newest first."""
+        return self._query(["content_hash = ?"], [content_hash], "evaluated_at DESC",
+                           -1, full)
+
+    def spent_since(self, since: str) -> float:
+        """Total recorded cost (USD) of evaluations at or after ``since``."""
+        row = self.conn.execute(
+            "SELECT SUM(estimated_cost_usd) FROM evaluations WHERE evaluated_at >= ?", (since,)
+        ).fetchone()
+        return row[0] or 0.0
+
+    def stats(self) -> dict:
+        """Row count, time span and tier counts."""
+        row = self.conn.execute(
+            "SELECT COUNT(*), MIN(evaluated_at), MAX(evaluated_at) FROM evaluations"
+        ).fetchone()
+        tiers = dict(self.conn.execute(
+            "SELECT tier, COUNT(*) FROM evaluations GROUP BY tier"
+        ).fetchall())
+        return {"evaluations": row[0], "first": row[1], "last": row[2], "tiers": tiers}
+
+
+def _iter_outputs(path: str):
+    """Outputs from a JSON file (one output or a list) or a JSONL file."""
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    yield from (data if isinstance(data, list) else [data])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or load the Themis evaluation store")
+    parser.add_argument("db", help="Path to the SQLite evaluation store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load = sub.add_parser("import", help="Import saved merge_scores outputs (.json / .jsonl)")
+    load.add_argument("files", nargs="+")
+
+    top = sub.add_parser("top", help="Top evaluations by virality score")
+    top.add_argument("-k", type=int, default=10)
+    top.add_argument("--since", help="ISO date/time (inclusive)")
+    top.add_argument("--until", help="ISO date/time (exclusive)")
+    top.add_argument("--tier")
+
+    query = sub.add_parser("filter", help="Filter by tier and AI probability")
+    query.add_argument("--tier")
+    query.add_argument("--min-ai", type=float)
+    query.add_argument("--max-ai", type=float)
+    query.add_argument("--limit", type=int, default=100)
+
+    lookup = sub.add_parser("hash", help="Evaluations of one content hash")
+    lookup.add_argument("content_hash")
+
+    sub.add_parser("stats", help="Row count, time span and tier counts")
+
+    for p in (top, query, lookup):
+        p.add_argument("--full", action="store_true", help="Include the full stored output")
+    args = parser.parse_args()
+
+    try:
+        with EvaluationStore(args.db) as store:
+            if args.command == "import":
+                count = 0
+                for path in args.files:
+                    for output in _iter_outputs(path):
+                        store.add(output)
+                        count += 1
+                store.flush()
+                result = {"imported": count}
+            elif args.command == "top":
+                result = store.top_by_virality(args.k, args.since, args.until, args.tier, args.full)
+            elif args.command == "filter":
+                result = store.filter(args.tier, args.min_ai, args.max_ai, args.limit, args.full)
+            elif args.command == "hash":
+                result = store.by_hash(args.content_hash, args.full)
+            else:
+                result = store.stats()
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if isinstance(result, list):
+        for row in result:
+            if "output" in row:
+                row["output"] = json.loads(row["output"])
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,71 +7,474 @@ views with appropriate keyframe subsets and context.
 """
 
 import argparse
+import base64
+import hashlib
 import json
+import os
+import re
 import sys
 from copy import deepcopy
 
+from keyframe_descriptors import descriptor_distance, farthest_point_selection
+from payload_io import LazyKeyframes, open_payload
+from preprocess_text import section_text
+from token_estimator import estimate_text_tokens, frame_image_tokens
+
 
 # Which keyframes each judge needs
+# "strategy" selects keyframes; "transcript" selects what of the transcript is
+# sent: full (text + segments), text, segments, window (segments starting in
+# the first "window_sec" seconds) or none
 JUDGE_KEYFRAME_CONFIGS = {
-    "hook_analyst": {"strategy": "first_n", "n": 4},
-    "emotion_analyst": {"strategy": "all"},
-    "production_analyst": {"strategy": "all"},
-    "trend_analyst": {"strategy": "sampled", "n": 6},
-    "subject_analyst": {"strategy": "all"},
-    "audience_mapper": {"strategy": "sampled", "n": 6},
-    "authenticity_analyst": {"strategy": "none"},
-    "critic": {"strategy": "none"},
-    "orchestrator": {"strategy": "none"},
+    "hook_analyst": {"strategy": "first_n", "n": 4, "transcript": "window", "window_sec": 10},
+    "emotion_analyst": {"strategy": "all", "transcript": "segments"},
+    "production_analyst": {"strategy": "all", "transcript": "segments"},
+    "trend_analyst": {"strategy": "diverse", "n": 6, "transcript": "text"},
+    "subject_analyst": {"strategy": "all", "transcript": "text"},
+    "audience_mapper": {"strategy": "diverse", "n": 6, "transcript": "text"},
+    "authenticity_analyst": {"strategy": "none", "transcript": "text"},
+    "critic": {"strategy": "none", "transcript": "none"},
+    "orchestrator": {"strategy": "none", "transcript": "none"},
 }
 
 
-def select_keyframes(frames: list[dict], config: dict) -> list[dict]:
-    """Select keyframes based on judge-specific strategy."""
+# Per-judge token ceilings for budget mode (judge payload only, not prompts)
+JUDGE_TOKEN_BUDGETS = {
+    "hook_analyst": 8000,
+    "emotion_analyst": 24000,
+    "production_analyst": 24000,
+    "trend_analyst": 12000,
+    "subject_analyst": 24000,
+    "audience_mapper": 12000,
+    "authenticity_analyst": 8000,
+    "critic": 6000,
+    "orchestrator": 6000,
+}
+
+# Budget mode coverage model
+BUDGET_COVERAGE_BINS = 32
+BUDGET_FRAME_RADIUS_BINS = 3  # a frame also partly covers this many bins each side
+BUDGET_FRAME_WEIGHT = 1.0
+BUDGET_TRANSCRIPT_WEIGHT = 1.0
+# Bonus per frame for visual novelty: its descriptor distance to the nearest
+# frame already chosen (0 identical, 1 maximally different)
+BUDGET_DIVERSITY_WEIGHT = 2.0
+BUDGET_OVERHEAD_TOKENS = 75  # the token_budget report itself
+
+# Keyframe fields used to choose frames but never sent to judges
+SELECTION_ONLY_FIELDS = ("descriptor",)
+
+
+def select_keyframe_positions(frames, config: dict) -> tuple[list[int], str]:
+    """
+    Positions of the keyframes a judge-specific strategy selects.
+
+    "diverse" picks the n most mutually distinct frames by their stored
+    descriptors (farthest-point selection); payloads without descriptors
+    fall back to "sampled". Returns the positions and the strategy that
+    was actually applied.
+    """
     strategy = config.get("strategy", "all")
+    count = len(frames)
+
+    if strategy == "diverse":
+        meta = keyframe_metadata(frames)
+        if meta and all("descriptor" in f for f in meta):
+            indices = farthest_point_selection([f["descriptor"] for f in meta],
+                                               config.get("n", 6))
+            return list(indices), strategy
+        strategy = "sampled"
 
     if strategy == "none":
-        return []
-    if strategy == "all":
-        return frames
+        return [], strategy
     if strategy == "first_n":
-        n = config.get("n", 4)
-        return frames[:n]
+        return list(range(min(config.get("n", 4), count))), strategy
     if strategy == "sampled":
         n = config.get("n", 6)
-        if len(frames) <= n:
-            return frames
-        indices = [int(i * (len(frames) - 1) / (n - 1)) for i in range(n)]
-        return [frames[i] for i in sorted(set(indices))]
+        if count <= n:
+            return list(range(count)), strategy
+        indices = [int(i * (count - 1) / (n - 1)) for i in range(n)]
+        return sorted(set(indices)), strategy
+
+    return list(range(count)), strategy
+
 
-    return frames
+def select_keyframes(frames: list[dict], config: dict) -> list[dict]:
+    """Select keyframes based on judge-specific strategy."""
+    positions, _ = select_keyframe_positions(frames, config)
+    return [frames[i] for i in positions]
+
+
+def select_transcript(transcript: dict, config: dict,
+                      content_type: str = "video") -> dict | None:
+    """
+    Apply a judge's transcript policy; None means no transcript is sent.
+
+    Text payloads have no timed segments, so every policy except "none"
+    keeps the document text.
+    """
+    policy = config.get("transcript", "full")
+    if policy == "none":
+        return None
+    if policy == "full" or content_type == "text":
+        return transcript
+    language = transcript.get("language", "unknown")
+    if policy == "text":
+        return {"language": language, "text": transcript.get("text", "")}
+    segments = transcript.get("segments", [])
+    if policy == "window":
+        window = config.get("window_sec", 10)
+        return {
+            "language": language,
+            "window_sec": window,
+            "segments": [s for s in segments if s.get("start", 0.0) < window],
+        }
+    return {"language": language, "segments": segments}
 
 
 def strip_base64(frames: list[dict]) -> list[dict]:
-    """Remove base64 data from frames, keeping metadata only."""
+    """Remove base64 data and selection-only fields, keeping what judges see."""
     return [
-        {k: v for k, v in f.items() if k != "base64"}
+        {k: v for k, v in f.items() if k != "base64" and k not in SELECTION_ONLY_FIELDS}
         for f in frames
     ]
 
 
+def judge_frames(frames: list[dict]) -> list[dict]:
+    """Frames as sent to a judge: images kept, selection-only fields removed."""
+    return [
+        {k: v for k, v in f.items() if k not in SELECTION_ONLY_FIELDS}
+        for f in frames
+    ]
+
+
+def materialize_sections(payload: dict) -> list[dict]:
+    """
+    Expand an offset-based section index into sections with ``content``.
+
+    Text payloads store sections as start/end offsets into transcript.text;
+    legacy payloads that already carry ``content`` pass through unchanged.
+    """
+    text = payload.get("transcript", {}).get("text", "")
+    sections = []
+    for section in payload.get("sections", []):
+        if "content" in section:
+            sections.append(section)
+            continue
+        sections.append({
+            "heading": section["heading"],
+            "level": section["level"],
+            "content": section_text(text, section),
+            "word_count": section["word_count"],
+        })
+    return sections
+
+
+def _span_bins(start: float, end: float, span: float) -> dict[int, float]:
+    """Coverage bins fully covered by the interval [start, end]."""
+    bins = BUDGET_COVERAGE_BINS
+    first = min(int(start / span * bins), bins - 1)
+    last = min(int(end / span * bins), bins - 1)
+    return {b: 1.0 for b in range(first, max(first, last) + 1)}
+
+
+def _point_bins(t: float, span: float) -> dict[int, float]:
+    """Coverage bins near time t, decaying linearly with distance."""
+    bins = BUDGET_COVERAGE_BINS
+    center = min(int(t / span * bins), bins - 1)
+    radius = BUDGET_FRAME_RADIUS_BINS
+    return {
+        b: 1.0 - abs(b - center) / (radius + 1)
+        for b in range(max(0, center - radius), min(bins, center + radius + 1))
+    }
+
+
+def _budget_candidates(payload: dict, judge_name: str) -> tuple[list[dict], str]:
+    """
+    Build the selectable items (frames and transcript spans) for a judge.
+
+    Each item has a token cost and the coverage bins it contributes to.
+    Frames follow the judge's keyframe strategy as a candidate pool
+    ("none" excludes images, "first_n" limits them to the opening), and
+    transcript spans follow its transcript policy the same way.
+    """
+    items = []
+    config = JUDGE_KEYFRAME_CONFIGS.get(judge_name, {"strategy": "all"})
+    duration = payload.get("metadata", {}).get("duration_sec") or 0.0
+
+    if payload.get("content_type", "video") != "text" and config["strategy"] != "none":
+        frames = payload.get("keyframes", [])
+        meta = keyframe_metadata(frames)
+        if config["strategy"] == "first_n":
+            meta = meta[:config.get("n", 4)]
+        span = duration or 1.0
+        for pos, frame in enumerate(meta):
+            t = frame.get("timestamp_sec")
+            if t is None:
+                t = (pos + 0.5) / len(meta) * span
+            items.append({
+                "kind": "frame",
+                "pos": pos,
+                # Older payloads lack width/height; read the frame's image header
+                "cost": (frame_image_tokens(frame if frame.get("width") else frames[pos])
+                         + estimate_text_tokens(json.dumps(strip_base64([frame])[0]))),
+                "bins": _point_bins(t, span),
+                "descriptor": frame.get("descriptor"),
+            })
+
+    policy = config.get("transcript", "full")
+    transcript = payload.get("transcript", {})
+    segments = transcript.get("segments", [])
+    if policy == "none":
+        span_kind = "segments" if segments else "paragraphs"
+    elif segments:
+        span_kind = "segments"
+        span = max(duration, segments[-1].get("end", 0.0)) or 1.0
+        if policy == "window":
+            span = config.get("window_sec", 10)
+            segments = [s for s in segments if s.get("start", 0.0) < span]
+        for i, seg in enumerate(segments):
+            # "text" sends only the segment text, joined with spaces
+            sent = (json.dumps(seg.get("text", "").strip())[1:-1] + " "
+                    if policy == "text" else json.dumps(seg) + ", ")
+            items.append({
+                "kind": "transcript",
+                "pos": i,
+                "cost": estimate_text_tokens(sent),
+                "bins": _span_bins(seg.get("start", 0.0), seg.get("end", 0.0), span),
+            })
+    else:
+        span_kind = "paragraphs"
+        text = transcript.get("text", "")
+        span = len(text) or 1
+        for i, (start, end) in enumerate(_paragraph_spans(payload)):
+            items.append({
+                "kind": "transcript",
+                "pos": i,
+                "start": start,
+                "end": end,
+                "cost": estimate_text_tokens(json.dumps(text[start:end])[1:-1] + "\\n\\n"),
+                "bins": _span_bins(start, end, span),
+            })
+    return items, span_kind
+
+
+def _paragraph_spans(payload: dict) -> list[list[int]]:
+    """Paragraph offsets from the payload structure, or blank-line splitting."""
+    if "structure" in payload:
+        return payload["structure"]["paragraphs"]
+    text = payload.get("transcript", {}).get("text", "")
+    spans = []
+    for m in re.finditer(r'\S(?:.*?\S)?(?=\n\s*\n|\s*$)', text, re.DOTALL):
+        spans.append([m.start(), m.end()])
+    return spans
+
+
+def _section_outline(payload: dict) -> list[dict]:
+    """Section headings without offsets or content (budget mode)."""
+    return [{k: sec[k] for k in ("heading", "level", "word_count")}
+            for sec in payload.get("sections", [])]
+
+
+def _budget_fixed_fields(payload: dict) -> dict:
+    """The fields a budget-mode judge view carries whatever is selected."""
+    content_type = payload.get("content_type", "video")
+    fixed = {
+        "source_file": payload.get("source_file"),
+        "content_type": content_type,
+        "metadata": payload.get("metadata", {}),
+        "keyframe_count_total": payload.get("keyframe_count", len(payload.get("keyframes", []))),
+        "keyframe_count_provided": 0,
+        "keyframe_selection_strategy": "none" if content_type == "text" else "budget",
+    }
+    if "text_forensics" in payload:
+        fixed["text_forensics"] = payload["text_forensics"]
+    if content_type == "text":
+        fixed["keyframes"] = []
+        if "sections" in payload:
+            fixed["sections"] = _section_outline(payload)
+    return fixed
+
+
+def _budget_transcript(transcript: dict, spans: list[dict], span_kind: str,
+                       policy: str) -> dict | None:
+    """The transcript object a judge gets for the chosen spans."""
+    if policy == "none":
+        return None
+    language = transcript.get("language", "unknown")
+    if span_kind == "segments":
+        segments = [transcript["segments"][i["pos"]] for i in spans]
+        if policy == "text":
+            return {"language": language,
+                    "text": " ".join(seg.get("text", "").strip() for seg in segments)}
+        return {"language": language, "segments": segments}
+    text = transcript.get("text", "")
+    return {
+        "language": language,
+        "text": "\n\n".join(text[i["start"]:i["end"]] for i in spans),
+        "segments": [],
+    }
+
+
+def select_within_budget(payload: dict, judge_name: str, token_budget: int) -> dict:
+    """
+    Choose keyframes and transcript spans for a judge under a token ceiling.
+
+    Coverage is measured over BUDGET_COVERAGE_BINS slices of the content
+    timeline (characters for text): frames cover nearby bins with decaying
+    weight, transcript spans cover the bins they overlap. Frames with
+    descriptors also earn BUDGET_DIVERSITY_WEIGHT times their distance to
+    the nearest frame already chosen, so a static shot does not win on
+    timeline coverage alone. This is a budgeted maximum-coverage knapsack;
+    it is solved greedily by marginal gain per token, which keeps frames
+    spread out in time and appearance and fills gaps first. Once coverage
+    is saturated, remaining transcript spans are added in time order until
+    the next one would exceed the ceiling.
+
+    Returns the selected frame positions, the judge's transcript object and
+    a report of estimated tokens and coverage.
+    """
+    transcript = payload.get("transcript", {})
+    policy = JUDGE_KEYFRAME_CONFIGS.get(judge_name, {}).get("transcript", "full")
+    items, span_kind = _budget_candidates(payload, judge_name)
+    # Everything _judge_view sends besides the chosen frames and spans
+    fixed = _budget_fixed_fields(payload)
+    skeleton = _budget_transcript(transcript, [], span_kind, policy)
+    if skeleton is not None:
+        fixed["transcript"] = skeleton
+    base_cost = estimate_text_tokens(json.dumps(fixed)) + BUDGET_OVERHEAD_TOKENS
+    remaining = token_budget - base_cost
+
+    if sum(item["cost"] for item in items) <= remaining:
+        chosen = items
+    else:
+        chosen = []
+        cover = {"frame": [0.0] * BUDGET_COVERAGE_BINS,
+                 "transcript": [0.0] * BUDGET_COVERAGE_BINS}
+        weights = {"frame": BUDGET_FRAME_WEIGHT, "transcript": BUDGET_TRANSCRIPT_WEIGHT}
+        seen = []  # descriptors of the frames chosen so far
+        pending = list(items)
+        while pending:
+            best, best_ratio = None, 0.0
+            for item in pending:
+                if item["cost"] > remaining:
+                    continue
+                current = cover[item["kind"]]
+                gain = weights[item["kind"]] * sum(
+                    max(0.0, w - current[b]) for b, w in item["bins"].items()
+                )
+                if item.get("descriptor"):
+                    gain += BUDGET_DIVERSITY_WEIGHT * min(
+                        (descriptor_distance(item["descriptor"], d) for d in seen), default=1.0)
+                ratio = gain / max(item["cost"], 1)
+                if ratio > best_ratio:
+                    best, best_ratio = item, ratio
+            if best is None:
+                break
+            pending.remove(best)
+            chosen.append(best)
+            remaining -= best["cost"]
+            if best.get("descriptor"):
+                seen.append(best["descriptor"])
+            current = cover[best["kind"]]
+            for b, w in best["bins"].items():
+                current[b] = max(current[b], w)
+        # Full bins leave later spans no gain; spend what is left on them in time order
+        for item in sorted((i for i in pending if i["kind"] == "transcript"),
+                           key=lambda i: i["pos"]):
+            if item["cost"] > remaining:
+                break
+            chosen.append(item)
+            remaining -= item["cost"]
+
+    frames = sorted(i["pos"] for i in chosen if i["kind"] == "frame")
+    spans = sorted((i for i in chosen if i["kind"] == "transcript"), key=lambda i: i["pos"])
+    budget_transcript = _budget_transcript(transcript, spans, span_kind, policy)
+    if budget_transcript is not None:
+        fixed["transcript"] = budget_transcript
+    fixed["keyframe_count_provided"] = len(frames)
+    estimated = (estimate_text_tokens(json.dumps(fixed)) + BUDGET_OVERHEAD_TOKENS
+                 + sum(i["cost"] for i in chosen if i["kind"] == "frame"))
+
+    def coverage(kind: str) -> float | None:
+        pool = [i for i in items if i["kind"] == kind]
+        if not pool:
+            return None
+        bins = [0.0] * BUDGET_COVERAGE_BINS
+        for item in chosen:
+            if item["kind"] == kind:
+                for b, w in item["bins"].items():
+                    bins[b] = max(bins[b], w)
+        return round(sum(bins) / BUDGET_COVERAGE_BINS, 3)
+
+    return {
+        "frames": frames,
+        "transcript": budget_transcript,
+        "report": {
+            "ceiling": token_budget,
+            "estimated_tokens": estimated,
+            # The fixed fields alone can exceed a small ceiling
+            "over_budget": estimated > token_budget,
+            "frames_selected": len(frames),
+            "transcript_spans_selected": len(spans),
+            "transcript_spans_total": sum(1 for i in items if i["kind"] == "transcript"),
+            "frame_coverage": coverage("frame"),
+            "transcript_coverage": coverage("transcript"),
+        },
+    }
+
+
 def format_for_judge(payload: dict, judge_name: str,
-                     include_images: bool = True) -> dict:
-    """Build a judge-specific view of the payload."""
+                     include_images: bool = True,
+                     text_view: str = "full",
+                     token_budget: int | None = None) -> dict:
+    """
+    Build a judge-specific view of the payload.
+
+    The judge's "transcript" policy decides which transcript fields are
+    sent (the key is omitted for "none"). For text content, ``text_view``
+    picks how the document is materialized: "full" sends transcript.text
+    plus the offset section index, "sections" sends per-section content and
+    drops transcript.text. Either way the document body appears exactly
+    once. Judges without a transcript get per-section content, since they
+    have no text for the offsets to point into.
+
+    With ``token_budget`` the keyframes and transcript spans are chosen by
+    select_within_budget() instead of the fixed strategy, and the view
+    carries a ``token_budget`` report.
+    """
+    return _judge_view(payload, judge_name, include_images, text_view, token_budget)[0]
+
+
+def _judge_view(payload: dict, judge_name: str, include_images: bool,
+                text_view: str, token_budget: int | None) -> tuple[dict, list[int]]:
+    """format_for_judge() plus the positions of the keyframes it selected."""
     content_type = payload.get("content_type", "video")
     config = JUDGE_KEYFRAME_CONFIGS.get(judge_name, {"strategy": "all"})
-    selected = select_keyframes(payload.get("keyframes", []), config)
+    transcript = select_transcript(payload["transcript"], config, content_type)
+    frames = payload.get("keyframes", [])
+    budget = None
+    if token_budget is not None:
+        budget = select_within_budget(payload, judge_name, token_budget)
+        positions = budget["frames"]
+        transcript = budget["transcript"]
+        strategy = "budget"
+    else:
+        positions, strategy = select_keyframe_positions(frames, config)
+    selected = [frames[i] for i in positions]
 
     judge_payload = {
         "source_file": payload["source_file"],
         "content_type": content_type,
         "metadata": payload["metadata"],
-        "transcript": payload["transcript"],
         "keyframe_count_total": payload.get("keyframe_count", len(payload.get("keyframes", []))),
         "keyframe_count_provided": len(selected),
-        "keyframe_selection_strategy": config["strategy"],
+        "keyframe_selection_strategy": strategy,
     }
 
+    if transcript is not None:
+        judge_payload["transcript"] = transcript
+
     # Pass through text_forensics data if present in payload
     if "text_forensics" in payload:
         judge_payload["text_forensics"] = payload["text_forensics"]
@@ -82,58 +485,312 @@ def format_for_judge(payload: dict, judge_name: str,
         judge_payload["keyframe_count_provided"] = 0
         judge_payload["keyframe_selection_strategy"] = "none"
         if "sections" in payload:
-            judge_payload["sections"] = payload["sections"]
+            if budget:
+                # Offsets don't apply to the trimmed text; send the outline
+                judge_payload["sections"] = _section_outline(payload)
+            elif transcript is None:
+                judge_payload["sections"] = materialize_sections(payload)
+            elif text_view == "sections":
+                judge_payload["transcript"] = {
+                    k: v for k, v in payload["transcript"].items() if k != "text"
+                }
+                judge_payload["sections"] = materialize_sections(payload)
+            else:
+                judge_payload["sections"] = payload["sections"]
     elif include_images:
-        judge_payload["keyframes"] = selected
+        judge_payload["keyframes"] = judge_frames(selected)
     else:
         judge_payload["keyframes"] = strip_base64(selected)
 
-    return judge_payload
+    if budget:
+        judge_payload["token_budget"] = budget["report"]
 
+    return judge_payload, positions if content_type != "text" else []
 
-def format_all_judges(payload: dict, include_images: bool = True) -> dict[str, dict]:
-    """Build payloads for all judges."""
+
+def format_all_judges(payload: dict, include_images: bool = True,
+                      text_view: str = "full",
+                      budgets: dict[str, int] | None = None) -> dict[str, dict]:
+    """Build payloads for all judges (``budgets`` maps judge -> token ceiling)."""
     result = {}
     for judge_name in JUDGE_KEYFRAME_CONFIGS:
         # Critic and orchestrator never get images
         judge_images = include_images and JUDGE_KEYFRAME_CONFIGS[judge_name]["strategy"] != "none"
-        result[judge_name] = format_for_judge(payload, judge_name, include_images=judge_images)
+        result[judge_name] = format_for_judge(payload, judge_name, include_images=judge_images,
+                                              text_view=text_view,
+                                              token_budget=(budgets or {}).get(judge_name))
     return result
 
 
+# Fields identical for every judge; written once to base.json by write_judge_files
+SHARED_JUDGE_FIELDS = ("source_file", "content_type", "metadata", "transcript",
+                       "text_forensics", "sections")
+JUDGE_BASE_FILENAME = "base.json"
+JUDGE_FRAMES_DIRNAME = "frames"
+JUDGE_TRANSCRIPT_FILENAME = "transcript_{}.json"
+
+
+def keyframe_metadata(frames) -> list[dict]:
+    """Keyframe fields without base64, read from the index when lazy."""
+    if isinstance(frames, LazyKeyframes):
+        return [frames.metadata(i) for i in range(len(frames))]
+    return [{k: v for k, v in f.items() if k != "base64"} for f in frames]
+
+
+def write_judge_files(payload: dict, output_dir: str, include_images: bool = True,
+                      text_view: str = "full",
+                      budgets: dict[str, int] | None = None) -> dict:
+    """
+    Write every judge's view into ``output_dir`` in one pass.
+
+    Produces ``base.json`` with the fields shared by all judges, one
+    ``<judge>.json`` per judge holding only its own fields plus a reference
+    to the base, and each selected keyframe once as an image file under
+    ``frames/`` that judge files point to by relative path. Only frames
+    selected by at least one judge are decoded. When judges get different
+    transcripts (transcript policies or ``budgets``), each transcript shared
+    by several judges is written once as ``transcript_<policy>.json``, named
+    by the judge file's ``transcript_file``; a transcript only one judge gets
+    stays in its file.
+
+    Returns a summary of the files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    frames = payload.get("keyframes", [])
+    meta_payload = _metadata_payload(payload)
+
+    views = {}
+    needed: dict[int, str] = {}
+    for judge_name in JUDGE_KEYFRAME_CONFIGS:
+        view, positions = _judge_view(meta_payload, judge_name, True, text_view,
+                                      (budgets or {}).get(judge_name))
+        if include_images:
+            refs = []
+            for pos, frame in zip(positions, view["keyframes"]):
+                path = f"{JUDGE_FRAMES_DIRNAME}/{frame.get('filename', f'frame_{pos:04d}.jpg')}"
+                needed[pos] = path
+                refs.append({**frame, "path": path})
+            view["keyframes"] = refs
+        views[judge_name] = view
+
+    first = next(iter(views.values()))
+    base = {k: first[k] for k in common_judge_fields(views)}
+    with open(os.path.join(output_dir, JUDGE_BASE_FILENAME), "w") as f:
+        json.dump(base, f, indent=2)
+
+    transcript_files: dict[str, str] = {}
+    if "transcript" not in base:
+        groups: dict[str, list[str]] = {}
+        for judge_name, view in views.items():
+            if "transcript" in view:
+                groups.setdefault(canonical_json(view["transcript"]), []).append(judge_name)
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            policies = {JUDGE_KEYFRAME_CONFIGS[j].get("transcript", "full") for j in members}
+            # Text payloads send the whole document under every policy
+            label = policies.pop() if len(policies) == 1 else "full"
+            name = JUDGE_TRANSCRIPT_FILENAME.format(label)
+            n = 1
+            while name in transcript_files.values():
+                n += 1
+                name = JUDGE_TRANSCRIPT_FILENAME.format(f"{label}_{n}")
+            with open(os.path.join(output_dir, name), "w") as f:
+                json.dump(views[members[0]]["transcript"], f, indent=2)
+            transcript_files.update(dict.fromkeys(members, name))
+
+    bytes_written = 0
+    if needed:
+        os.makedirs(os.path.join(output_dir, JUDGE_FRAMES_DIRNAME), exist_ok=True)
+    for pos, path in sorted(needed.items()):
+        if isinstance(frames, LazyKeyframes):
+            data = frames.image_bytes(pos)  # zero-copy for binary payloads
+        else:
+            data = base64.b64decode(frames[pos]["base64"])
+        with open(os.path.join(output_dir, path), "wb") as f:
+            f.write(data)
+        bytes_written += len(data)
+
+    judge_files = {}
+    for judge_name, view in views.items():
+        judge_doc = {"base": JUDGE_BASE_FILENAME, "judge": judge_name}
+        if judge_name in transcript_files:
+            judge_doc["transcript_file"] = transcript_files[judge_name]
+        judge_doc.update({k: v for k, v in view.items() if k not in base
+                          and not (k == "transcript" and judge_name in transcript_files)})
+        path = os.path.join(output_dir, f"{judge_name}.json")
+        with open(path, "w") as f:
+            json.dump(judge_doc, f, indent=2)
+        judge_files[judge_name] = path
+
+    return {
+        "output_dir": os.path.abspath(output_dir),
+        "base": os.path.join(output_dir, JUDGE_BASE_FILENAME),
+        "judges": judge_files,
+        "transcripts": sorted(set(transcript_files.values())),
+        "frames_written": len(needed),
+        "frame_bytes_written": bytes_written,
+    }
+
+
+def canonical_json(obj) -> str:
+    """Deterministic compact serialization (sorted keys, no whitespace)."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _metadata_payload(payload: dict) -> dict:
+    """The payload with keyframes reduced to metadata (no images decoded)."""
+    meta = {k: payload[k] for k in payload if k != "keyframes"}
+    meta["keyframes"] = keyframe_metadata(payload.get("keyframes", []))
+    return meta
+
+
+def common_judge_fields(views: dict[str, dict]) -> tuple[str, ...]:
+    """SHARED_JUDGE_FIELDS present and identical in every judge view."""
+    first, *rest = views.values()
+    return tuple(k for k in SHARED_JUDGE_FIELDS
+                 if k in first and all(k in v and v[k] == first[k] for v in rest))
+
+
+def shared_judge_fields(payload: dict, text_view: str = "full",
+                        budgets: dict[str, int] | None = None) -> tuple[str, ...]:
+    """Fields identical across every judge's view of ``payload``."""
+    views = format_all_judges(_metadata_payload(payload), include_images=False,
+                              text_view=text_view, budgets=budgets)
+    return common_judge_fields(views)
+
+
+def format_cache_layout(payload: dict, judge_name: str, include_images: bool = True,
+                        text_view: str = "full", budgets: dict[str, int] | None = None,
+                        shared: tuple[str, ...] | None = None) -> dict:
+    """
+    Split a judge view into a cacheable shared prefix and a judge suffix.
+
+    The prefix holds the fields identical in every judge's view (see
+    shared_judge_fields(); pass ``shared`` to reuse it), serialized
+    canonically, so it is byte-identical for every judge of the same
+    payload and prompt caching can hit after the first dispatch. A
+    transcript that differs between transcript policies follows as its own
+    block, byte-identical for judges with the same policy, so those judges
+    share a second cache breakpoint (empty when the judge has no transcript
+    or it is already in the prefix). Everything judge-specific (keyframe
+    selection and images) goes into the suffix, which must come last.
+    """
+    if shared is None:
+        shared = shared_judge_fields(payload, text_view, budgets)
+    view = format_for_judge(payload, judge_name, include_images=include_images,
+                            text_view=text_view,
+                            token_budget=(budgets or {}).get(judge_name))
+    prefix_fields = {k: view[k] for k in shared}
+    transcript = ""
+    if "transcript" in view and "transcript" not in prefix_fields:
+        transcript = canonical_json({"transcript": view["transcript"]})
+    suffix = {"judge": judge_name}
+    suffix.update({k: v for k, v in view.items()
+                   if k not in prefix_fields and not (transcript and k == "transcript")})
+    prefix = canonical_json(prefix_fields)
+    return {
+        "judge": judge_name,
+        "prefix": prefix,
+        "prefix_sha256": hashlib.sha256(prefix.encode("utf-8")).hexdigest(),
+        "transcript": transcript,
+        "transcript_sha256": (hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+                              if transcript else None),
+        "suffix": canonical_json(suffix),
+    }
+
+
+def cache_layout_report(payload: dict, include_images: bool = True,
+                        text_view: str = "full",
+                        budgets: dict[str, int] | None = None) -> dict:
+    """
+    Report each judge's prefix and transcript-block hashes.
+
+    ``cache_eligible`` means all prefixes match; ``transcript_groups`` lists
+    the judges that share each transcript block.
+    """
+    judges = {}
+    shared = shared_judge_fields(payload, text_view, budgets)
+    for judge_name in JUDGE_KEYFRAME_CONFIGS:
+        judge_images = include_images and JUDGE_KEYFRAME_CONFIGS[judge_name]["strategy"] != "none"
+        layout = format_cache_layout(payload, judge_name, include_images=judge_images,
+                                     text_view=text_view, budgets=budgets, shared=shared)
+        judges[judge_name] = {
+            "prefix_sha256": layout["prefix_sha256"],
+            "prefix_bytes": len(layout["prefix"].encode("utf-8")),
+            "transcript_sha256": layout["transcript_sha256"],
+            "transcript_bytes": len(layout["transcript"].encode("utf-8")),
+            "suffix_bytes": len(layout["suffix"].encode("utf-8")),
+        }
+    hashes = {j["prefix_sha256"] for j in judges.values()}
+    groups: dict[str, list[str]] = {}
+    for judge_name, judge in judges.items():
+        if judge["transcript_sha256"]:
+            groups.setdefault(judge["transcript_sha256"], []).append(judge_name)
+    return {
+        "cache_eligible": len(hashes) == 1,
+        "shared_prefix_sha256": hashes.pop() if len(hashes) == 1 else None,
+        "transcript_groups": groups,
+        "judges": judges,
+    }
+
+
 def estimate_token_sizes(judge_payloads: dict[str, dict]) -> dict[str, int]:
-    """Estimate token counts per judge payload."""
+    """
+    Estimate token counts per judge payload.
+
+    Text uses the BPE-approximating counter on the serialized JSON (so
+    escapes are counted as sent); images use their pixel dimensions.
+    """
     estimates = {}
     for judge_name, payload in judge_payloads.items():
-        # Text tokens: ~4 chars per token
         text_json = json.dumps({k: v for k, v in payload.items() if k != "keyframes"})
-        text_tokens = len(text_json) // 4
-
-        # Image tokens: estimate based on resolution
-        # Claude vision: ~1600 tokens for standard images, varies with size
-        image_count = sum(
-            1 for f in payload.get("keyframes", []) if "base64" in f
+        text_tokens = estimate_text_tokens(text_json)
+        image_tokens = sum(
+            frame_image_tokens(f) for f in payload.get("keyframes", []) if "base64" in f
         )
-        image_tokens = image_count * 1600
-
         estimates[judge_name] = text_tokens + image_tokens
 
     return estimates
 
 
-def estimate_shared_payload_tokens(payload: dict) -> dict:
-    """Estimate how many tokens are shared (cacheable) across judges."""
-    # Shared content: metadata + transcript (identical for all judges)
-    shared_json = json.dumps({
-        "source_file": payload.get("source_file", ""),
-        "content_type": payload.get("content_type", ""),
-        "metadata": payload.get("metadata", {}),
-        "transcript": payload.get("transcript", {}),
-    })
-    shared_text_tokens = len(shared_json) // 4
+def estimate_transcript_savings(payload: dict,
+                                judge_payloads: dict[str, dict]) -> dict[str, int]:
+    """Text tokens each judge saves versus receiving the full transcript."""
+    full = estimate_text_tokens(json.dumps(payload.get("transcript", {})))
+    return {
+        judge: full - estimate_text_tokens(json.dumps(view["transcript"]))
+        if "transcript" in view else full
+        for judge, view in judge_payloads.items()
+    }
+
+
+def estimate_shared_payload_tokens(payload: dict, text_view: str = "full",
+                                   budgets: dict[str, int] | None = None) -> dict:
+    """
+    Estimate how many tokens are shared (cacheable) across judges.
+
+    The prefix is shared by every judge and each transcript block by the
+    judges of its group; every judge after the first of a group can read
+    the cache instead of paying full input.
+    """
+    shared = shared_judge_fields(payload, text_view, budgets)
+    prefix_tokens = 0
+    groups: dict[str, dict] = {}
+    for judge_name in JUDGE_KEYFRAME_CONFIGS:
+        layout = format_cache_layout(payload, judge_name, include_images=False,
+                                     text_view=text_view, budgets=budgets, shared=shared)
+        prefix_tokens = estimate_text_tokens(layout["prefix"])
+        if layout["transcript"]:
+            group = groups.setdefault(layout["transcript_sha256"], {
+                "judges": [], "tokens": estimate_text_tokens(layout["transcript"])})
+            group["judges"].append(judge_name)
 
     return {
-        "shared_text_tokens": shared_text_tokens,
+        "shared_text_tokens": prefix_tokens,
+        "transcript_groups": list(groups.values()),
+        "cacheable_tokens": prefix_tokens * (len(JUDGE_KEYFRAME_CONFIGS) - 1) + sum(
+            g["tokens"] * (len(g["judges"]) - 1) for g in groups.values()),
         "unique_per_judge": "keyframe images (varies by judge config)",
         "cache_savings_note": "With prompt caching, shared tokens are charged at 10% after first judge",
     }
@@ -143,7 +800,8 @@ def main():
     parser = argparse.ArgumentParser(
         description="Format preprocessed payload for judge consumption"
     )
-    parser.add_argument("payload", help="Path to payload JSON from preprocess_video.py")
+    parser.add_argument("payload", help="Path to payload JSON from preprocess_video.py "
+                                        "(indexed payloads are read lazily via mmap)")
     parser.add_argument("-j", "--judge", help="Format for specific judge only")
     parser.add_argument("--no-images", action="store_true",
                         help="Strip base64 image data (text metadata only)")
@@ -151,20 +809,64 @@ def main():
                         help="Print estimated token counts per judge")
     parser.add_argument("--cache-analysis", action="store_true",
                         help="Show prompt caching analysis for the payload")
+    parser.add_argument("--text-view", default="full", choices=["full", "sections"],
+                        help="Text payloads: send full text + section offsets, "
+                             "or per-section content without full text (default: full)")
+    parser.add_argument("--cache-layout", action="store_true",
+                        help="Emit the canonical shared prefix followed by the judge suffix "
+                             "(with -j), or report per-judge prefix hashes")
+    parser.add_argument("--budget", action="store_true",
+                        help="Select keyframes and transcript spans per judge to fit "
+                             "JUDGE_TOKEN_BUDGETS, maximizing timeline coverage")
+    parser.add_argument("--token-budget", type=int,
+                        help="Token ceiling for every judge (implies --budget)")
+    parser.add_argument("--output-dir",
+                        help="Write base.json, one <judge>.json per judge and shared frame "
+                             "images into this directory in one pass")
     args = parser.parse_args()
 
-    with open(args.payload) as f:
-        payload = json.load(f)
-
-    if args.cache_analysis:
-        shared = estimate_shared_payload_tokens(payload)
-        all_payloads = format_all_judges(payload, include_images=not args.no_images)
+    # Fields and keyframes are decoded lazily when the payload has an index
+    payload = open_payload(args.payload)
+
+    budgets = None
+    if args.token_budget is not None:
+        budgets = {judge: args.token_budget for judge in JUDGE_KEYFRAME_CONFIGS}
+    elif args.budget:
+        budgets = dict(JUDGE_TOKEN_BUDGETS)
+
+    if args.output_dir:
+        summary = write_judge_files(payload, args.output_dir,
+                                    include_images=not args.no_images,
+                                    text_view=args.text_view, budgets=budgets)
+        print(json.dumps(summary, indent=2))
+    elif args.cache_layout:
+        if args.judge:
+            layout = format_cache_layout(payload, args.judge,
+                                         include_images=not args.no_images,
+                                         text_view=args.text_view, budgets=budgets)
+            print(layout["prefix"])
+            print(layout["transcript"])
+            print(layout["suffix"])
+            print(f"prefix sha256: {layout['prefix_sha256']}", file=sys.stderr)
+            if layout["transcript"]:
+                print(f"transcript sha256: {layout['transcript_sha256']}", file=sys.stderr)
+        else:
+            report = cache_layout_report(payload, include_images=not args.no_images,
+                                         text_view=args.text_view, budgets=budgets)
+            print(json.dumps(report, indent=2))
+    elif args.cache_analysis:
+        shared = estimate_shared_payload_tokens(payload, args.text_view, budgets)
+        all_payloads = format_all_judges(payload, include_images=not args.no_images,
+                                         text_view=args.text_view, budgets=budgets)
         estimates = estimate_token_sizes(all_payloads)
         total = sum(estimates.values())
 
         print("Prompt Caching Analysis")
         print("=" * 55)
         print(f"  Shared text tokens (cacheable): {shared['shared_text_tokens']:>8,}")
+        for group in shared["transcript_groups"]:
+            print(f"  Transcript block tokens:        {group['tokens']:>8,} "
+                  f"({', '.join(group['judges'])})")
         print(f"  Total tokens across all judges: {total:>8,}")
         print()
         print("  Per-judge breakdown:")
@@ -175,24 +877,33 @@ def main():
         print()
         print("  Cache savings estimate:")
         print(f"    Without caching: {total:>8,} input tokens total")
-        # 5 of 6 judges get cache hits on shared content
-        cacheable = shared["shared_text_tokens"] * 5
+        # Every judge after the first of its group reads the shared content
+        cacheable = shared["cacheable_tokens"]
         savings_tokens = int(cacheable * 0.9)  # 90% discount on cached
-        print(f"    Cacheable tokens: {cacheable:>7,} (shared text x 5 cache-hit judges)")
+        print(f"    Cacheable tokens: {cacheable:>7,} (shared text read from cache)")
         print(f"    Estimated savings: ~{savings_tokens:,} tokens worth of cost")
     elif args.judge:
-        result = format_for_judge(payload, args.judge, include_images=not args.no_images)
+        result = format_for_judge(payload, args.judge, include_images=not args.no_images,
+                                  text_view=args.text_view,
+                                  token_budget=(budgets or {}).get(args.judge))
         print(json.dumps(result, indent=2))
     else:
-        all_payloads = format_all_judges(payload, include_images=not args.no_images)
+        all_payloads = format_all_judges(payload, include_images=not args.no_images,
+                                         text_view=args.text_view, budgets=budgets)
 
         if args.estimate_tokens:
             estimates = estimate_token_sizes(all_payloads)
+            savings = estimate_transcript_savings(payload, all_payloads)
             total = sum(estimates.values())
             print("Estimated token counts per judge:")
             for judge, tokens in sorted(estimates.items()):
-                print(f"  {judge:25s}: {tokens:>8,} tokens")
+                ceiling = budgets.get(judge) if budgets else None
+                note = f"  (budget {ceiling:,})" if ceiling else ""
+                policy = JUDGE_KEYFRAME_CONFIGS.get(judge, {}).get("transcript", "full")
+                print(f"  {judge:25s}: {tokens:>8,} tokens  "
+                      f"[transcript {policy}: -{savings[judge]:,}]{note}")
             print(f"  {'TOTAL':25s}: {total:>8,} tokens")
+            print(f"  {'Transcript policy savings':25s}: {sum(savings.values()):>8,} tokens")
         else:
             print(json.dumps(all_payloads, indent=2))
 
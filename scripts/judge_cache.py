@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Memoized judge responses for partial re-evaluation.
+
+A stage's response is cached under a key built from everything that can
+change it: the stage (judge and round), the model, the hash of the judge
+view it reads (its judge file, base.json and the frames it lists), the
+hash of its prompt files (its SKILL.md or agent file plus the shared
+references, of which prompt-templates.md contributes only the sections the
+stage reads) and the hashes of the upstream outputs it is given. When only
+the critic or synthesizer prompt changes, every judge key still matches
+and only the stages whose inputs changed need dispatching. Responses are
+kept in SQLite (WAL) and evicted least-recently-used beyond a size bound.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from format_payload import JUDGE_BASE_FILENAME, canonical_json
+from token_tracker import STAGE_MODELS, estimate_pipeline_cost, payload_view, stage_kind
+
+
+DEFAULT_CACHE_PATH = "themis-judge-cache.db"
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_ENTRIES = 10000
+CACHE_SCHEMA_VERSION = 1
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROMPT_TEMPLATES_FILE = "skills/themis-evaluate/references/prompt-templates.md"
+SHARED_PROMPT_FILES = (
+    "skills/themis-evaluate/references/output-schema.md",
+    "skills/themis-evaluate/references/debate-protocol.md",
+    PROMPT_TEMPLATES_FILE,
+)
+# prompt-templates.md sections read only by some stages (stage kinds or
+# judge names); every stage hashes the unlisted sections plus its own
+PROMPT_TEMPLATE_SECTION_OWNERS = {
+    "Round 1 Instructions": ("judge_r1", "judge_r2"),
+    "Round 2 Instructions": ("judge_r2",),
+    "Cross-Council Exchange Instructions": ("cross_council",),
+    "Critic Instructions": ("critic",),
+    "Authenticity Analyst Context": ("authenticity_analyst",),
+    "Synthesizer Instructions": ("synthesis",),
+}
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    model TEXT,
+    components TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used_at);
+"""
+
+
+def prompt_files(stage: str) -> list[str]:
+    """Prompt files (relative to the repo root) a stage's agent reads."""
+    kind = stage_kind(stage)
+    if kind in ("judge_r1", "judge_r2"):
+        own = f"skills/themis-{stage[:-3].replace('_', '-')}/SKILL.md"
+    elif kind in ("consensus", "cross_council"):
+        council = "content" if "content" in stage else "market"
+        own = f"agents/themis-{council}-council-lead.md"
+    elif stage == "critic":
+        own = "skills/themis-critic/SKILL.md"
+    elif stage == "synthesis":
+        own = "skills/themis-synthesizer/SKILL.md"
+    else:
+        raise ValueError(f"Stage {stage} has no agent prompt to cache against")
+    return [own, *SHARED_PROMPT_FILES]
+
+
+def _sha256_file(path, h=None):
+    h = h or hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h
+
+
+def template_sections(text: str) -> list[tuple[str, str]]:
+    """``(heading, text)`` per top-level ``## `` section (fenced headings don't count)."""
+    sections = [("", [])]
+    fenced = False
+    for line in text.splitlines(keepends=True):
+        if line.startswith("```"):
+            fenced = not fenced
+        elif not fenced and line.startswith("## "):
+            sections.append((line[3:].strip(), []))
+        sections[-1][1].append(line)
+    return [(heading, "".join(lines)) for heading, lines in sections]
+
+
+def stage_reads_section(stage: str, heading: str) -> bool:
+    """Whether a stage's prompt uses a prompt-templates.md section."""
+    owners = PROMPT_TEMPLATE_SECTION_OWNERS.get(heading)
+    return owners is None or stage_kind(stage) in owners or stage[:-3] in owners
+
+
+def prompt_hash(stage: str, root: Path = REPO_ROOT) -> str:
+    """SHA-256 over a stage's prompt files (missing files hash as absent)."""
+    h = hashlib.sha256()
+    for rel in prompt_files(stage):
+        h.update(rel.encode("utf-8") + b"\0")
+        path = root / rel
+        if rel == PROMPT_TEMPLATES_FILE and path.exists():
+            for heading, text in template_sections(path.read_text(encoding="utf-8")):
+                if stage_reads_section(stage, heading):
+                    h.update(text.encode("utf-8"))
+        elif path.exists():
+            _sha256_file(path, h)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def view_hash(judges_dir: str, stage: str) -> str:
+    """
+    SHA-256 of the judge view a stage reads from a format_payload output dir.
+
+    Covers base.json plus, for stages with their own view (judges, critic,
+    synthesis), that view file, the shared transcript file it names and
+    every frame it lists.
+    """
+    h = hashlib.sha256()
+    _sha256_file(os.path.join(judges_dir, JUDGE_BASE_FILENAME), h)
+    view = payload_view(stage)
+    path = os.path.join(judges_dir, f"{view}.json") if view else None
+    if path and (stage_kind(stage).startswith("judge") or os.path.exists(path)):
+        with open(path) as f:
+            doc = json.load(f)
+        h.update(b"\0" + canonical_json(doc).encode("utf-8"))
+        if "transcript_file" in doc:
+            # Named by policy, not content, so hash what it holds
+            h.update(b"\0")
+            _sha256_file(os.path.join(judges_dir, doc["transcript_file"]), h)
+        for frame in doc.get("keyframes", []):
+            if "path" in frame:
+                h.update(b"\0")
+                _sha256_file(os.path.join(judges_dir, frame["path"]), h)
+    return h.hexdigest()
+
+
+def output_hashes(paths: list[str]) -> list[str]:
+    """
+    Hashes of upstream outputs (JSON files or directories of them), sorted.
+
+    Outputs are hashed canonically, so reformatting or reordering the
+    files does not change the key.
+    """
+    hashes = []
+    for path in paths:
+        files = sorted(Path(path).glob("*.json")) if Path(path).is_dir() else [Path(path)]
+        for file in files:
+            with open(file) as f:
+                hashes.append(hashlib.sha256(canonical_json(json.load(f)).encode("utf-8")).hexdigest())
+    return sorted(hashes)
+
+
+def stage_key(stage: str, judges_dir: str, upstream: list[str] | None = None,
+              mode: str = "full", model: str | None = None,
+              root: Path = REPO_ROOT) -> tuple[str, dict]:
+    """Cache key for one stage and the components it was built from."""
+    components = {
+        "stage": stage,
+        "round": stage_kind(stage),
+        "model": model or STAGE_MODELS.get(mode, STAGE_MODELS["full"]).get(stage, "sonnet"),
+        "view": view_hash(judges_dir, stage),
+        "prompt": prompt_hash(stage, root),
+        "upstream": output_hashes(upstream or []),
+    }
+    return hashlib.sha256(canonical_json(components).encode("utf-8")).hexdigest(), components
+
+
+class JudgeCache:
+    """SQLite-backed response cache with LRU eviction to a byte and entry bound."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, CACHE_SCHEMA_VERSION):
+            raise ValueError(f"Unsupported judge cache version {version}: {path}")
+        with self.conn:
+            self.conn.executescript(CACHE_SCHEMA)
+            self.conn.execute(f"PRAGMA user_version={CACHE_SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key: str) -> dict | None:
+        """The cached response for ``key``, or None; a hit refreshes its LRU position."""
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, response: dict, components: dict | None = None):
+        """Store a response, then evict down to the size bounds."""
+        components = components or {}
+        data = json.dumps(response)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, stage, model, components, response, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, components.get("stage", ""), components.get("model"),
+                 json.dumps(components), data, len(data.encode("utf-8")), now, now))
+        self.evict()
+
+    def evict(self, max_bytes: int | None = None, max_entries: int | None = None) -> int:
+        """Drop least-recently-used responses beyond the bounds; returns how many."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_entries = self.max_entries if max_entries is None else max_entries
+        entries, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if entries <= max_entries and total <= max_bytes:
+            return 0
+        doomed = []
+        for key, size in self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used_at"):
+            if entries <= max_entries and total <= max_bytes:
+                break
+            doomed.append((key,))
+            entries -= 1
+            total -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        return len(doomed)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        entries, total, hits = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses"
+        ).fetchone()
+        by_stage = dict(self.conn.execute(
+            "SELECT stage, COUNT(*) FROM responses GROUP BY stage ORDER BY stage").fetchall())
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "by_stage": by_stage,
+        }
+
+
+def lookup_stages(cache: JudgeCache, stages: list[str], judges_dir: str,
+                  upstream: list[str] | None = None, mode: str = "full",
+                  write_dir: str | None = None) -> dict:
+    """
+    Look up several stages that share the same inputs (e.g. one round).
+
+    Hits are written to ``write_dir/<stage>.json``; misses are the stages
+    that still need dispatching. The saved cost is token_tracker's
+    fixed per-stage estimate for ``mode``.
+    """
+    estimates = estimate_pipeline_cost(mode)["stages"]
+    result = {"hits": [], "misses": [], "keys": {}, "saved_cost_usd": 0.0}
+    for stage in stages:
+        key, _ = stage_key(stage, judges_dir, upstream, mode)
+        result["keys"][stage] = key
+        response = cache.get(key)
+        if response is None:
+            result["misses"].append(stage)
+            continue
+        result["hits"].append(stage)
+        result["saved_cost_usd"] += estimates.get(stage, {}).get("cost_usd", 0.0)
+        if write_dir:
+            os.makedirs(write_dir, exist_ok=True)
+            with open(os.path.join(write_dir, f"{stage}.json"), "w") as f:
+                json.dump(response, f, indent=2)
+    result["saved_cost_usd"] = round(result["saved_cost_usd"], 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoize judge responses across re-evaluations")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help=f"Cache database (default {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_CACHE_MAX_BYTES,
+                        help="Evict least-recently-used responses beyond this total size")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_CACHE_MAX_ENTRIES)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def stage_args(p):
+        p.add_argument("--judges-dir", required=True,
+                       help="format_payload.py --output-dir directory the stages read")
+        p.add_argument("--upstream", nargs="*", default=[],
+                       help="Upstream output files or directories given to the stage(s)")
+        p.add_argument("--mode", default="full", choices=["full", "fast"])
+
+    p = sub.add_parser("lookup", help="Check stages before dispatch; write hits, list misses")
+    p.add_argument("stages", nargs="+", help="Stage names (e.g. hook_analyst_r1 critic)")
+    p.add_argument("--write-dir", help="Write cached responses here as <stage>.json")
+    stage_args(p)
+
+    p = sub.add_parser("store", help="Cache a stage's response after it ran")
+    p.add_argument("stage")
+    p.add_argument("response", help="The stage's output JSON file")
+    stage_args(p)
+
+    p = sub.add_parser("key", help="Print a stage's cache key and its components")
+    p.add_argument("stage")
+    stage_args(p)
+
+    sub.add_parser("stats", help="Entries, size and hits")
+    sub.add_parser("evict", help="Evict down to --max-bytes / --max-entries")
+    sub.add_parser("clear", help="Remove every cached response")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "key":
+            key, components = stage_key(args.stage, args.judges_dir, args.upstream, args.mode)
+            print(json.dumps({"key": key, "components": components}, indent=2))
+            return
+        with JudgeCache(args.cache, args.max_bytes, args.max_entries) as cache:
+            if args.command == "lookup":
+                result = lookup_stages(cache, args.stages, args.judges_dir, args.upstream,
+                                       args.mode, args.write_dir)
+                print(f"  {len(result['hits'])} cached, {len(result['misses'])} to dispatch "
+                      f"(~${result['saved_cost_usd']:.2f} saved)", file=sys.stderr)
+            elif args.command == "store":
+                with open(args.response) as f:
+                    response = json.load(f)
+                key, components = stage_key(args.stage, args.judges_dir, args.upstream, args.mode)
+                cache.put(key, response, components)
+                result = {"stage": args.stage, "key": key}
+            elif args.command == "evict":
+                result = {"evicted": cache.evict(), **cache.stats()}
+            elif args.command == "clear":
+                cache.clear()
+                result = cache.stats()
+            else:
+                result = cache.stats()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compact keyframe descriptors for content-aware frame selection.
+
+Each keyframe is reduced by FFmpeg to an 8x8 RGB thumbnail, from which two
+small descriptors are kept in the frame metadata:
+
+- ``ahash``: 64-bit average hash of the luma (layout / composition)
+- ``hist``: 4-bin histogram per RGB channel (overall color)
+
+descriptor_distance() combines both into a 0-1 distance, so frames can be
+compared without touching the base64 image data.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+THUMB_SIZE = 8
+THUMB_BYTES = THUMB_SIZE * THUMB_SIZE * 3
+HIST_BINS = 4
+# Weight of the layout hash vs. the color histogram in descriptor_distance
+AHASH_WEIGHT = 0.5
+DESCRIPTOR_TIMEOUT_SEC = 60
+
+
+def descriptor_from_rgb(pixels: bytes) -> dict:
+    """Build the descriptor for one 8x8 rgb24 thumbnail."""
+    luma = [
+        (299 * pixels[i] + 587 * pixels[i + 1] + 114 * pixels[i + 2]) // 1000
+        for i in range(0, len(pixels), 3)
+    ]
+    mean = sum(luma) / len(luma)
+    bits = 0
+    for value in luma:
+        bits = (bits << 1) | (value >= mean)
+
+    hist = [0] * (HIST_BINS * 3)
+    for i, value in enumerate(pixels):
+        hist[(i % 3) * HIST_BINS + value * HIST_BINS // 256] += 1
+    return {"ahash": f"{bits:016x}", "hist": hist}
+
+
+def descriptor_distance(a: dict, b: dict) -> float:
+    """Distance between two descriptors, 0 (identical) to 1."""
+    hamming = bin(int(a["ahash"], 16) ^ int(b["ahash"], 16)).count("1") / 64
+    # Each channel histogram sums to 64 pixels; L1 between two is at most 128
+    hist = sum(abs(x - y) for x, y in zip(a["hist"], b["hist"])) / (3 * 2 * THUMB_SIZE ** 2)
+    return AHASH_WEIGHT * hamming + (1 - AHASH_WEIGHT) * hist
+
+
+def compute_descriptors(frame_glob: str, count: int) -> list[dict] | None:
+    """
+    Compute descriptors for the images matching ``frame_glob`` in one FFmpeg run.
+
+    Images are read in sorted filename order. Returns None if FFmpeg fails or
+    does not produce exactly ``count`` thumbnails.
+    """
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        "-pattern_type", "glob", "-i", frame_glob,
+        "-vf", f"scale={THUMB_SIZE}:{THUMB_SIZE}:flags=area,format=rgb24",
+        "-f", "rawvideo", "pipe:1",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=DESCRIPTOR_TIMEOUT_SEC)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    data = result.stdout
+    if result.returncode != 0 or len(data) != count * THUMB_BYTES:
+        return None
+    return [
+        descriptor_from_rgb(data[i:i + THUMB_BYTES])
+        for i in range(0, len(data), THUMB_BYTES)
+    ]
+
+
+def farthest_point_selection(descriptors: list[dict], n: int) -> list[int]:
+    """
+    Pick ``n`` indices that spread out over descriptor space (greedy k-center).
+
+    Starts from the first frame (the opening shot) and repeatedly adds the
+    frame farthest from everything already picked. Returns sorted indices.
+    """
+    if n <= 0 or not descriptors:
+        return []
+    if len(descriptors) <= n:
+        return list(range(len(descriptors)))
+    chosen = [0]
+    nearest = [descriptor_distance(descriptors[0], d) for d in descriptors]
+    while len(chosen) < n:
+        best = max(range(len(descriptors)), key=lambda i: nearest[i])
+        if nearest[best] <= 0:
+            break  # only duplicates of picked frames remain
+        chosen.append(best)
+        for i, d in enumerate(descriptors):
+            nearest[i] = min(nearest[i], descriptor_distance(descriptors[best], d))
+    return sorted(chosen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute keyframe descriptors")
+    parser.add_argument("frame_dir", help="Directory of extracted keyframe JPEGs")
+    args = parser.parse_args()
+
+    count = len(list(Path(args.frame_dir).glob("*.jpg")))
+    descriptors = compute_descriptors(f"{args.frame_dir}/*.jpg", count) if count else []
+    if descriptors is None:
+        print("Error: FFmpeg could not compute descriptors", file=sys.stderr)
+        return 1
+    print(json.dumps(descriptors, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo wall-clock latency simulator for the Themis pipeline.
+
+The pipeline is modeled as a DAG (preprocess -> forensics -> Round 1 judges
+-> Round 2 -> council consensus -> cross-council -> critic -> synthesis).
+Each model stage takes time-to-first-token (plus prefill of its uncached
+input) per API turn plus output tokens / throughput, sampled from per-model
+lognormal distributions; token counts come from token_tracker. Stages are
+list-scheduled under an optional limit on concurrent API stages. Each run
+records the end-to-end latency and the critical path (the chain of stages,
+or concurrency slots, each stage waited on).
+"""
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+from collections import Counter
+
+from token_tracker import (
+    JUDGE_COUNCILS,
+    JUDGE_STAGES,
+    STAGE_MODELS,
+    estimate_pipeline_cost,
+    stage_kind,
+)
+
+
+# Per-model latency: time to first token (median / p95 seconds), output
+# throughput (median / p5 tokens per second) and prefill rate for uncached input
+MODEL_LATENCY = {
+    "haiku": {"ttft_p50": 0.5, "ttft_p95": 1.5, "tps_p50": 150, "tps_p05": 90, "prefill_tps": 30000},
+    "sonnet": {"ttft_p50": 1.2, "ttft_p95": 4.0, "tps_p50": 70, "tps_p05": 40, "prefill_tps": 12000},
+    "opus": {"ttft_p50": 2.5, "ttft_p95": 8.0, "tps_p50": 40, "tps_p05": 22, "prefill_tps": 6000},
+}
+
+# Local (non-API) stages: median / p95 seconds
+LOCAL_STAGE_SEC = {
+    "preprocess": (30.0, 60.0),
+    "text_forensics": (1.0, 3.0),
+}
+
+# API turns per stage kind (a subagent reads its inputs before answering)
+STAGE_TURNS = {
+    "judge_r1": 4,
+    "judge_r2": 2,
+    "consensus": 2,
+    "cross_council": 2,
+    "critic": 3,
+    "synthesis": 3,
+}
+
+# Spread of a stage's output length around its estimate (lognormal sigma)
+OUTPUT_TOKENS_SIGMA = 0.3
+
+DEFAULT_RUNS = 2000
+
+
+def pipeline_dag(mode: str) -> dict[str, list[str]]:
+    """Stage -> prerequisite stages, in dispatch order."""
+    full = mode == "full"
+    dag = {"preprocess": [], "text_forensics": ["preprocess"]}
+    for judge in JUDGE_STAGES:
+        dag[f"{judge}_r1"] = ["text_forensics"]
+    for council, judges in JUDGE_COUNCILS.items():
+        last = [f"{j}_r1" for j in judges]
+        if full:
+            for judge in judges:
+                dag[f"{judge}_r2"] = list(last)
+            last = [f"{j}_r2" for j in judges]
+        dag[f"{council}_council_consensus"] = last
+    consensus = ["content_council_consensus", "market_council_consensus"]
+    if full:
+        dag["cross_council_content"] = list(consensus)
+        dag["cross_council_market"] = list(consensus)
+        dag["critic"] = ["cross_council_content", "cross_council_market"]
+    else:
+        dag["critic"] = list(consensus)
+    dag["synthesis"] = ["critic"]
+    return dag
+
+
+def skip_stages(dag: dict[str, list[str]], skipped) -> dict[str, list[str]]:
+    """Remove stages from a DAG; their dependents inherit their prerequisites."""
+    dag = {stage: list(deps) for stage, deps in dag.items()}
+    for stage in skipped:
+        if stage not in dag:
+            continue
+        inherited = dag.pop(stage)
+        for deps in dag.values():
+            if stage in deps:
+                deps.remove(stage)
+                deps.extend(d for d in inherited if d not in deps)
+    return dag
+
+
+def _lognormal(rng: random.Random, median: float, p95: float) -> float:
+    """Sample a lognormal given its median and 95th percentile."""
+    sigma = math.log(p95 / median) / 1.645 if p95 > median else 0.0
+    return median * math.exp(rng.gauss(0.0, sigma))
+
+
+def sample_duration(rng: random.Random, stage: str, model: str, tokens: dict | None) -> float:
+    """One sampled wall time (seconds) for a stage."""
+    if stage in LOCAL_STAGE_SEC or model == "none" or not tokens:
+        median, p95 = LOCAL_STAGE_SEC.get(stage, (1.0, 2.0))
+        return _lognormal(rng, median, p95)
+    lat = MODEL_LATENCY.get(model, MODEL_LATENCY["sonnet"])
+    turns = STAGE_TURNS.get(stage_kind(stage), 1)
+    ttft = sum(_lognormal(rng, lat["ttft_p50"], lat["ttft_p95"]) for _ in range(turns))
+    prefill = (tokens["input"] - tokens["cache_hits"]) / lat["prefill_tps"]
+    output = tokens["output"] * math.exp(rng.gauss(0.0, OUTPUT_TOKENS_SIGMA))
+    # p5 throughput is the slow tail, i.e. the 95th percentile of sec/token
+    sec_per_token = _lognormal(rng, 1 / lat["tps_p50"], 1 / lat["tps_p05"])
+    return ttft + prefill + output * sec_per_token
+
+
+def schedule(dag: dict[str, list[str]], durations: dict[str, float],
+             concurrency: int | None, local: set[str]) -> tuple[float, list[str]]:
+    """
+    List-schedule one run; returns (makespan, critical path).
+
+    Ready stages start in dispatch order while fewer than ``concurrency`` API
+    stages run (local stages are not limited). A stage's cause is the event
+    it started on: its last prerequisite to finish, or the stage whose
+    finish freed a slot; following causes back from the last stage gives
+    the critical path.
+    """
+    order = {stage: i for i, stage in enumerate(dag)}
+    remaining = {stage: len(deps) for stage, deps in dag.items()}
+    dependents: dict[str, list[str]] = {stage: [] for stage in dag}
+    for stage, deps in dag.items():
+        for dep in deps:
+            dependents[dep].append(stage)
+
+    ready = [(order[s], s) for s, n in remaining.items() if n == 0]
+    heapq.heapify(ready)
+    running: list[tuple[float, str]] = []
+    cause: dict[str, str] = {}
+    finish: dict[str, float] = {}
+    api_running = 0
+    now = 0.0
+    while ready or running:
+        waiting = []
+        while ready:
+            item = heapq.heappop(ready)
+            stage = item[1]
+            if stage not in local and concurrency and api_running >= concurrency:
+                waiting.append(item)
+                continue
+            heapq.heappush(running, (now + durations[stage], stage))
+            if stage not in local:
+                api_running += 1
+        for item in waiting:
+            heapq.heappush(ready, item)
+
+        now, done = heapq.heappop(running)
+        finish[done] = now
+        if done not in local:
+            api_running -= 1
+        for _, stage in ready:
+            cause[stage] = done
+        for nxt in dependents[done]:
+            remaining[nxt] -= 1
+            if remaining[nxt] == 0:
+                cause[nxt] = done
+                heapq.heappush(ready, (order[nxt], nxt))
+
+    stage = max(finish, key=finish.get)
+    makespan = finish[stage]
+    path = [stage]
+    while stage in cause:
+        stage = cause[stage]
+        path.append(stage)
+    return makespan, path[::-1]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def simulate(mode: str, runs: int = DEFAULT_RUNS, concurrency: int | None = None,
+             stage_tokens: dict | None = None, seed: int = 0,
+             skipped: list[str] | None = None) -> dict:
+    """
+    Monte Carlo latency for one mode and concurrency limit.
+
+    ``stage_tokens`` is token_tracker's per-stage summary (input, output,
+    cache_hits); by default its fixed estimates for ``mode`` are used.
+    ``skipped`` stages (e.g. from debate_planner.py) are left out.
+    """
+    if stage_tokens is None:
+        stage_tokens = estimate_pipeline_cost(mode)["stages"]
+    models = STAGE_MODELS.get(mode, STAGE_MODELS["full"])
+    dag = skip_stages(pipeline_dag(mode), skipped or [])
+    local = {stage for stage in dag
+             if stage in LOCAL_STAGE_SEC or models.get(stage, "sonnet") == "none"}
+    rng = random.Random(seed)
+
+    makespans = []
+    paths: Counter = Counter()
+    on_path: Counter = Counter()
+    stage_sec: dict[str, list[float]] = {stage: [] for stage in dag}
+    for _ in range(runs):
+        durations = {
+            stage: sample_duration(rng, stage, models.get(stage, "sonnet"), stage_tokens.get(stage))
+            for stage in dag
+        }
+        makespan, path = schedule(dag, durations, concurrency, local)
+        makespans.append(makespan)
+        paths[tuple(path)] += 1
+        on_path.update(set(path))
+        for stage, sec in durations.items():
+            stage_sec[stage].append(sec)
+
+    makespans.sort()
+    top_path, top_count = paths.most_common(1)[0]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "runs": runs,
+        "p50_sec": round(_percentile(makespans, 0.50), 1),
+        "p95_sec": round(_percentile(makespans, 0.95), 1),
+        "mean_sec": round(sum(makespans) / runs, 1),
+        "critical_path": list(top_path),
+        "critical_path_share": round(top_count / runs, 3),
+        # Share of runs in which each stage was on the critical path
+        "criticality": {
+            stage: round(on_path[stage] / runs, 3)
+            for stage in sorted(dag, key=lambda s: -on_path[s]) if on_path[stage]
+        },
+        "stage_p50_sec": {
+            stage: round(_percentile(sorted(secs), 0.50), 1) for stage, secs in stage_sec.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate Themis pipeline wall-clock latency")
+    parser.add_argument("--mode", default="both", choices=["full", "fast", "both"])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help=f"Monte Carlo runs per setting (default {DEFAULT_RUNS})")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[0],
+                        help="Limits on concurrent API stages to compare (0 = unlimited)")
+    parser.add_argument("--payload",
+                        help="Size stage inputs/outputs from this payload (token_tracker --payload)")
+    parser.add_argument("--preprocess-sec", type=float, nargs=2, metavar=("P50", "P95"),
+                        help="Preprocessing time distribution (default "
+                             f"{LOCAL_STAGE_SEC['preprocess'][0]:g} / "
+                             f"{LOCAL_STAGE_SEC['preprocess'][1]:g})")
+    parser.add_argument("--plan",
+                        help="Debate plan JSON from debate_planner.py; its skipped stages "
+                             "are left out of full mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage-times", action="store_true",
+                        help="Include each stage's median duration")
+    args = parser.parse_args()
+
+    if args.preprocess_sec:
+        LOCAL_STAGE_SEC["preprocess"] = tuple(args.preprocess_sec)
+    payload = None
+    skipped = []
+    try:
+        if args.payload:
+            from payload_io import open_payload
+            payload = open_payload(args.payload)
+        if args.plan:
+            with open(args.plan) as f:
+                skipped = json.load(f)["skipped_stages"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    modes = ["full", "fast"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        stage_tokens = estimate_pipeline_cost(mode, payload=payload)["stages"]
+        for limit in args.concurrency:
+            result = simulate(mode, args.runs, limit or None, stage_tokens, args.seed,
+                              skipped if mode == "full" else None)
+            print(f"  {mode:4s} concurrency {limit or 'unlimited':>9}: "
+                  f"p50 {result['p50_sec']:6.1f}s  p95 {result['p95_sec']:6.1f}s",
+                  file=sys.stderr)
+            if not args.stage_times:
+                del result["stage_p50_sec"]
+            results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,15 @@ cross-council adjustments, and critic adjustments.
 
 import argparse
 import json
+import sqlite3
 import sys
 from datetime import datetime, timezone
 
+from cost_governor import metadata_entry
+from eval_store import EvaluationStore
+from payload_io import content_hash, open_payload
+from token_tracker import ingest_usage, session_log_paths
+
 
 # Virality component weights
 COMPONENT_WEIGHTS = {
@@ -33,6 +39,19 @@ TIER_THRESHOLDS = [
 MAX_CROSS_COUNCIL_ADJUSTMENT = 5
 MAX_CRITIC_ADJUSTMENT = 10
 
+# Which council owns each component
+CONTENT_COMPONENTS = ("hook_effectiveness", "emotional_resonance", "production_quality")
+MARKET_COMPONENTS = ("trend_alignment", "shareability")
+
+# Critic challenges target judges; map them to the component they own
+CRITIC_TARGET_COMPONENTS = {
+    "hook_analyst": "hook_effectiveness",
+    "emotion_analyst": "emotional_resonance",
+    "production_analyst": "production_quality",
+    "trend_analyst": "trend_alignment",
+    "audience_mapper": "shareability",
+}
+
 
 def score_to_tier(score: int) -> str:
     """Map a 0-100 score to a virality tier."""
@@ -123,11 +142,8 @@ def merge_council_scores(
     mc_scores = market_council.get("consensus_scores", {})
 
     components = {
-        "hook_effectiveness": cc_scores.get("hook_effectiveness", {}).get("score", 50),
-        "emotional_resonance": cc_scores.get("emotional_resonance", {}).get("score", 50),
-        "production_quality": cc_scores.get("production_quality", {}).get("score", 50),
-        "trend_alignment": mc_scores.get("trend_alignment", {}).get("score", 50),
-        "shareability": mc_scores.get("shareability", {}).get("score", 50),
+        **{dim: cc_scores.get(dim, {}).get("score", 50) for dim in CONTENT_COMPONENTS},
+        **{dim: mc_scores.get(dim, {}).get("score", 50) for dim in MARKET_COMPONENTS},
     }
 
     # Apply cross-council adjustments if present
@@ -154,16 +170,8 @@ def merge_council_scores(
             # Parse numeric adjustments from suggestion text
             if isinstance(adj, (int, float)):
                 target = challenge.get("target_judge", "")
-                # Map judge to component
-                judge_to_component = {
-                    "hook_analyst": "hook_effectiveness",
-                    "emotion_analyst": "emotional_resonance",
-                    "production_analyst": "production_quality",
-                    "trend_analyst": "trend_alignment",
-                    "audience_mapper": "shareability",
-                }
-                if target in judge_to_component:
-                    dim = judge_to_component[target]
+                if target in CRITIC_TARGET_COMPONENTS:
+                    dim = CRITIC_TARGET_COMPONENTS[target]
                     components[dim] = apply_adjustment(
                         components[dim], adj, MAX_CRITIC_ADJUSTMENT
                     )
@@ -219,8 +227,14 @@ def merge_council_scores(
 
 def build_metadata(mode: str, debate_rounds: int, judges_used: list[str],
                    total_tokens: int = 0, input_tokens: int = 0,
-                   output_tokens: int = 0, cache_hit_tokens: int = 0) -> dict:
-    """Build the metadata section with mode-aware cost estimation."""
+                   output_tokens: int = 0, cache_hit_tokens: int = 0,
+                   cost_usd: float | None = None) -> dict:
+    """
+    Build the metadata section with mode-aware cost estimation.
+
+    ``cost_usd`` (e.g. priced per stage by token_tracker from real usage)
+    replaces the model-mix estimate.
+    """
     # If only total_tokens provided, estimate input/output split
     if total_tokens > 0 and input_tokens == 0:
         input_tokens = int(total_tokens * 0.6)
@@ -251,6 +265,8 @@ def build_metadata(mode: str, debate_rounds: int, judges_used: list[str],
             output_tokens * opus_frac * 75 / 1_000_000
         )
         total_cost = cache_cost + regular_cost + output_cost
+    if cost_usd is not None:
+        total_cost = cost_usd
 
     return {
         "mode": mode,
@@ -276,6 +292,18 @@ def main():
                         help="Authenticity data JSON (string or file path)")
     parser.add_argument("--mode", default="full", choices=["full", "fast"])
     parser.add_argument("--total-tokens", type=int, default=0)
+    parser.add_argument("--usage-log", nargs="+", metavar="LOG",
+                        help="Session transcript(s) or usage records (JSONL) to take "
+                             "actual token usage and cost from (overrides --total-tokens)")
+    parser.add_argument("--governor",
+                        help="Cost governor decision JSON (cost_governor.py -o); its mode "
+                             "and reason are recorded in metadata")
+    parser.add_argument("--debate-plan",
+                        help="Debate plan JSON (debate_planner.py -o); recorded in metadata "
+                             "and sets debate_rounds")
+    parser.add_argument("--store", help="Also record the output in this evaluation store (SQLite)")
+    parser.add_argument("--payload",
+                        help="Preprocessed payload, to tag the output with its content hash")
     args = parser.parse_args()
 
     def load_json(val: str) -> dict:
@@ -286,6 +314,10 @@ def main():
             with open(val) as f:
                 return json.load(f)
 
+    governor = load_json(args.governor) if args.governor else None
+    if governor and governor.get("mode"):
+        args.mode = governor["mode"]
+
     content = load_json(args.content_council)
     market = load_json(args.market_council)
     critic = load_json(args.critic) if args.critic else None
@@ -295,12 +327,53 @@ def main():
                                   authenticity_data=authenticity)
 
     debate_rounds = 2 if args.mode == "full" else 1
+    plan = load_json(args.debate_plan) if args.debate_plan else None
+    if plan and args.mode == "full":
+        debate_rounds = plan["debate_rounds"]
     judges = ["hook_analyst", "emotion_analyst", "production_analyst",
               "authenticity_analyst", "trend_analyst", "subject_analyst",
               "audience_mapper"]
-    metadata = build_metadata(args.mode, debate_rounds, judges, args.total_tokens)
+    if args.usage_log:
+        try:
+            paths = [p for log in args.usage_log for p in session_log_paths(log)]
+            usage = ingest_usage(paths, args.mode).summary()
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        metadata = build_metadata(args.mode, debate_rounds, judges,
+                                  input_tokens=usage["total_input_tokens"],
+                                  output_tokens=usage["total_output_tokens"],
+                                  cache_hit_tokens=usage["total_cache_hit_tokens"],
+                                  cost_usd=usage["estimated_cost_usd"])
+    else:
+        metadata = build_metadata(args.mode, debate_rounds, judges, args.total_tokens)
+
+    if plan:
+        metadata["debate_plan"] = {
+            "revised": {name: c["revise"] for name, c in plan["councils"].items()},
+            "cross_council": plan["cross_council"]["run"],
+            "skipped_stages": plan["skipped_stages"],
+        }
+    if governor:
+        metadata["cost_governor"] = metadata_entry(governor)
 
     output = {**result, "metadata": metadata}
+
+    if args.payload or args.store:
+        try:
+            source = {}
+            if args.payload:
+                payload = open_payload(args.payload)
+                output["content_hash"] = content_hash(payload)
+                source = {"source_file": payload.get("source_file"),
+                          "content_type": payload.get("content_type")}
+            if args.store:
+                with EvaluationStore(args.store) as store:
+                    store.add(output, **source)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
     print(json.dumps(output, indent=2))
 
 
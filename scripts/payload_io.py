@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Payload storage for Themis: indexed JSON writing and lazy mmap reading.
+
+Payloads are written as the same pretty-printed JSON as before, plus a small
+index file (``<payload>.idx``) recording the byte span of every top-level
+field and every keyframe. PayloadReader memory-maps the payload and decodes
+only the fields and frames that are actually accessed, so formatting a judge
+view costs about the same whatever the number or size of keyframes.
+
+Paths ending in ``.themis`` use a binary container instead:
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header | data
+
+The header holds each field's span and codec and each keyframe's metadata
+and span. Keyframe images are stored as raw JPEG bytes (no base64) and can
+be sliced from the mmap without copying; other fields are JSON, optionally
+gzip- or zstd-compressed. Readers expose both formats through the same
+Mapping interface.
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+BINARY_SUFFIX = ".themis"
+BINARY_MAGIC = b"THEMISB1"
+BINARY_VERSION = 1
+_HEADER_LEN = struct.Struct("<Q")
+COMPRESSIONS = ("gzip", "zstd")
+# Fields smaller than this are stored uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+
+def index_path_for(payload_path: str) -> str:
+    """Path of the index file that accompanies a payload."""
+    return payload_path + INDEX_SUFFIX
+
+
+def _indent(value_json: str, levels: int) -> str:
+    """Re-indent a json.dumps(indent=2) fragment nested ``levels`` deep."""
+    return value_json.replace("\n", "\n" + "  " * levels)
+
+
+def serialize_indexed(payload: dict) -> tuple[bytes, dict]:
+    """
+    Serialize a payload exactly like ``json.dump(payload, f, indent=2)``.
+
+    Returns the encoded bytes and an index with the byte span of each
+    top-level value and of each keyframe object. Keyframe entries also keep
+    their non-image fields so metadata-only views never touch the file.
+    """
+    parts: list[bytes] = []
+    offset = 0
+    fields = {}
+    frames = []
+
+    def emit(text: str):
+        nonlocal offset
+        data = text.encode("utf-8")
+        parts.append(data)
+        offset += len(data)
+
+    emit("{")
+    for n, (key, value) in enumerate(payload.items()):
+        emit(("," if n else "") + "\n  " + json.dumps(key) + ": ")
+        start = offset
+        if key == "keyframes" and isinstance(value, list) and value:
+            emit("[")
+            for i, frame in enumerate(value):
+                emit(("," if i else "") + "\n    ")
+                frame_start = offset
+                emit(_indent(json.dumps(frame, indent=2), 2))
+                frames.append({
+                    "start": frame_start,
+                    "end": offset,
+                    "meta": {k: v for k, v in frame.items() if k != "base64"},
+                })
+            emit("\n  ]")
+        else:
+            emit(_indent(json.dumps(value, indent=2), 1))
+        fields[key] = [start, offset]
+    emit("\n}" if payload else "}")
+
+    index = {
+        "version": INDEX_VERSION,
+        "fields": fields,
+        "keyframes": frames,
+    }
+    return b"".join(parts), index
+
+
+def is_binary_path(path: str) -> bool:
+    """Whether a payload path selects the binary container."""
+    return path.endswith(BINARY_SUFFIX)
+
+
+def check_output_format(output_path: str | None, binary: bool = False,
+                        compression: str | None = None) -> None:
+    """
+    Reject output options that would be silently ignored.
+
+    ``binary`` needs a ``.themis`` path (or none, to use the default), and
+    ``compression`` needs binary output. Raises ValueError otherwise.
+    """
+    is_binary = is_binary_path(output_path) if output_path else binary
+    if binary and not is_binary:
+        raise ValueError(f"Binary output needs a {BINARY_SUFFIX} path, got {output_path}")
+    if compression and not is_binary:
+        raise ValueError(f"Compression ({compression}) applies to binary payloads only; "
+                         f"use --binary or a {BINARY_SUFFIX} output path")
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.compress(data, mtime=0)
+    if zstandard is None:
+        raise RuntimeError("zstd compression requires zstandard. Install: pip install zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _decompress(data, codec: str) -> bytes:
+    if codec == "json+gzip":
+        return gzip.decompress(data)
+    if codec == "json+zstd":
+        if zstandard is None:
+            raise RuntimeError("payload uses zstd compression. Install: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(bytes(data))
+    return data
+
+
+def serialize_binary(payload: dict, compression: str | None = None) -> bytes:
+    """
+    Serialize a payload into the binary container.
+
+    Keyframe base64 data is stored as raw image bytes; each keyframe entry
+    keeps its other fields and the position of ``base64`` among them so
+    conversion back to JSON reproduces the original key order.
+    """
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    chunks: list[bytes] = []
+    offset = 0
+    fields = {}
+    frames = []
+
+    def add(data: bytes) -> int:
+        nonlocal offset
+        start = offset
+        chunks.append(data)
+        offset += len(data)
+        return start
+
+    for key, value in payload.items():
+        if key == "keyframes" and isinstance(value, list):
+            for frame in value:
+                keys = list(frame)
+                image = base64.b64decode(frame["base64"]) if "base64" in frame else b""
+                frames.append({
+                    "offset": add(image),
+                    "length": len(image),
+                    "base64_at": keys.index("base64") if "base64" in frame else None,
+                    "meta": {k: v for k, v in frame.items() if k != "base64"},
+                })
+            fields[key] = {"codec": "frames"}
+            continue
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        codec = "json"
+        if compression and len(data) >= COMPRESS_MIN_BYTES:
+            data = _compress(data, compression)
+            codec = f"json+{compression}"
+        fields[key] = {"offset": add(data), "length": len(data), "codec": codec}
+
+    header = json.dumps({
+        "version": BINARY_VERSION,
+        "compression": compression,
+        "fields": fields,
+        "keyframes": frames,
+    }, separators=(",", ":")).encode("utf-8")
+    return b"".join([BINARY_MAGIC, _HEADER_LEN.pack(len(header)), header] + chunks)
+
+
+def write_payload(payload: dict, output_path: str, compression: str | None = None) -> int:
+    """
+    Write a payload: the binary container for ``.themis`` paths, otherwise
+    indented JSON plus its byte-offset index. ``compression`` applies to the
+    binary container only.
+
+    Returns the payload size in bytes.
+    """
+    if is_binary_path(output_path):
+        data = serialize_binary(payload, compression)
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+    data, index = serialize_indexed(payload)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    stat = os.stat(output_path)
+    index["size"] = stat.st_size
+    index["mtime_ns"] = stat.st_mtime_ns
+    with open(index_path_for(output_path), "w") as f:
+        json.dump(index, f)
+    return stat.st_size
+
+
+def build_index(payload_path: str) -> bool:
+    """
+    Create an index for an existing payload written by ``json.dump(indent=2)``.
+
+    The payload is loaded once and re-serialized; the index is only written
+    if that reproduces the file byte for byte. Returns True on success.
+    """
+    with open(payload_path, "rb") as f:
+        raw = f.read()
+    data, index = serialize_indexed(json.loads(raw))
+    if data != raw:
+        return False
+    stat = os.stat(payload_path)
+    index["size"] = stat.st_size
+    index["mtime_ns"] = stat.st_mtime_ns
+    with open(index_path_for(payload_path), "w") as f:
+        json.dump(index, f)
+    return True
+
+
+def load_index(payload_path: str) -> dict | None:
+    """Load a payload's index if it exists and still matches the payload."""
+    try:
+        with open(index_path_for(payload_path)) as f:
+            index = json.load(f)
+        stat = os.stat(payload_path)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if (index.get("version") != INDEX_VERSION
+            or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns):
+        return None
+    return index
+
+
+class LazyKeyframes(Sequence):
+    """Keyframe list backed by the mmap; frames decode on access."""
+
+    def __init__(self, buf, entries: list[dict]):
+        self._buf = buf
+        self._entries = entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._decode(self._entries[i])
+
+    def _decode(self, entry: dict) -> dict:
+        return json.loads(self._buf[entry["start"]:entry["end"]])
+
+    def metadata(self, i: int) -> dict:
+        """Frame fields without base64 data, served from the index."""
+        return dict(self._entries[i]["meta"])
+
+    def image_bytes(self, i: int):
+        """Raw image bytes of frame ``i``."""
+        return base64.b64decode(self[i]["base64"])
+
+
+class BinaryKeyframes(LazyKeyframes):
+    """Keyframes of a binary container; images are zero-copy mmap slices."""
+
+    def __init__(self, buf, entries: list[dict], data_start: int):
+        super().__init__(buf, entries)
+        self._view = memoryview(buf)
+        self._data_start = data_start
+
+    def _decode(self, entry: dict) -> dict:
+        items = list(entry["meta"].items())
+        if entry["base64_at"] is not None:
+            image = self._slice(entry)
+            items.insert(entry["base64_at"], ("base64", base64.b64encode(image).decode("ascii")))
+        return dict(items)
+
+    def _slice(self, entry: dict):
+        start = self._data_start + entry["offset"]
+        return self._view[start:start + entry["length"]]
+
+    def image_bytes(self, i: int):
+        """Raw image bytes of frame ``i`` as a memoryview into the mmap."""
+        return self._slice(self._entries[i])
+
+    def release(self):
+        self._view.release()
+
+
+class PayloadReader(Mapping):
+    """
+    Read-only, lazily decoded view of a payload file.
+
+    Behaves like the payload dict. With a valid index each top-level field
+    is decoded from its byte span on first access and ``keyframes`` is a
+    LazyKeyframes sequence. Without one (legacy or hand-edited payloads) the
+    file is parsed in full, so callers never need to care which path ran.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cache: dict = {}
+        self._mm = None
+        self.index = load_index(path)
+        if self.index is None:
+            with open(path) as f:
+                self._cache = json.load(f)
+            self._fields = list(self._cache)
+            return
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._fields = list(self.index["fields"])
+
+    @property
+    def indexed(self) -> bool:
+        """Whether reads are served lazily from the index."""
+        return self._mm is not None
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        if self._mm is None or key not in self.index["fields"]:
+            raise KeyError(key)
+        if key == "keyframes" and self.index["keyframes"]:
+            value = LazyKeyframes(self._mm, self.index["keyframes"])
+        else:
+            start, end = self.index["fields"][key]
+            value = json.loads(self._mm[start:end])
+        self._cache[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    @property
+    def compression(self) -> str | None:
+        """Field compression of a binary container (None for JSON)."""
+        return None
+
+    def to_dict(self) -> dict:
+        """Decode the whole payload into a plain dict."""
+        return {
+            key: list(value) if isinstance(value, LazyKeyframes) else value
+            for key, value in self.items()
+        }
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class BinaryPayloadReader(PayloadReader):
+    """PayloadReader over the binary container (always lazy)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cache: dict = {}
+        self.index = None
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a Themis binary payload: {path}")
+        pos = len(BINARY_MAGIC)
+        (header_len,) = _HEADER_LEN.unpack_from(self._mm, pos)
+        pos += _HEADER_LEN.size
+        self.header = json.loads(self._mm[pos:pos + header_len])
+        if self.header.get("version") != BINARY_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported binary payload version: {self.header.get('version')}")
+        self._data_start = pos + header_len
+        self._fields = list(self.header["fields"])
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        if self._mm is None or key not in self.header["fields"]:
+            raise KeyError(key)
+        field = self.header["fields"][key]
+        if field["codec"] == "frames":
+            value = BinaryKeyframes(self._mm, self.header["keyframes"], self._data_start)
+        else:
+            start = self._data_start + field["offset"]
+            value = json.loads(_decompress(self._mm[start:start + field["length"]],
+                                           field["codec"]))
+        self._cache[key] = value
+        return value
+
+    @property
+    def compression(self) -> str | None:
+        return self.header.get("compression")
+
+    def close(self):
+        frames = self._cache.get("keyframes")
+        if isinstance(frames, BinaryKeyframes):
+            frames.release()
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # image slices still referenced; freed with them
+            self._mm = None
+
+
+def open_payload(path: str) -> PayloadReader:
+    """
+    Open a payload for reading.
+
+    Binary containers are detected by their magic bytes; JSON payloads are
+    lazy when an index is present.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        return BinaryPayloadReader(path)
+    return PayloadReader(path)
+
+
+def convert_payload(src: str, dst: str, compression: str | None = None) -> int:
+    """
+    Convert a payload between JSON and the binary container.
+
+    The output format follows the destination suffix. Returns its size.
+    """
+    check_output_format(dst, compression=compression)
+    reader = open_payload(src)
+    try:
+        payload = reader.to_dict()
+    finally:
+        reader.close()
+    return write_payload(payload, dst, compression)
+
+
+def content_hash(payload) -> str:
+    """
+    SHA-256 identifying a payload's content across re-runs and formats.
+
+    Covers the content type, transcript text and keyframe image bytes, but
+    not processing metadata (timings, host), so re-preprocessing the same
+    file yields the same hash.
+    """
+    h = hashlib.sha256()
+    h.update(str(payload.get("content_type", "video")).encode("utf-8"))
+    h.update(b"\0")
+    h.update(payload.get("transcript", {}).get("text", "").encode("utf-8"))
+    frames = payload.get("keyframes", [])
+    for i in range(len(frames)):
+        h.update(b"\0")
+        if isinstance(frames, LazyKeyframes):
+            h.update(frames.image_bytes(i))
+        else:
+            h.update(base64.b64decode(frames[i].get("base64", "")))
+    return h.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Themis payload storage utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="Show the layout of a payload")
+    info.add_argument("payload", help="Path to payload (.json or .themis)")
+
+    index = sub.add_parser("build-index", help="Create or refresh a JSON payload's index")
+    index.add_argument("payload", help="Path to payload JSON")
+
+    convert = sub.add_parser("convert", help="Convert between JSON and the binary container "
+                                             "(format follows the output suffix)")
+    convert.add_argument("input", help="Source payload")
+    convert.add_argument("output", help="Destination (.themis for binary, else JSON)")
+    convert.add_argument("--compression", choices=COMPRESSIONS,
+                         help="Compress text fields of a binary container")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "convert":
+            size = convert_payload(args.input, args.output, args.compression)
+            print(f"Converted {args.input} -> {args.output} ({size:,} bytes)")
+            return 0
+
+        if args.command == "build-index":
+            if not build_index(args.payload):
+                print("Error: payload is not in canonical indent=2 form; "
+                      "re-write it with write_payload()", file=sys.stderr)
+                return 1
+            print(f"Index written: {index_path_for(args.payload)}")
+            return 0
+
+        reader = open_payload(args.payload)
+        if isinstance(reader, BinaryPayloadReader):
+            header = reader.header
+            report = {
+                "format": "binary",
+                "compression": header["compression"],
+                "fields": {k: v.get("length", 0) for k, v in header["fields"].items()},
+                "keyframes": len(header["keyframes"]),
+                "size": os.path.getsize(args.payload),
+            }
+        elif reader.indexed:
+            report = {
+                "format": "json",
+                "fields": {k: v[1] - v[0] for k, v in reader.index["fields"].items()},
+                "keyframes": len(reader.index["keyframes"]),
+                "size": reader.index["size"],
+            }
+        else:
+            reader.close()
+            print("No valid index (missing or stale)")
+            return 1
+        reader.close()
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
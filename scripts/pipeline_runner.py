@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+In-process runner for the local (non-model) stages of a Themis evaluation.
+
+The evaluate skill runs check_dependencies, preprocess, text_forensics,
+triage, format_payload (several times), token_tracker and cost_governor as
+separate processes, each paying interpreter startup and re-reading the
+payload. This runner imports them and executes the stages as a dependency
+graph on a thread pool: the payload is read or built once and shared in
+memory, and stages whose inputs are ready run concurrently. One call
+leaves the injected payload and the judge files on disk and prints every
+result plus a timing report.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import check_dependencies
+from cost_governor import DEFAULT_MAX_COST_USD, daily_spend, govern
+from format_payload import (
+    cache_layout_report,
+    estimate_token_sizes,
+    format_all_judges,
+    write_judge_files,
+)
+from payload_io import LazyKeyframes, content_hash, open_payload, write_payload
+from preprocess_text import SUPPORTED_EXTENSIONS as TEXT_EXTENSIONS
+from preprocess_text import preprocess as preprocess_text
+from preprocess_video import preprocess as preprocess_video
+from text_forensics import analyze_text, extract_text_from_payload
+from token_tracker import estimate_pipeline_cost
+from triage import triage
+
+
+DEFAULT_PAYLOAD_PATH = "/tmp/themis_payload.json"
+DEFAULT_JUDGES_DIR = "/tmp/themis_judges"
+DEFAULT_WORKERS = 4
+
+VIDEO_DEPENDENCIES = (
+    ("Python version", check_dependencies.check_python_version),
+    ("FFmpeg", check_dependencies.check_ffmpeg),
+    ("ffprobe", check_dependencies.check_ffprobe),
+    ("OpenAI Whisper", check_dependencies.check_whisper),
+)
+TEXT_DEPENDENCIES = VIDEO_DEPENDENCIES[:1]
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that has nothing to do given earlier results."""
+
+
+def run_dag(stages: dict[str, tuple[list[str], callable]], workers: int = DEFAULT_WORKERS) -> dict:
+    """
+    Run ``{name: (prerequisites, fn)}`` on a thread pool.
+
+    Each ``fn`` receives the results so far (stage name -> return value) and
+    starts once its prerequisites have finished. A failing stage stops the
+    run; stages that raise StageSkipped record the reason and let their
+    dependents decide. Returns results and per-stage timings.
+    """
+    results: dict[str, object] = {}
+    timings: dict[str, dict] = {}
+    pending = dict(stages)
+    running = {}
+    start = time.perf_counter()
+
+    def call(name: str, fn):
+        began = time.perf_counter()
+        try:
+            return fn(results)
+        finally:
+            timings[name] = {"start_sec": round(began - start, 4),
+                             "wall_sec": round(time.perf_counter() - began, 4)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            ready = [n for n, (deps, _) in pending.items() if all(d in results for d in deps)]
+            for name in ready:
+                _, fn = pending.pop(name)
+                running[pool.submit(call, name, fn)] = name
+            if not running:
+                raise ValueError(f"Unsatisfiable stage dependencies: {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except StageSkipped as e:
+                    results[name] = {"skipped": str(e)}
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+    return {"results": results, "timings": timings,
+            "wall_sec": round(time.perf_counter() - start, 4)}
+
+
+def build_stages(input_path: str, payload_path: str, judges_dir: str,
+                 mode: str | None = None, max_cost: float | None = DEFAULT_MAX_COST_USD,
+                 daily_budget: float | None = None, store: str | None = None,
+                 whisper_model: str = "base") -> dict:
+    """
+    The local stage graph for one input (raw file or preprocessed payload).
+
+    ``mode`` forces full/fast; by default the triage route decides. The
+    cost governor picks the judge token budgets, so judge files wait for it.
+    """
+    ext = Path(input_path).suffix.lower()
+    is_payload = ext in (".json", ".themis")
+    is_text = ext in TEXT_EXTENSIONS
+    compression = {}
+
+    def dependencies(r):
+        checks = TEXT_DEPENDENCIES if is_payload or is_text else VIDEO_DEPENDENCIES
+        report = {name: fn() for name, fn in checks}
+        missing = [f"{name}: {detail}" for name, (ok, detail) in report.items() if not ok]
+        if missing:
+            raise RuntimeError("Missing dependencies: " + "; ".join(missing))
+        return {name: detail for name, (ok, detail) in report.items()}
+
+    def preprocess(r):
+        if is_payload:
+            reader = open_payload(input_path)
+            compression["codec"] = reader.compression
+            return dict(reader)
+        # preprocess_* report progress on stdout, which carries our JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            if is_text:
+                return preprocess_text(input_path, payload_path)
+            return preprocess_video(input_path, payload_path, whisper_model=whisper_model)
+
+    def forensics(r):
+        payload = r["preprocess"]
+        return analyze_text(extract_text_from_payload(payload), structure=payload.get("structure"))
+
+    def payload_view(r):
+        return {**r["preprocess"], "text_forensics": r["text_forensics"]}
+
+    def inject(r):
+        # Write beside and rename, so readers of the old file (mmap) are unaffected
+        target = input_path if is_payload else payload_path
+        tmp = f"{target}.tmp{Path(target).suffix}"
+        payload = {k: list(v) if isinstance(v, LazyKeyframes) else v
+                   for k, v in payload_view(r).items()}
+        size = write_payload(payload, tmp, compression.get("codec"))
+        if os.path.exists(tmp + ".idx"):
+            os.replace(tmp + ".idx", target + ".idx")
+        os.replace(tmp, target)
+        return {"path": target, "bytes": size, "content_hash": content_hash(payload)}
+
+    def triage_stage(r):
+        return triage(payload_view(r))
+
+    def estimate(r):
+        view = payload_view(r)
+        return {m: estimate_pipeline_cost(m, payload=view) for m in ("full", "fast")}
+
+    def judge_tokens(r):
+        return estimate_token_sizes(format_all_judges(payload_view(r)))
+
+    def cache_layout(r):
+        return cache_layout_report(payload_view(r))
+
+    def governor(r):
+        route = r["triage"]["route"]
+        if mode is None and route == "skip":
+            raise StageSkipped(f"triage: {r['triage']['reason']}")
+        spent = daily_spend(store) if store else 0.0
+        return govern(payload_view(r), max_cost, daily_budget, spent, mode or route)
+
+    def judge_files(r):
+        decision = r["cost_governor"]
+        if "skipped" in decision:
+            raise StageSkipped(decision["skipped"])
+        if not decision["approved"]:
+            raise StageSkipped(decision["reason"])
+        return write_judge_files(payload_view(r), judges_dir, budgets=decision["token_budgets"])
+
+    return {
+        "dependencies": ([], dependencies),
+        "preprocess": ([], preprocess),
+        "text_forensics": (["preprocess"], forensics),
+        "inject_forensics": (["dependencies", "text_forensics"], inject),
+        "triage": (["text_forensics"], triage_stage),
+        "token_estimate": (["text_forensics"], estimate),
+        "judge_tokens": (["text_forensics"], judge_tokens),
+        "cache_layout": (["text_forensics"], cache_layout),
+        "cost_governor": (["triage"], governor),
+        "judge_files": (["dependencies", "cost_governor"], judge_files),
+    }
+
+
+def critical_path(stages: dict, timings: dict) -> list[str]:
+    """Chain of latest-finishing prerequisites ending at the last stage to finish."""
+    end = {n: t["start_sec"] + t["wall_sec"] for n, t in timings.items()}
+    stage = max(end, key=end.get)
+    path = [stage]
+    while stages[stage][0]:
+        stage = max(stages[stage][0], key=end.get)
+        path.append(stage)
+    return path[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the local Themis pipeline stages in-process as a dependency graph")
+    parser.add_argument("input", help="Video or text file, or a preprocessed payload (.json/.themis)")
+    parser.add_argument("--payload-out", default=DEFAULT_PAYLOAD_PATH,
+                        help=f"Where to write the payload for raw inputs (default {DEFAULT_PAYLOAD_PATH})")
+    parser.add_argument("--judges-dir", default=DEFAULT_JUDGES_DIR,
+                        help=f"Judge files directory (default {DEFAULT_JUDGES_DIR})")
+    parser.add_argument("--mode", choices=["full", "fast"],
+                        help="Force the mode (default: the triage route)")
+    parser.add_argument("--max-cost", type=float, default=DEFAULT_MAX_COST_USD,
+                        help=f"Per-evaluation limit in USD (default {DEFAULT_MAX_COST_USD:.2f})")
+    parser.add_argument("--daily-budget", type=float, help="Per-day budget in USD (needs --store)")
+    parser.add_argument("--store", help="Evaluation store (SQLite) to read today's spend from")
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Stages run concurrently (default {DEFAULT_WORKERS})")
+    parser.add_argument("-o", "--output", help="Write the report JSON here")
+    args = parser.parse_args()
+
+    try:
+        if args.daily_budget is not None and not args.store:
+            raise ValueError("--daily-budget needs --store to know today's spend")
+        stages = build_stages(args.input, args.payload_out, args.judges_dir, args.mode,
+                              args.max_cost, args.daily_budget, args.store, args.whisper_model)
+        run = run_dag(stages, args.workers)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    results = run["results"]
+    decision = results["cost_governor"]
+    report = {
+        "payload": results["inject_forensics"]["path"],
+        "judges_dir": os.path.abspath(args.judges_dir),
+        "mode": decision.get("mode"),
+        "triage": results["triage"],
+        "cost_governor": decision,
+        "token_estimate": results["token_estimate"],
+        "judge_tokens": results["judge_tokens"],
+        "cache_layout": results["cache_layout"],
+        "judge_files": results["judge_files"],
+        "text_forensics": results["text_forensics"],
+        "timings": {
+            "wall_sec": run["wall_sec"],
+            "stage_sum_sec": round(sum(t["wall_sec"] for t in run["timings"].values()), 4),
+            "critical_path": critical_path(stages, run["timings"]),
+            "stages": run["timings"],
+        },
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, t in sorted(run["timings"].items(), key=lambda kv: kv[1]["start_sec"]):
+        print(f"  {name:18s} +{t['start_sec']:7.3f}s  {t['wall_sec']:7.3f}s", file=sys.stderr)
+    print(f"  total {run['wall_sec']:.3f}s (stages sum {report['timings']['stage_sum_sec']:.3f}s)",
+          file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    if "skipped" in results["judge_files"]:
+        print(f"Error: judge files not written ({results['judge_files']['skipped']})",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
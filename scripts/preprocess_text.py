@@ -7,84 +7,346 @@ and outputs a structured JSON payload matching the video payload format.
 """
 
 import argparse
+import csv
+import hashlib
+import html
 import json
 import os
 import re
 import sys
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
+from payload_io import BINARY_SUFFIX, COMPRESSIONS, check_output_format, write_payload
+
+
+# Chunk size used when feeding HTML to the incremental converter
+HTML_FEED_CHUNK_CHARS = 64 * 1024
+
+# Inline tags rendered as markdown emphasis: tag -> marker
+_EMPHASIS_MARKERS = {"b": "**", "strong": "**", "i": "*", "em": "*"}
+_HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Tokenizer pattern for the streaming converter: a comment opener (its body
+# may contain tags, so it is skipped to "-->" separately), start/end tags, or
+# declarations/processing instructions. Runs exclude '<' so a stray '<' can
+# never make a match scan past the next tag.
+_TOKEN_RE = re.compile(r'<(?:!--|(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^<>]*)>|[!?][^<>]*>)')
+_HREF_RE = re.compile(r'href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_SKIP_END_RE = {
+    tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in ("script", "style")
+}
+_COMMENT_END_RE = re.compile(r'-->')
+# Tags that produce output or change state; all others are dropped unseen
+_HANDLED_TAGS = frozenset(
+    {"br", "p", "li", "a", "script", "style"} | set(_EMPHASIS_MARKERS) | set(_HEADING_TAGS)
+)
+# Longest partial terminator ("</script   >") carried over a chunk boundary
+_SKIP_END_TAIL = 16
+# A '<' with no '>' within this many chars is treated as literal text
+_MAX_PARTIAL_TAG = 8192
+
+
+class HTMLToText:
+    """
+    Incremental HTML-to-markdown converter.
+
+    Event-driven single pass: feed() may be called repeatedly with chunks,
+    close() flushes and get_text() returns the result. A linear tokenizer
+    turns the input into start/end tag and text events; only an unfinished
+    tag is carried over between chunks, so unclosed elements and huge script
+    bodies never cause rescanning. Entities are decoded with html.unescape
+    and script/style bodies are dropped.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pending: list[str] = []  # raw text awaiting entity decoding
+        self._out: list[str] = []
+        self._skip_end: re.Pattern | None = None  # inside script/style/comment
+        self._links: list[str | None] = []  # href per open <a>, None if absent
+
+    def feed(self, chunk: str):
+        """Consume a chunk of HTML."""
+        self._buf += chunk
+        self._parse(final=False)
+
+    def close(self):
+        """Flush any buffered input."""
+        self._parse(final=True)
+        self._flush_text()
+
+    def _parse(self, final: bool):
+        buf = self._buf
+        pos, n = 0, len(buf)
+        while pos < n:
+            if self._skip_end:
+                m = self._skip_end.search(buf, pos)
+                if m is None:
+                    pos = n if final else max(pos, n - _SKIP_END_TAIL)
+                    break
+                pos = m.end()
+                self._skip_end = None
+                continue
+
+            for m in _TOKEN_RE.finditer(buf, pos):
+                start = m.start()
+                if start > pos:
+                    self._pending.append(buf[pos:start])
+                pos = m.end()
+                tag = m.group(2)
+                if tag is None:
+                    if m.group(0) == "<!--":
+                        # Comments may contain tags and '>': skip to the real terminator
+                        self._skip_end = _COMMENT_END_RE
+                        break
+                    continue
+                tag = tag.lower()
+                if tag not in _HANDLED_TAGS:
+                    continue
+                self._flush_text()
+                attrs = m.group(3)
+                if m.group(1):
+                    self.handle_endtag(tag)
+                elif attrs.endswith("/"):
+                    self.handle_startendtag(tag, attrs)
+                else:
+                    self.handle_starttag(tag, attrs)
+                    if tag in _SKIP_END_RE:
+                        self._skip_end = _SKIP_END_RE[tag]
+                        break
+            else:
+                # No more complete tags; a short trailing partial tag (or
+                # comment opener) waits for the next chunk.
+                tail = n
+                if not final:
+                    lt = buf.rfind("<", pos)
+                    if lt >= 0 and n - lt < _MAX_PARTIAL_TAG and buf.find(">", lt) < 0:
+                        tail = lt
+                if tail > pos:
+                    self._pending.append(buf[pos:tail])
+                pos = tail
+                break
+
+        self._buf = buf[pos:]
+
+    def _flush_text(self):
+        if self._pending:
+            self.handle_data(html.unescape("".join(self._pending)))
+            self._pending.clear()
+
+    def handle_starttag(self, tag: str, attrs: str):
+        if tag in _HEADING_TAGS:
+            self._out.append(f"\n{'#' * _HEADING_TAGS[tag]} ")
+        elif tag in ("br", "p"):
+            self._out.append("\n")
+        elif tag == "li":
+            self._out.append("\n- ")
+        elif tag == "a":
+            m = _HREF_RE.search(attrs)
+            href = None
+            if m:
+                href = html.unescape(next(g for g in m.groups() if g is not None))
+                self._out.append("[")
+            self._links.append(href)
+        elif tag in _EMPHASIS_MARKERS:
+            self._out.append(_EMPHASIS_MARKERS[tag])
+
+    def handle_startendtag(self, tag: str, attrs: str):
+        if tag == "br":
+            self._out.append("\n")
+
+    def handle_endtag(self, tag: str):
+        if tag in _HEADING_TAGS or tag == "p":
+            self._out.append("\n")
+        elif tag == "a":
+            if self._links:
+                href = self._links.pop()
+                if href is not None:
+                    self._out.append(f"]({href})")
+        elif tag in _EMPHASIS_MARKERS:
+            self._out.append(_EMPHASIS_MARKERS[tag])
+
+    def handle_data(self, data: str):
+        self._out.append(data.replace("\xa0", " "))
+
+    def get_text(self) -> str:
+        """Return the converted text with blank-line runs collapsed."""
+        text = "".join(self._out)
+        return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def html_to_text(chunks: Iterable[str]) -> str:
+    """Convert an iterable of HTML chunks to plain text in one pass."""
+    converter = HTMLToText()
+    for chunk in chunks:
+        converter.feed(chunk)
+    converter.close()
+    return converter.get_text()
+
 
 def strip_html(html: str) -> str:
     """Convert HTML to plain text, preserving structure."""
-    # Remove script and style blocks
-    text = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    # Convert headers to markdown-style
-    for i in range(1, 7):
-        text = re.sub(rf'<h{i}[^>]*>(.*?)</h{i}>', rf'\n{"#" * i} \1\n', text, flags=re.DOTALL | re.IGNORECASE)
-    # Convert paragraphs and breaks
-    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
-    text = re.sub(r'<p[^>]*>', '\n', text, flags=re.IGNORECASE)
-    text = re.sub(r'</p>', '\n', text, flags=re.IGNORECASE)
-    # Convert list items
-    text = re.sub(r'<li[^>]*>(.*?)</li>', r'\n- \1', text, flags=re.DOTALL | re.IGNORECASE)
-    # Convert links: keep text and URL
-    text = re.sub(r'<a[^>]*href=["\']([^"\']*)["\'][^>]*>(.*?)</a>', r'[\2](\1)', text, flags=re.DOTALL | re.IGNORECASE)
-    # Convert bold/strong
-    text = re.sub(r'<(b|strong)[^>]*>(.*?)</\1>', r'**\2**', text, flags=re.DOTALL | re.IGNORECASE)
-    # Convert italic/em
-    text = re.sub(r'<(i|em)[^>]*>(.*?)</\1>', r'*\2*', text, flags=re.DOTALL | re.IGNORECASE)
-    # Strip remaining tags
-    text = re.sub(r'<[^>]+>', '', text)
-    # Decode common HTML entities
-    text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
-    text = text.replace('&quot;', '"').replace('&#39;', "'").replace('&nbsp;', ' ')
-    # Collapse multiple blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
+    return html_to_text(
+        html[i:i + HTML_FEED_CHUNK_CHARS]
+        for i in range(0, len(html), HTML_FEED_CHUNK_CHARS)
+    )
 
 
-def extract_sections(text: str) -> list[dict]:
-    """Extract sections from text based on headings."""
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """Narrow [start, end) to exclude leading/trailing whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+# Structural rules shared with text_forensics.py:
+#   - a heading is a line of 1-6 '#' followed by whitespace and text
+#   - paragraphs are runs of non-blank lines separated by blank lines
+#   - a sentence ends at '.', '!' or '?' followed by whitespace or end of text;
+#     fragments of 2 characters or fewer are not counted
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+)$')
+_SENTENCE_END_RE = re.compile(r'[.!?](?=\s|$)')
+MIN_SENTENCE_CHARS = 3
+
+
+def analyze_structure(text: str) -> dict:
+    """
+    Scan text once and return its structure.
+
+    Produces the section index (see extract_sections), sentence and
+    paragraph spans as [start, end) character offsets, whitespace word
+    count, and the first level-1 heading. The result is stored in the
+    payload under ``structure`` so downstream scripts reuse these boundaries
+    instead of re-splitting the text with their own rules.
+    """
     sections = []
-    # Match markdown headings or lines that look like headings
-    lines = text.split('\n')
-    current_section = {"heading": "Introduction", "level": 0, "content": []}
+    sentences = []
+    paragraphs = []
+    word_count = 0
+    title = None
+
+    current = {"heading": "Introduction", "level": 0}
+    body_start = body_end = None
+    para_start = para_end = None
+    sent_start = None
+    pos = 0
+
+    def close_section():
+        if body_start is None:
+            return
+        start, end = _strip_span(text, body_start, body_end)
+        sections.append({
+            **current,
+            "start": start,
+            "end": end,
+            "word_count": len(text[start:end].split()),
+        })
+
+    def close_sentence(end: int):
+        if end - sent_start >= MIN_SENTENCE_CHARS:
+            sentences.append([sent_start, end])
 
-    for line in lines:
-        heading_match = re.match(r'^(#{1,6})\s+(.+)$', line)
+    for line in text.split('\n'):
+        line_start = pos
+        pos += len(line) + 1
+        stripped = line.strip()
+
+        # Paragraphs
+        if not stripped:
+            if para_start is not None:
+                paragraphs.append([para_start, para_end])
+                para_start = None
+        else:
+            if para_start is None:
+                para_start = line_start + len(line) - len(line.lstrip())
+            para_end = line_start + len(line.rstrip())
+            word_count += len(line.split())
+
+        # Sections
+        heading_match = _HEADING_RE.match(line) if line.startswith('#') else None
         if heading_match:
-            # Save current section if it has content
-            if current_section["content"]:
-                current_section["content"] = '\n'.join(current_section["content"]).strip()
-                current_section["word_count"] = len(current_section["content"].split())
-                sections.append(current_section)
-            current_section = {
+            close_section()
+            current = {
                 "heading": heading_match.group(2).strip(),
                 "level": len(heading_match.group(1)),
-                "content": [],
             }
+            if title is None and current["level"] == 1:
+                title = current["heading"]
+            body_start = body_end = None
         else:
-            current_section["content"].append(line)
+            if body_start is None:
+                body_start = line_start
+            body_end = line_start + len(line)
+
+        # Sentences
+        if not stripped:
+            continue
+        i = 0
+        for m in _SENTENCE_END_RE.finditer(line):
+            if sent_start is None:
+                fragment = line[i:m.end()]
+                sent_start = line_start + i + len(fragment) - len(fragment.lstrip())
+            close_sentence(line_start + m.end())
+            sent_start = None
+            i = m.end()
+        if sent_start is None:
+            rest = line[i:]
+            if rest.strip():
+                sent_start = line_start + i + len(rest) - len(rest.lstrip())
+
+    close_section()
+    if para_start is not None:
+        paragraphs.append([para_start, para_end])
+    if sent_start is not None:
+        # Trailing sentence without terminal punctuation
+        close_sentence(para_end)
+
+    return {
+        "sections": sections,
+        "sentences": sentences,
+        "paragraphs": paragraphs,
+        "word_count": word_count,
+        "sentence_count": len(sentences),
+        "paragraph_count": len(paragraphs),
+        "title": title,
+    }
 
-    # Save last section
-    if current_section["content"]:
-        current_section["content"] = '\n'.join(current_section["content"]).strip()
-        current_section["word_count"] = len(current_section["content"].split())
-        sections.append(current_section)
 
-    return sections
+def extract_sections(text: str) -> list[dict]:
+    """
+    Extract sections from text based on headings.
 
+    Sections are an index into ``text`` rather than copies of it: each has
+    ``start``/``end`` character offsets of its (whitespace-stripped) body.
+    Use section_text() to materialize the content.
+    """
+    return analyze_structure(text)["sections"]
 
-def compute_text_metadata(text: str) -> dict:
+
+def section_text(text: str, section: dict) -> str:
+    """
+    Return a section's content: its own ``content`` (legacy payloads) or
+    its start/end slice of the canonical text buffer.
+    """
+    if "content" in section:
+        return section["content"]
+    return text[section.get("start", 0):section.get("end", 0)]
+
+
+def compute_text_metadata(text: str, structure: dict | None = None) -> dict:
     """Compute metadata about the text content."""
-    words = text.split()
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+    if structure is None:
+        structure = analyze_structure(text)
 
-    word_count = len(words)
-    sentence_count = len(sentences)
-    paragraph_count = len(paragraphs)
+    word_count = structure["word_count"]
+    sentence_count = structure["sentence_count"]
+    paragraph_count = structure["paragraph_count"]
 
     # Reading time: average 238 words per minute
     reading_time_min = round(word_count / 238, 1)
@@ -105,69 +367,51 @@ def compute_text_metadata(text: str) -> dict:
     }
 
 
-def extract_title(text: str, file_path: str) -> str:
+def extract_title(text: str, file_path: str, structure: dict | None = None) -> str:
     """Try to extract a title from the text content."""
+    if structure is None:
+        structure = analyze_structure(text)
     # Check for first markdown heading
-    match = re.match(r'^#\s+(.+)$', text, re.MULTILINE)
-    if match:
-        return match.group(1).strip()
+    if structure["title"]:
+        return structure["title"]
     # Fall back to first non-empty line
-    for line in text.split('\n'):
-        line = line.strip()
-        if line:
-            return line[:200]
+    if structure["paragraphs"]:
+        start = structure["paragraphs"][0][0]
+        end = text.find('\n', start)
+        return text[start:end if end >= 0 else len(text)].strip()[:200]
     # Fall back to filename
     return Path(file_path).stem
 
 
-def preprocess(file_path: str, output_path: str | None = None) -> dict:
-    """Run full text preprocessing pipeline and return payload."""
-    file_path = os.path.abspath(file_path)
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
-
-    ext = Path(file_path).suffix.lower()
-    if ext not in ('.txt', '.md', '.html', '.htm'):
-        raise ValueError(f"Unsupported text format: {ext}. Supported: .txt, .md, .html")
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.html', '.htm')
 
-    print(f"Preprocessing text: {file_path}")
+# Bulk mode: output files are spread over 16^N subdirectories keyed by a hash
+# of the document id so no single directory holds thousands of payloads
+BULK_SHARD_CHARS = 2
+BULK_CHUNKSIZE = 16
 
-    # 1. Read file
-    with open(file_path, 'r', encoding='utf-8') as f:
-        raw_text = f.read()
 
-    # 2. Convert HTML if needed
-    if ext in ('.html', '.htm'):
-        print("  Converting HTML to text...")
-        text = strip_html(raw_text)
-    else:
-        text = raw_text
+def build_payload(text: str, source_file: str, file_format: str,
+                  file_size_bytes: int) -> dict:
+    """Build a text payload (compatible with the video payload structure)."""
+    # Analyze structure (sections, sentences, paragraphs) in one scan
+    structure = analyze_structure(text)
+    metadata = compute_text_metadata(text, structure)
+    title = extract_title(text, source_file, structure)
 
-    # 3. Extract metadata
-    print("  Computing text metadata...")
-    metadata = compute_text_metadata(text)
-    print(f"  Words: {metadata['word_count']}, "
-          f"Sentences: {metadata['sentence_count']}, "
-          f"Reading time: {metadata['reading_time_min']} min")
+    # Split off the section index; the remaining boundaries are kept in the
+    # payload for text_forensics.py
+    sections = structure.pop("sections")
+    del structure["title"]
 
-    # 4. Extract title
-    title = extract_title(text, file_path)
-    print(f"  Title: {title[:80]}")
-
-    # 5. Extract sections
-    print("  Extracting sections...")
-    sections = extract_sections(text)
-    print(f"  Sections: {len(sections)}")
-
-    # 6. Build payload (compatible with video payload structure)
-    payload = {
-        "source_file": os.path.basename(file_path),
+    return {
+        "source_file": source_file,
         "content_type": "text",
         "metadata": {
             **metadata,
             "title": title,
-            "file_format": ext.lstrip('.'),
-            "file_size_bytes": os.path.getsize(file_path),
+            "file_format": file_format,
+            "file_size_bytes": file_size_bytes,
         },
         "keyframes": [],
         "keyframe_count": 0,
@@ -177,30 +421,317 @@ def preprocess(file_path: str, output_path: str | None = None) -> dict:
             "language": "auto",
         },
         "sections": sections,
+        "structure": structure,
     }
 
-    # 7. Save payload
+
+def preprocess(file_path: str, output_path: str | None = None,
+               binary: bool = False, compression: str | None = None) -> dict:
+    """
+    Run full text preprocessing pipeline and return payload.
+
+    ``binary`` makes the default output a ``.themis`` binary container;
+    ``compression`` (gzip/zstd) applies to binary containers.
+    """
+    check_output_format(output_path, binary, compression)
+    file_path = os.path.abspath(file_path)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    ext = Path(file_path).suffix.lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported text format: {ext}. Supported: .txt, .md, .html")
+
+    print(f"Preprocessing text: {file_path}")
+
+    # 1-2. Read file, streaming HTML through the converter
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if ext in ('.html', '.htm'):
+            print("  Converting HTML to text...")
+            text = html_to_text(iter(lambda: f.read(HTML_FEED_CHUNK_CHARS), ''))
+        else:
+            text = f.read()
+
+    # 3-5. Structure, metadata, title and sections
+    print("  Analyzing structure...")
+    payload = build_payload(text, os.path.basename(file_path), ext.lstrip('.'),
+                            os.path.getsize(file_path))
+    metadata = payload["metadata"]
+    print(f"  Words: {metadata['word_count']}, "
+          f"Sentences: {metadata['sentence_count']}, "
+          f"Reading time: {metadata['reading_time_min']} min")
+    print(f"  Title: {metadata['title'][:80]}")
+    print(f"  Sections: {len(payload['sections'])}")
+
+    # 6. Save payload
     if output_path is None:
-        output_path = os.path.splitext(file_path)[0] + "_payload.json"
+        suffix = BINARY_SUFFIX if binary else ".json"
+        output_path = os.path.splitext(file_path)[0] + "_payload" + suffix
 
-    with open(output_path, "w") as f:
-        json.dump(payload, f, indent=2)
-    payload_size = os.path.getsize(output_path)
+    payload_size = write_payload(payload, output_path, compression)
     print(f"  Payload saved: {output_path} ({payload_size:,} bytes)")
 
     return payload
 
 
+def iter_corpus(source: str, text_field: str = "text", id_field: str = "id",
+                doc_format: str = "md"):
+    """
+    Yield corpus documents from a directory tree, JSONL file or CSV file.
+
+    Directory documents are yielded as paths (read by the worker); JSONL and
+    CSV records carry their text inline. Each document is a dict with
+    ``id`` plus either ``path`` or ``text`` and ``format``.
+    """
+    source_path = Path(source)
+    if source_path.is_dir():
+        for path in sorted(source_path.rglob("*")):
+            if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                # Keep the extension: post.md and post.html are distinct documents
+                yield {
+                    "id": str(path.relative_to(source_path)),
+                    "path": str(path),
+                }
+        return
+
+    suffix = source_path.suffix.lower()
+    if suffix == ".jsonl":
+        with open(source_path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"id": f"line_{line_no}", "error": f"Invalid JSON: {e}"}
+                    continue
+                yield {
+                    "id": str(record.get(id_field, f"line_{line_no}")),
+                    "text": record.get(text_field),
+                    "format": record.get("format", doc_format),
+                }
+    elif suffix == ".csv":
+        csv.field_size_limit(sys.maxsize)
+        with open(source_path, encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            if text_field not in (reader.fieldnames or []):
+                raise ValueError(f"CSV has no column '{text_field}'. "
+                                 f"Columns: {reader.fieldnames}")
+            for row_no, row in enumerate(reader, 1):
+                yield {
+                    "id": str(row.get(id_field) or f"row_{row_no}"),
+                    "text": row[text_field],
+                    "format": doc_format,
+                }
+    else:
+        raise ValueError(f"Unsupported corpus source: {source}. "
+                         "Expected a directory, .jsonl or .csv file")
+
+
+def _safe_doc_name(doc_id: str) -> str:
+    """Turn a document id into a filesystem-safe name."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', doc_id).strip('_')[:100] or "doc"
+
+
+def _shard_path(output_dir: str, doc_id: str, suffix: str = ".json") -> str:
+    """Sharded output path for a document payload."""
+    shard = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()[:BULK_SHARD_CHARS]
+    return os.path.join(output_dir, shard, f"{_safe_doc_name(doc_id)}_payload{suffix}")
+
+
+def _unique_docs(docs, output_dir: str | None, suffix: str):
+    """
+    Mark documents whose id, or sharded output path, repeats an earlier one
+    as errors, so no two workers write the same payload file.
+    """
+    seen_ids = set()
+    seen_paths: dict[str, str] = {}
+    for doc in docs:
+        if "error" not in doc:
+            if doc["id"] in seen_ids:
+                doc = {**doc, "error": f"Duplicate document id: {doc['id']}"}
+            elif output_dir:
+                path = _shard_path(output_dir, doc["id"], suffix)
+                if path in seen_paths:
+                    doc = {**doc, "error": f"Output path collides with document "
+                                           f"{seen_paths[path]}"}
+                else:
+                    seen_paths[path] = doc["id"]
+            if "error" not in doc:
+                seen_ids.add(doc["id"])
+        yield doc
+
+
+def _bulk_worker(task: tuple[dict, str | None, bool, str | None]) -> tuple[dict, dict | None]:
+    """
+    Preprocess one corpus document in a worker process.
+
+    Writes the payload to its shard when ``output_dir`` is set; otherwise
+    returns it to the parent for streaming. Errors are captured per document.
+    """
+    doc, output_dir, binary, compression = task
+    start = time.perf_counter()
+    entry = {"id": doc["id"], "source": doc.get("path", doc["id"])}
+    try:
+        if "error" in doc:
+            raise ValueError(doc["error"])
+        if "path" in doc:
+            ext = Path(doc["path"]).suffix.lower()
+            with open(doc["path"], encoding="utf-8") as f:
+                raw = f.read()
+            source_file = os.path.basename(doc["path"])
+            file_format = ext.lstrip('.')
+            size = os.path.getsize(doc["path"])
+        else:
+            raw = doc["text"]
+            if not isinstance(raw, str):
+                raise ValueError("Record has no text")
+            file_format = str(doc["format"]).lower().lstrip('.')
+            if '.' + file_format not in SUPPORTED_EXTENSIONS:
+                raise ValueError(f"Unsupported text format: {file_format}")
+            source_file = doc["id"]
+            size = len(raw.encode("utf-8"))
+
+        text = strip_html(raw) if file_format in ("html", "htm") else raw
+        payload = build_payload(text, source_file, file_format, size)
+        entry["word_count"] = payload["metadata"]["word_count"]
+
+        if output_dir:
+            out_path = _shard_path(output_dir, doc["id"],
+                                   BINARY_SUFFIX if binary else ".json")
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            write_payload(payload, out_path, compression)
+            entry["output"] = os.path.relpath(out_path, output_dir)
+            payload = None
+        entry["status"] = "ok"
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = f"{type(e).__name__}: {e}"
+        payload = None
+    entry["wall_sec"] = round(time.perf_counter() - start, 4)
+    return entry, payload
+
+
+def preprocess_bulk(source: str, output_dir: str | None = None,
+                    jsonl_output: str | None = None, workers: int | None = None,
+                    text_field: str = "text", id_field: str = "id",
+                    doc_format: str = "md", binary: bool = False,
+                    compression: str | None = None) -> dict:
+    """
+    Preprocess a whole corpus in a process pool.
+
+    Writes one payload per document into a sharded ``output_dir``, or one
+    compact JSON line per document to ``jsonl_output``. A manifest with
+    per-document status, timing and errors is written next to the output
+    and returned. ``binary`` and ``compression`` apply to the sharded
+    directory output; the JSONL stream is always JSON.
+    """
+    if bool(output_dir) == bool(jsonl_output):
+        raise ValueError("Bulk mode needs exactly one of an output directory "
+                         "or a JSONL output path")
+    if jsonl_output and (binary or compression):
+        raise ValueError("JSONL output is JSON only; binary and compression "
+                         "need a sharded output directory")
+    check_output_format(None, binary, compression)
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, "manifest.json")
+    else:
+        manifest_path = jsonl_output + ".manifest.json"
+
+    docs = _unique_docs(iter_corpus(source, text_field, id_field, doc_format),
+                        output_dir, BINARY_SUFFIX if binary else ".json")
+    tasks = ((doc, output_dir, binary, compression) for doc in docs)
+    entries = []
+    stream = open(jsonl_output, "w") if jsonl_output else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for entry, payload in pool.map(_bulk_worker, tasks,
+                                           chunksize=BULK_CHUNKSIZE):
+                if stream and payload is not None:
+                    stream.write(json.dumps(payload))
+                    stream.write("\n")
+                    entry["output"] = os.path.basename(jsonl_output)
+                entries.append(entry)
+                if len(entries) % 500 == 0:
+                    print(f"  Processed {len(entries):,} documents...")
+    finally:
+        if stream:
+            stream.close()
+
+    failed = sum(1 for e in entries if e["status"] != "ok")
+    manifest = {
+        "source": os.path.abspath(source),
+        "output": os.path.abspath(output_dir or jsonl_output),
+        "started_at": started_at,
+        "wall_sec": round(time.perf_counter() - start, 3),
+        "documents": len(entries),
+        "succeeded": len(entries) - failed,
+        "failed": failed,
+        "total_doc_wall_sec": round(sum(e["wall_sec"] for e in entries), 3),
+        "entries": entries,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"  Manifest saved: {manifest_path}")
+    return manifest
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Preprocess text content for Themis evaluation"
     )
-    parser.add_argument("text_file", help="Path to text file (.txt, .md, .html)")
-    parser.add_argument("-o", "--output", help="Output payload JSON path")
+    parser.add_argument("text_file",
+                        help="Path to text file (.txt, .md, .html); with --bulk, "
+                             "a directory tree, .jsonl or .csv corpus")
+    parser.add_argument("-o", "--output",
+                        help="Output payload path, .json or binary .themis "
+                             "(with --bulk: sharded output directory)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Preprocess every document in a corpus using a process pool")
+    parser.add_argument("--jsonl-output",
+                        help="Bulk mode: write all payloads as one JSONL stream instead "
+                             "of a sharded directory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Bulk mode: worker processes (default: CPU count)")
+    parser.add_argument("--text-field", default="text",
+                        help="Bulk mode: JSONL field / CSV column holding the text "
+                             "(default: text)")
+    parser.add_argument("--id-field", default="id",
+                        help="Bulk mode: JSONL field / CSV column holding the document id "
+                             "(default: id)")
+    parser.add_argument("--binary", action="store_true",
+                        help="Write the binary .themis container (raw bytes, indexed "
+                             "chunks) instead of JSON")
+    parser.add_argument("--compression", choices=COMPRESSIONS,
+                        help="Compress text fields of binary payloads")
+    parser.add_argument("--doc-format", default="md", choices=["txt", "md", "html"],
+                        help="Bulk mode: format of JSONL/CSV record text (default: md)")
     args = parser.parse_args()
 
     try:
-        preprocess(args.text_file, output_path=args.output)
+        if args.bulk:
+            print(f"Bulk preprocessing: {args.text_file}")
+            manifest = preprocess_bulk(
+                args.text_file,
+                output_dir=args.output,
+                jsonl_output=args.jsonl_output,
+                workers=args.workers,
+                text_field=args.text_field,
+                id_field=args.id_field,
+                doc_format=args.doc_format,
+                binary=args.binary,
+                compression=args.compression,
+            )
+            print(f"  Documents: {manifest['documents']:,} "
+                  f"(ok: {manifest['succeeded']:,}, failed: {manifest['failed']:,}) "
+                  f"in {manifest['wall_sec']:.1f}s")
+        else:
+            preprocess(args.text_file, output_path=args.output,
+                       binary=args.binary, compression=args.compression)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -10,11 +10,33 @@ import argparse
 import base64
 import json
 import os
+import platform
+import queue
+import re
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 from pathlib import Path
 
+from keyframe_descriptors import compute_descriptors
+from payload_io import BINARY_SUFFIX, COMPRESSIONS, check_output_format, write_payload
+from token_estimator import image_dimensions
+
+
+# FFmpeg timeout model: allow a fixed startup budget plus the probed duration
+# processed at a pessimistic speed. Once FFmpeg reports its real speed the
+# deadline is recomputed from the remaining media time.
+FFMPEG_BASE_TIMEOUT_SEC = 30
+FFMPEG_UNKNOWN_DURATION_TIMEOUT_SEC = 120  # the old fixed timeout, when ffprobe reports no duration
+FFMPEG_MIN_EXPECTED_SPEED = 0.25  # 4x slower than realtime before we give up
+FFMPEG_TIMEOUT_SAFETY_FACTOR = 3.0
+FFMPEG_STALL_TIMEOUT_SEC = 60  # no progress output at all for this long
+
+# Frame timestamp in FFmpeg showinfo log lines
+_SHOWINFO_PTS_RE = re.compile(r"\bpts_time:\s*([0-9.]+)")
+
 
 def get_video_metadata(video_path: str) -> dict:
     """Extract video metadata using ffprobe."""
@@ -61,15 +83,190 @@ def _parse_fps(fps_str: str) -> float:
         return 30.0
 
 
+def ffmpeg_timeout(duration_sec: float, speed: float | None = None,
+                   position_sec: float = 0.0) -> float:
+    """
+    Compute the remaining time budget (seconds) for an FFmpeg run.
+
+    Before any speed measurement the budget assumes FFMPEG_MIN_EXPECTED_SPEED.
+    With a measured speed multiple the remaining media time is divided by it
+    and padded by FFMPEG_TIMEOUT_SAFETY_FACTOR. When the duration is unknown
+    (0 from streams or broken headers) the budget never drops below
+    FFMPEG_UNKNOWN_DURATION_TIMEOUT_SEC.
+    """
+    remaining = max(duration_sec - position_sec, 0.0)
+    if speed and speed > 0:
+        budget = FFMPEG_BASE_TIMEOUT_SEC + remaining / speed * FFMPEG_TIMEOUT_SAFETY_FACTOR
+    else:
+        budget = FFMPEG_BASE_TIMEOUT_SEC + remaining / FFMPEG_MIN_EXPECTED_SPEED
+    if duration_sec <= 0:
+        budget = max(budget, FFMPEG_UNKNOWN_DURATION_TIMEOUT_SEC)
+    return budget
+
+
+def _parse_progress_time(block: dict) -> float:
+    """Read the output position (seconds) from an FFmpeg progress block."""
+    # out_time_us is authoritative; out_time_ms is also microseconds (FFmpeg quirk)
+    for key in ("out_time_us", "out_time_ms"):
+        try:
+            return max(int(block[key]) / 1_000_000, 0.0)
+        except (KeyError, ValueError):
+            continue
+    return 0.0
+
+
+def _parse_progress_float(value: str | None) -> float | None:
+    """Parse FFmpeg progress numbers like '4.12x' or 'N/A'."""
+    if value is None:
+        return None
+    try:
+        return float(value.rstrip("x"))
+    except ValueError:
+        return None
+
+
+def run_ffmpeg(cmd: list[str], stage: str, duration_sec: float,
+               progress_callback=None, stderr_callback=None) -> dict:
+    """
+    Run an FFmpeg command with machine-readable progress reporting.
+
+    Injects ``-progress pipe:1`` so FFmpeg writes key=value blocks to stdout.
+    Each block becomes a progress event (frame, fps, speed, percent, ETA)
+    passed to ``progress_callback``; log lines go to ``stderr_callback``.
+    The deadline starts from the probed
+    duration and is recomputed from the measured speed; a run that stalls or
+    exceeds its deadline is killed and raises RuntimeError.
+
+    Returns stage statistics (wall time, final fps/speed, frames, returncode).
+    """
+    cmd = [cmd[0], "-nostats", "-progress", "pipe:1"] + cmd[1:]
+    start = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True)
+
+    # Drain both pipes on background threads so neither can fill and block
+    lines: queue.Queue = queue.Queue()
+    stderr_tail: list[str] = []
+
+    def read_stdout():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def read_stderr():
+        for line in proc.stderr:
+            if stderr_callback:
+                stderr_callback(line)
+            stderr_tail.append(line)
+            if len(stderr_tail) > 50:
+                del stderr_tail[0]
+
+    threads = [threading.Thread(target=read_stdout, daemon=True),
+               threading.Thread(target=read_stderr, daemon=True)]
+    for t in threads:
+        t.start()
+
+    deadline = start + ffmpeg_timeout(duration_sec)
+    last_output = start
+    block: dict = {}
+    last_event: dict = {}
+    timed_out = None
+
+    while True:
+        now = time.monotonic()
+        if now > deadline:
+            timed_out = f"exceeded {deadline - start:.0f}s deadline"
+            break
+        if now - last_output > FFMPEG_STALL_TIMEOUT_SEC:
+            timed_out = f"no progress for {FFMPEG_STALL_TIMEOUT_SEC}s"
+            break
+        try:
+            wait = min(1.0, deadline - now,
+                       last_output + FFMPEG_STALL_TIMEOUT_SEC - now)
+            line = lines.get(timeout=max(wait, 0.01))
+        except queue.Empty:
+            continue
+        if line is None:
+            break
+        last_output = time.monotonic()
+
+        key, _, value = line.strip().partition("=")
+        if not key:
+            continue
+        block[key] = value
+        if key != "progress":
+            continue
+
+        # A "progress=" line terminates one block
+        elapsed = last_output - start
+        position = _parse_progress_time(block)
+        speed = _parse_progress_float(block.get("speed"))
+        eta = None
+        if speed and duration_sec > 0:
+            eta = round(max(duration_sec - position, 0.0) / speed, 1)
+            deadline = last_output + ffmpeg_timeout(duration_sec, speed, position)
+        last_event = {
+            "stage": stage,
+            "frame": int(_parse_progress_float(block.get("frame")) or 0),
+            "fps": _parse_progress_float(block.get("fps")),
+            "speed": speed,
+            "position_sec": round(position, 2),
+            "percent": (round(min(position / duration_sec, 1.0) * 100, 1)
+                        if duration_sec > 0 else None),
+            "eta_sec": eta,
+            "elapsed_sec": round(elapsed, 2),
+            "done": value == "end",
+        }
+        if progress_callback:
+            progress_callback(last_event)
+        block = {}
+
+    if timed_out:
+        proc.kill()
+    proc.wait()
+    for t in threads:
+        t.join(timeout=5)
+
+    wall = time.monotonic() - start
+    if timed_out:
+        detail = "".join(stderr_tail[-5:]).strip()
+        raise RuntimeError(
+            f"ffmpeg {stage} timed out ({timed_out}, "
+            f"last position {last_event.get('position_sec', 0)}s of "
+            f"{duration_sec:.1f}s): {detail}"
+        )
+
+    return {
+        "wall_sec": round(wall, 3),
+        "frames": last_event.get("frame", 0),
+        "fps": last_event.get("fps"),
+        "speed": last_event.get("speed"),
+        "returncode": proc.returncode,
+    }
+
+
+def _frame_number(path: Path) -> int:
+    """The number FFmpeg wrote into a frame_<n>.jpg filename."""
+    return int(path.stem.rsplit("_", 1)[1])
+
+
 def extract_keyframes(video_path: str, output_dir: str, threshold: float = 0.3,
-                      max_frames: int = 20, min_frames: int = 5) -> list[dict]:
+                      max_frames: int = 20, min_frames: int = 5,
+                      duration_sec: float | None = None,
+                      progress_callback=None,
+                      stage_timings: dict | None = None) -> list[dict]:
     """
     Extract scene-change keyframes using FFmpeg.
 
     Uses the 'select' filter with scene change detection. Falls back to
-    uniform sampling if scene detection yields too few frames.
+    uniform sampling if scene detection yields too few frames. Per-stage
+    FFmpeg statistics are written into ``stage_timings`` when given.
     """
     os.makedirs(output_dir, exist_ok=True)
+    if stage_timings is None:
+        stage_timings = {}
+    if duration_sec is None:
+        duration_sec = get_video_metadata(video_path)["duration_sec"]
 
     # Scene-change detection
     cmd = [
@@ -80,9 +277,23 @@ def extract_keyframes(video_path: str, output_dir: str, threshold: float = 0.3,
         f"{output_dir}/frame_%04d.jpg",
         "-y", "-loglevel", "info"
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    # showinfo logs one line per selected frame, in output order
+    pts_times: list[float] = []
+
+    def collect_pts(line: str):
+        m = _SHOWINFO_PTS_RE.search(line)
+        if m:
+            pts_times.append(float(m.group(1)))
+
+    stage_timings["scene_detection"] = run_ffmpeg(
+        cmd, "scene_detection", duration_sec, progress_callback,
+        stderr_callback=collect_pts,
+    )
 
-    frames = sorted(Path(output_dir).glob("frame_*.jpg"))
+    # With -frame_pts the file number is the PTS: sort numerically, since
+    # names stop sorting correctly once the PTS outgrows the %04d padding
+    frames = sorted(Path(output_dir).glob("frame_*.jpg"), key=_frame_number)
+    timestamps = {f.name: pts_times[i] for i, f in enumerate(frames) if i < len(pts_times)}
 
     # Fallback to uniform sampling if too few frames
     if len(frames) < min_frames:
@@ -90,9 +301,7 @@ def extract_keyframes(video_path: str, output_dir: str, threshold: float = 0.3,
         for f in frames:
             f.unlink()
 
-        metadata = get_video_metadata(video_path)
-        duration = metadata["duration_sec"]
-        interval = max(duration / (min_frames + 1), 0.5)
+        interval = max(duration_sec / (min_frames + 1), 0.5)
 
         cmd = [
             "ffmpeg", "-i", video_path,
@@ -100,8 +309,12 @@ def extract_keyframes(video_path: str, output_dir: str, threshold: float = 0.3,
             f"{output_dir}/frame_%04d.jpg",
             "-y", "-loglevel", "warning"
         ]
-        subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        frames = sorted(Path(output_dir).glob("frame_*.jpg"))
+        stage_timings["uniform_sampling"] = run_ffmpeg(
+            cmd, "uniform_sampling", duration_sec, progress_callback
+        )
+        frames = sorted(Path(output_dir).glob("frame_*.jpg"), key=_frame_number)
+        # fps=1/interval emits its k-th frame at k * interval
+        timestamps = {f.name: round(i * interval, 3) for i, f in enumerate(frames)}
 
     # Cap at max_frames (keep first, last, and evenly distributed middle)
     if len(frames) > max_frames:
@@ -116,17 +329,40 @@ def extract_keyframes(video_path: str, output_dir: str, threshold: float = 0.3,
                 f.unlink()
         frames = keep
 
+    # Sequential fixed-width names, so the descriptor pass (which reads the
+    # glob in filename order) sees the frames in the same order
+    width = max(4, len(str(len(frames))))
+    renamed = []
+    for i, f in enumerate(frames):
+        target = f.with_name(f"keyframe_{i:0{width}d}.jpg")
+        f.rename(target)
+        timestamps[target.name] = timestamps.pop(f.name, None)
+        renamed.append(target)
+    frames = renamed
+
+    # Compact descriptors for diversity-based selection, one FFmpeg pass
+    descriptors = compute_descriptors(f"{output_dir}/keyframe_*.jpg", len(frames)) if frames else []
+    if descriptors is None:
+        print("  Warning: keyframe descriptors unavailable", file=sys.stderr)
+
     # Build frame metadata
     frame_data = []
     for i, frame_path in enumerate(frames):
         with open(frame_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
+            data = f.read()
+        # Header-only read; lets token estimates skip the base64 data
+        width, height = image_dimensions(data) or (0, 0)
         frame_data.append({
             "index": i,
             "filename": frame_path.name,
-            "base64": b64,
+            "base64": base64.b64encode(data).decode("utf-8"),
             "media_type": "image/jpeg",
+            "width": width,
+            "height": height,
+            "timestamp_sec": timestamps.get(frame_path.name),
         })
+        if descriptors:
+            frame_data[-1]["descriptor"] = descriptors[i]
 
     return frame_data
 
@@ -161,19 +397,50 @@ def transcribe_audio(video_path: str, model_name: str = "base") -> dict:
     }
 
 
+_last_progress_print: dict[str, float] = {}
+
+
+def print_progress(event: dict):
+    """Default progress reporter: one line per stage every few seconds."""
+    now = time.monotonic()
+    if not event["done"] and now - _last_progress_print.get(event["stage"], 0) < 5:
+        return
+    _last_progress_print[event["stage"]] = now
+    percent = f"{event['percent']:.0f}%" if event["percent"] is not None else "?"
+    speed = f"{event['speed']:.2f}x" if event["speed"] else "?"
+    eta = f"{event['eta_sec']:.0f}s" if event["eta_sec"] is not None else "?"
+    print(f"    [{event['stage']}] {percent} frame={event['frame']} "
+          f"fps={event['fps'] or 0:.0f} speed={speed} eta={eta}")
+
+
+def print_progress_json(event: dict):
+    """Emit each progress event as a JSON line on stderr."""
+    print(json.dumps(event), file=sys.stderr, flush=True)
+
+
 def preprocess(video_path: str, output_path: str | None = None,
                whisper_model: str = "base", scene_threshold: float = 0.3,
-               max_frames: int = 20) -> dict:
-    """Run full preprocessing pipeline and return payload."""
+               max_frames: int = 20, progress_callback=print_progress,
+               binary: bool = False, compression: str | None = None) -> dict:
+    """
+    Run full preprocessing pipeline and return payload.
+
+    ``binary`` makes the default output a ``.themis`` binary container with
+    raw keyframe bytes; ``compression`` (gzip/zstd) applies to its text fields.
+    """
+    check_output_format(output_path, binary, compression)
     video_path = os.path.abspath(video_path)
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video not found: {video_path}")
 
     print(f"Preprocessing: {video_path}")
+    stage_timings: dict[str, dict] = {}
 
     # 1. Extract metadata
     print("  Extracting metadata...")
+    stage_start = time.monotonic()
     metadata = get_video_metadata(video_path)
+    stage_timings["probe"] = {"wall_sec": round(time.monotonic() - stage_start, 3)}
     print(f"  Duration: {metadata['duration_sec']:.1f}s, "
           f"Resolution: {metadata['width']}x{metadata['height']}")
 
@@ -183,14 +450,24 @@ def preprocess(video_path: str, output_path: str | None = None,
         frames = extract_keyframes(
             video_path, tmpdir,
             threshold=scene_threshold,
-            max_frames=max_frames
+            max_frames=max_frames,
+            duration_sec=metadata["duration_sec"],
+            progress_callback=progress_callback,
+            stage_timings=stage_timings,
         )
         print(f"  Extracted {len(frames)} keyframes")
 
         # 3. Transcribe audio
         print(f"  Transcribing audio (model={whisper_model})...")
         if metadata["has_audio"]:
+            stage_start = time.monotonic()
             transcript = transcribe_audio(video_path, model_name=whisper_model)
+            wall = time.monotonic() - stage_start
+            stage_timings["transcription"] = {
+                "wall_sec": round(wall, 3),
+                "speed": round(metadata["duration_sec"] / wall, 2) if wall > 0 else None,
+                "model": whisper_model,
+            }
             print(f"  Transcript: {len(transcript['text'])} chars, "
                   f"{len(transcript['segments'])} segments")
         else:
@@ -198,6 +475,13 @@ def preprocess(video_path: str, output_path: str | None = None,
             print("  No audio track found")
 
         # 4. Build payload
+        metadata["preprocessing"] = {
+            "host": platform.node(),
+            "total_wall_sec": round(sum(
+                t["wall_sec"] for t in stage_timings.values()
+            ), 3),
+            "stages": stage_timings,
+        }
         payload = {
             "source_file": os.path.basename(video_path),
             "content_type": "video",
@@ -209,11 +493,10 @@ def preprocess(video_path: str, output_path: str | None = None,
 
     # 5. Save payload
     if output_path is None:
-        output_path = os.path.splitext(video_path)[0] + "_payload.json"
+        suffix = BINARY_SUFFIX if binary else ".json"
+        output_path = os.path.splitext(video_path)[0] + "_payload" + suffix
 
-    with open(output_path, "w") as f:
-        json.dump(payload, f, indent=2)
-    payload_size = os.path.getsize(output_path)
+    payload_size = write_payload(payload, output_path, compression)
     print(f"  Payload saved: {output_path} ({payload_size:,} bytes)")
 
     return payload
@@ -224,7 +507,7 @@ def main():
         description="Preprocess video for Themis evaluation"
     )
     parser.add_argument("video", help="Path to video file")
-    parser.add_argument("-o", "--output", help="Output payload JSON path")
+    parser.add_argument("-o", "--output", help="Output payload path (.json, or .themis for binary)")
     parser.add_argument("--whisper-model", default="base",
                         choices=["tiny", "base", "small", "medium", "large"],
                         help="Whisper model size (default: base)")
@@ -232,8 +515,23 @@ def main():
                         help="Scene change detection threshold (default: 0.3)")
     parser.add_argument("--max-frames", type=int, default=20,
                         help="Maximum keyframes to extract (default: 20)")
+    parser.add_argument("--binary", action="store_true",
+                        help="Write the binary .themis container (raw JPEG bytes, no "
+                             "base64) instead of JSON")
+    parser.add_argument("--compression", choices=COMPRESSIONS,
+                        help="Compress text fields of binary payloads")
+    parser.add_argument("--progress", default="text",
+                        choices=["text", "json", "none"],
+                        help="FFmpeg progress reporting: human-readable lines, "
+                             "JSON events on stderr, or silent (default: text)")
     args = parser.parse_args()
 
+    progress_callbacks = {
+        "text": print_progress,
+        "json": print_progress_json,
+        "none": None,
+    }
+
     try:
         preprocess(
             args.video,
@@ -241,6 +539,9 @@ def main():
             whisper_model=args.whisper_model,
             scene_threshold=args.scene_threshold,
             max_frames=args.max_frames,
+            progress_callback=progress_callbacks[args.progress],
+            binary=args.binary,
+            compression=args.compression,
         )
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
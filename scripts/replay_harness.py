@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Offline replay harness: the full Themis pipeline with a local stand-in judge.
+
+StandInJudge answers every model stage with a schema-valid output (see
+references/output-schema.md), replayed from recorded real responses when
+available and generated otherwise, with latency sampled from latency_sim's
+per-model distributions and token counts drawn around token_tracker's
+per-stage estimates. The driver runs the real script chain (preprocess,
+text_forensics --inject, format_payload --output-dir, merge_scores) as
+subprocesses, the way the evaluate skill does, and the model stages
+through the stand-in in DAG order. Runs report per-step wall times and
+throughput, i.e. the cost of everything except the model itself.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from latency_sim import pipeline_dag, sample_duration, schedule, skip_stages
+from merge_scores import (
+    CONTENT_COMPONENTS,
+    CRITIC_TARGET_COMPONENTS,
+    confidence_weighted_average,
+    detect_disagreements,
+)
+from preprocess_text import SUPPORTED_EXTENSIONS as TEXT_EXTENSIONS
+from token_tracker import STAGE_MODELS, estimate_pipeline_cost, stage_kind
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Key sub-scores per judge (output-schema.md, Judge-Specific Primary Dimensions)
+JUDGE_SUB_SCORES = {
+    "hook_analyst": ("attention_grab", "opening_strength", "curiosity_gap", "first_frame_impact"),
+    "emotion_analyst": ("emotional_arc", "persuasion_strength", "authenticity", "memorability"),
+    "production_analyst": ("visual_quality", "pacing", "audio_quality", "editing_craft"),
+    "trend_analyst": ("trend_relevance", "timing", "cultural_moment", "format_alignment"),
+    "subject_analyst": ("subject_clarity", "theme_strength", "niche_specificity"),
+    "audience_mapper": ("community_fit", "share_motivation", "platform_optimization"),
+    "authenticity_analyst": ("statistical_signal_strength", "qualitative_signal_strength",
+                             "voice_authenticity", "structural_naturalness"),
+}
+CRITIC_ISSUE_TYPES = ("logical_flaw", "anchoring_bias", "missing_consideration",
+                      "contradiction", "overconfidence")
+
+# Synthetic scores: judges scatter around a per-evaluation quality
+JUDGE_SCORE_SIGMA = 12
+SUB_SCORE_SIGMA = 8
+
+DEFAULT_TIME_SCALE = 0.0   # 0 = no sleeping, 1 = real time
+DEFAULT_RUNS = 10
+
+
+def _clamp(value: float, lo: int = 0, hi: int = 100) -> int:
+    return max(lo, min(hi, round(value)))
+
+
+def _problem(problems: list, ok: bool, message: str):
+    if not ok:
+        problems.append(message)
+
+
+def _is_score(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 100
+
+
+def _is_unit(value) -> bool:
+    return isinstance(value, (int, float)) and 0.0 <= value <= 1.0
+
+
+def validate_judge_output(output: dict) -> list[str]:
+    """Problems with a judge output against the Judge Output Schema (empty if valid)."""
+    problems = []
+    _problem(problems, isinstance(output.get("judge"), str), "judge must be a string")
+    _problem(problems, output.get("round") in (1, 2), "round must be 1 or 2")
+    scores = output.get("scores", {})
+    _problem(problems, _is_score(scores.get("primary_score")), "primary_score must be 0-100")
+    sub_scores = scores.get("sub_scores", {})
+    _problem(problems, isinstance(sub_scores, dict), "sub_scores must be an object")
+    if isinstance(sub_scores, dict):
+        for key, value in sub_scores.items():
+            _problem(problems, _is_score(value), f"sub_scores.{key} must be 0-100")
+    _problem(problems, _is_unit(output.get("confidence")), "confidence must be 0.0-1.0")
+    reasoning = output.get("reasoning", {})
+    _problem(problems, isinstance(reasoning.get("assessment"), str), "reasoning.assessment missing")
+    for key in ("evidence", "concerns"):
+        _problem(problems, isinstance(reasoning.get(key, []), list), f"reasoning.{key} must be a list")
+    return problems
+
+
+def validate_critic_output(output: dict) -> list[str]:
+    """Problems with a critic output against the Critic Output Schema."""
+    problems = []
+    _problem(problems, output.get("judge") == "critic", 'judge must be "critic"')
+    challenges = output.get("challenges")
+    _problem(problems, isinstance(challenges, list) and challenges,
+             "at least one challenge is required")
+    for i, c in enumerate(challenges or []):
+        _problem(problems, c.get("issue_type") in CRITIC_ISSUE_TYPES,
+                 f"challenges[{i}].issue_type invalid")
+        _problem(problems, c.get("severity") in ("minor", "moderate", "major"),
+                 f"challenges[{i}].severity invalid")
+    adjustment = output.get("overall_confidence_adjustment", 0.0)
+    _problem(problems, isinstance(adjustment, (int, float)) and -0.2 <= adjustment <= 0.1,
+             "overall_confidence_adjustment must be -0.2 to +0.1")
+    return problems
+
+
+def _recording_key(output: dict) -> str | None:
+    """Stage-like key a recorded output answers: judge name, council consensus or critic."""
+    if "council" in output and "consensus_scores" in output:
+        return f"{output['council']}_council_consensus"
+    return output.get("judge")
+
+
+def load_recordings(paths: list[str]) -> dict[str, list[dict]]:
+    """
+    Recorded outputs (JSON files, lists or directories of them) by key.
+
+    Judge and critic outputs that fail schema validation are rejected.
+    """
+    recordings: dict[str, list[dict]] = {}
+    for path in paths:
+        files = sorted(Path(path).glob("*.json")) if Path(path).is_dir() else [Path(path)]
+        for file in files:
+            with open(file) as f:
+                data = json.load(f)
+            for output in data if isinstance(data, list) else [data]:
+                key = _recording_key(output) if isinstance(output, dict) else None
+                if key is None:
+                    continue
+                if key == "critic":
+                    problems = validate_critic_output(output)
+                elif key in JUDGE_SUB_SCORES:
+                    problems = validate_judge_output(output)
+                else:
+                    problems = []
+                if problems:
+                    raise ValueError(f"{file}: recorded {key} output is not schema-valid: "
+                                     f"{'; '.join(problems)}")
+                recordings.setdefault(key, []).append(output)
+    return recordings
+
+
+class StandInJudge:
+    """
+    Local stand-in for every model stage.
+
+    ``respond`` returns the stage's output, its usage record and its
+    sampled latency, sleeping ``latency * time_scale`` first. Outputs are
+    drawn from ``recordings`` when one matches the stage, and generated
+    otherwise; token counts scatter lognormally (``token_sigma``) around
+    ``stage_tokens``.
+    """
+
+    def __init__(self, mode: str = "full", stage_tokens: dict | None = None,
+                 recordings: dict[str, list[dict]] | None = None, seed: int = 0,
+                 time_scale: float = DEFAULT_TIME_SCALE, token_sigma: float = 0.3):
+        self.mode = mode
+        self.models = STAGE_MODELS.get(mode, STAGE_MODELS["full"])
+        self.stage_tokens = stage_tokens or estimate_pipeline_cost(mode)["stages"]
+        self.recordings = recordings or {}
+        self.time_scale = time_scale
+        self.token_sigma = token_sigma
+        self.rng = random.Random(seed)
+        self.quality = self.rng.uniform(25, 85)
+        self._lock = threading.Lock()
+
+    def respond(self, stage: str, upstream: dict[str, dict]) -> dict:
+        """Answer one stage given the outputs of its prerequisite stages."""
+        with self._lock:  # one shared rng keeps a seeded run reproducible
+            output = self._output(stage, upstream)
+            model = self.models.get(stage, "sonnet")
+            tokens = dict(self.stage_tokens.get(stage) or {"input": 0, "output": 0, "cache_hits": 0})
+            tokens["output"] = max(1, round(tokens["output"]
+                                            * math.exp(self.rng.gauss(0.0, self.token_sigma))))
+            latency = sample_duration(self.rng, stage, model, tokens)
+        if self.time_scale:
+            time.sleep(latency * self.time_scale)
+        usage = {
+            "stage": stage,
+            "model": f"claude-{model}",
+            "usage": {
+                "input_tokens": tokens["input"] - tokens["cache_hits"],
+                "output_tokens": tokens["output"],
+                "cache_read_input_tokens": tokens["cache_hits"],
+                "cache_creation_input_tokens": tokens.get("cache_writes", 0),
+            },
+            "duration_ms": round(latency * 1000),
+        }
+        return {"output": output, "usage": usage, "latency_sec": latency}
+
+    def _output(self, stage: str, upstream: dict[str, dict]) -> dict:
+        kind = stage_kind(stage)
+        key = stage[:-3] if kind.startswith("judge") else stage
+        if self.recordings.get(key):
+            output = json.loads(json.dumps(self.rng.choice(self.recordings[key])))
+            if kind.startswith("judge"):
+                output["round"] = int(stage[-1])
+            return output
+        if kind == "judge_r1":
+            return self._judge(stage[:-3], self.quality)
+        if kind == "judge_r2":
+            return self._revision(stage[:-3], upstream)
+        if kind == "consensus":
+            return self._consensus(stage.split("_", 1)[0], upstream)
+        if kind == "cross_council":
+            return self._cross_council(stage.rsplit("_", 1)[1])
+        if kind == "critic":
+            return self._critic()
+        return {"judge": "synthesizer", "executive_summary": "Stand-in synthesis."}
+
+    def _judge(self, judge: str, center: float) -> dict:
+        primary = _clamp(self.rng.gauss(center, JUDGE_SCORE_SIGMA))
+        return {
+            "judge": judge,
+            "round": 1,
+            "scores": {
+                "primary_score": primary,
+                "sub_scores": {name: _clamp(self.rng.gauss(primary, SUB_SCORE_SIGMA))
+                               for name in JUDGE_SUB_SCORES[judge]},
+            },
+            "confidence": round(self.rng.uniform(0.55, 0.95), 2),
+            "reasoning": {
+                "assessment": f"Stand-in {judge} assessment.",
+                "evidence": ["stand-in evidence"],
+                "concerns": [],
+            },
+            "revision_notes": None,
+        }
+
+    def _revision(self, judge: str, upstream: dict[str, dict]) -> dict:
+        own = upstream.get(f"{judge}_r1") or self._judge(judge, self.quality)
+        peers = [o["scores"]["primary_score"] for o in upstream.values()]
+        mean = sum(peers) / len(peers) if peers else own["scores"]["primary_score"]
+        revised = json.loads(json.dumps(own))
+        revised["round"] = 2
+        revised["scores"]["primary_score"] = _clamp((own["scores"]["primary_score"] + mean) / 2)
+        revised["revision_notes"] = "Moved toward the council after reading peer outputs."
+        return revised
+
+    def _consensus(self, council: str, upstream: dict[str, dict]) -> dict:
+        outputs = list(upstream.values())
+        by_judge = {o["judge"]: o for o in outputs}
+        components = CONTENT_COMPONENTS if council == "content" else tuple(
+            c for c in CRITIC_TARGET_COMPONENTS.values() if c not in CONTENT_COMPONENTS)
+        owners = {dim: judge for judge, dim in CRITIC_TARGET_COMPONENTS.items()}
+        consensus_scores = {}
+        for dim in components:
+            owner = by_judge.get(owners[dim])
+            if owner:
+                consensus_scores[dim] = {"score": owner["scores"]["primary_score"],
+                                         "confidence": owner["confidence"],
+                                         "source": owner["judge"]}
+        score, confidence = confidence_weighted_average(
+            [(o["scores"]["primary_score"], o["confidence"]) for o in outputs])
+        overall = "overall_content_quality" if council == "content" else "overall_market_potential"
+        return {
+            "council": council,
+            "round": max((o.get("round", 1) for o in outputs), default=1),
+            "consensus_scores": consensus_scores,
+            overall: {"score": score, "confidence": confidence},
+            "consensus_narrative": f"Stand-in {council} council consensus.",
+            "disagreements": detect_disagreements(outputs),
+            "strengths": [],
+            "weaknesses": [],
+        }
+
+    def _cross_council(self, council: str) -> dict:
+        other = "market" if council == "content" else "content"
+        dims = CONTENT_COMPONENTS if council == "content" else ("trend_alignment", "shareability")
+        return {
+            "council": council,
+            "responding_to": other,
+            "score_adjustments": {dim: self.rng.randint(-3, 3) for dim in dims},
+        }
+
+    def _critic(self) -> dict:
+        targets = list(CRITIC_TARGET_COMPONENTS)
+        return {
+            "judge": "critic",
+            "challenges": [
+                {
+                    "target_judge": self.rng.choice(targets),
+                    "issue_type": self.rng.choice(CRITIC_ISSUE_TYPES),
+                    "description": "Stand-in challenge.",
+                    "severity": self.rng.choice(("minor", "moderate", "major")),
+                    "suggested_adjustment": self.rng.randint(-5, 5),
+                }
+                for _ in range(self.rng.randint(1, 3))
+            ],
+            "cross_council_tensions": [],
+            "overall_confidence_adjustment": round(self.rng.uniform(-0.1, 0.05), 2),
+        }
+
+
+def run_script(name: str, *args: str) -> float:
+    """Run a pipeline script as the skill does; returns its wall time."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, str(SCRIPTS_DIR / name), *args],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed: {proc.stderr.strip().splitlines()[-1:]}")
+    return time.perf_counter() - start
+
+
+def run_model_stages(judge: StandInJudge, mode: str, workdir: str,
+                     concurrency: int | None = None, skipped: list[str] | None = None) -> dict:
+    """
+    Dispatch the model stages through the stand-in in DAG order.
+
+    Writes each output to ``workdir/stages/<stage>.json`` and the usage
+    records to ``workdir/usage.jsonl``. Returns the wall time and the
+    simulated (unscaled) makespan of the sampled latencies.
+    """
+    dag = skip_stages(pipeline_dag(mode), ["preprocess", "text_forensics", *(skipped or [])])
+    stages_dir = os.path.join(workdir, "stages")
+    os.makedirs(stages_dir, exist_ok=True)
+    outputs: dict[str, dict] = {}
+    latencies: dict[str, float] = {}
+    pending = dict(dag)
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency or len(dag)) as pool, \
+            open(os.path.join(workdir, "usage.jsonl"), "w") as usage_log:
+        while pending or running:
+            for stage in [s for s, deps in pending.items() if all(d in outputs for d in deps)]:
+                upstream = {d: outputs[d] for d in pending.pop(stage)}
+                running[pool.submit(judge.respond, stage, upstream)] = stage
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                result = future.result()
+                outputs[stage] = result["output"]
+                latencies[stage] = result["latency_sec"]
+                with open(os.path.join(stages_dir, f"{stage}.json"), "w") as f:
+                    json.dump(result["output"], f, indent=2)
+                usage_log.write(json.dumps(result["usage"]) + "\n")
+    makespan, _ = schedule(dag, latencies, concurrency, set())
+    return {"wall_sec": time.perf_counter() - start, "simulated_sec": makespan,
+            "stages": len(dag)}
+
+
+def run_evaluation(input_path: str, workdir: str, judge: StandInJudge, mode: str = "full",
+                   concurrency: int | None = None) -> dict:
+    """
+    One end-to-end evaluation: preprocess, forensics, format, model stages, merge.
+
+    ``input_path`` is a raw text/video file, or an already preprocessed
+    payload (.json or .themis), which is copied so --inject does not
+    modify it. Returns per-step wall times and the merged output.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    steps = {}
+    ext = Path(input_path).suffix.lower()
+    payload = os.path.join(workdir, f"payload{ext if ext == '.themis' else '.json'}")
+    if ext in (".json", ".themis"):
+        shutil.copy(input_path, payload)
+        if os.path.exists(input_path + ".idx"):
+            shutil.copy(input_path + ".idx", payload + ".idx")
+    elif ext in TEXT_EXTENSIONS:
+        steps["preprocess"] = run_script("preprocess_text.py", input_path, "-o", payload)
+    else:
+        steps["preprocess"] = run_script("preprocess_video.py", input_path, "-o", payload)
+    steps["text_forensics"] = run_script("text_forensics.py", payload, "--inject",
+                                         "-o", os.path.join(workdir, "forensics.json"))
+    judges_dir = os.path.join(workdir, "judges")
+    steps["format_payload"] = run_script("format_payload.py", payload, "--output-dir", judges_dir)
+
+    model = run_model_stages(judge, mode, workdir, concurrency)
+    steps["model_stages"] = model["wall_sec"]
+
+    stages_dir = os.path.join(workdir, "stages")
+    output_path = os.path.join(workdir, "evaluation.json")
+    start = time.perf_counter()
+    with open(output_path, "w") as out:
+        proc = subprocess.run(
+            [sys.executable, str(SCRIPTS_DIR / "merge_scores.py"),
+             "--content-council", os.path.join(stages_dir, "content_council_consensus.json"),
+             "--market-council", os.path.join(stages_dir, "market_council_consensus.json"),
+             "--critic", os.path.join(stages_dir, "critic.json"),
+             "--mode", mode, "--usage-log", os.path.join(workdir, "usage.jsonl"),
+             "--payload", payload],
+            stdout=out, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"merge_scores.py failed: {proc.stderr.strip().splitlines()[-1:]}")
+    steps["merge_scores"] = time.perf_counter() - start
+
+    with open(output_path) as f:
+        output = json.load(f)
+    return {
+        "steps_sec": steps,
+        "local_sec": sum(v for k, v in steps.items() if k != "model_stages"),
+        "model_wall_sec": model["wall_sec"],
+        "simulated_model_sec": model["simulated_sec"],
+        "virality_score": output["virality"]["score"],
+        "cost_usd": output["metadata"].get("estimated_cost_usd"),
+    }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def benchmark(inputs: list[str], runs: int = DEFAULT_RUNS, mode: str = "full",
+              workers: int = 1, concurrency: int | None = None,
+              time_scale: float = DEFAULT_TIME_SCALE, recordings: dict | None = None,
+              seed: int = 0, workdir: str | None = None) -> dict:
+    """
+    Run ``runs`` evaluations (cycling through ``inputs``) on ``workers``
+    parallel drivers and summarize throughput and per-step wall times.
+    Steps differ between inputs (payloads skip preprocessing, for one), so
+    each step's percentiles cover the runs that had it.
+    """
+    root = workdir or tempfile.mkdtemp(prefix="themis_replay_")
+    stage_tokens = {}
+
+    def one(i: int) -> dict:
+        path = inputs[i % len(inputs)]
+        if path not in stage_tokens:
+            from payload_io import open_payload
+            ext = Path(path).suffix.lower()
+            payload = open_payload(path) if ext in (".json", ".themis") else None
+            stage_tokens[path] = estimate_pipeline_cost(mode, payload=payload)["stages"]
+        judge = StandInJudge(mode, stage_tokens[path], recordings, seed + i, time_scale)
+        return run_evaluation(path, os.path.join(root, f"run_{i:04d}"), judge, mode, concurrency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one, range(runs)))
+    wall = time.perf_counter() - start
+    if not workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+    steps = {}
+    for name in dict.fromkeys(n for r in results for n in r["steps_sec"]):
+        secs = [r["steps_sec"][name] for r in results if name in r["steps_sec"]]
+        steps[name] = {"runs": len(secs),
+                       "p50_sec": round(_percentile(secs, 0.5), 3),
+                       "p95_sec": round(_percentile(secs, 0.95), 3)}
+    local = [r["local_sec"] for r in results]
+    return {
+        "mode": mode,
+        "runs": runs,
+        "workers": workers,
+        "time_scale": time_scale,
+        "wall_sec": round(wall, 2),
+        "evaluations_per_min": round(runs / wall * 60, 1),
+        "local_p50_sec": round(_percentile(local, 0.5), 3),
+        "local_p95_sec": round(_percentile(local, 0.95), 3),
+        "steps": steps,
+        "simulated_model_p50_sec": round(_percentile(
+            [r["simulated_model_sec"] for r in results], 0.5), 1),
+        "mean_cost_usd": round(sum(r["cost_usd"] or 0 for r in results) / runs, 4),
+        "virality_scores": [r["virality_score"] for r in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Themis pipeline offline with a stand-in judge")
+    parser.add_argument("inputs", nargs="+",
+                        help="Text/video files or preprocessed payloads, cycled through the runs")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--mode", default="full", choices=["full", "fast"])
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Evaluations driven in parallel (load test)")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Concurrent model stages per evaluation (0 = unlimited)")
+    parser.add_argument("--time-scale", type=float, default=DEFAULT_TIME_SCALE,
+                        help="Sleep this fraction of each sampled model latency "
+                             "(0 = none, 1 = real time)")
+    parser.add_argument("--recordings", nargs="*", default=[],
+                        help="Recorded real outputs (JSON files or directories) to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep each run's files here (default: temporary)")
+    parser.add_argument("-o", "--output", help="Write the report JSON here")
+    args = parser.parse_args()
+
+    try:
+        recordings = load_recordings(args.recordings)
+        report = benchmark(args.inputs, args.runs, args.mode, args.workers,
+                           args.concurrency or None, args.time_scale, recordings,
+                           args.seed, args.workdir)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for name, step in report["steps"].items():
+        print(f"  {name:16s} p50 {step['p50_sec']:7.3f}s  p95 {step['p95_sec']:7.3f}s",
+              file=sys.stderr)
+    print(f"  {report['runs']} evaluations in {report['wall_sec']:.1f}s "
+          f"({report['evaluations_per_min']:.1f}/min)", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,9 @@ import re
 import statistics
 import sys
 
+from payload_io import open_payload, write_payload
+from preprocess_text import analyze_structure, section_text
+
 
 # LLM hedging phrases — common filler phrases in AI-generated text
 HEDGING_PHRASES = [
@@ -155,17 +158,13 @@ def count_syllables(word: str) -> int:
 
 
 def split_sentences(text: str) -> list[str]:
-    """Split text into sentences using punctuation boundaries."""
-    # Split on sentence-ending punctuation followed by whitespace or end
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    # Filter empty and very short fragments
-    return [s.strip() for s in sentences if len(s.strip()) > 2]
+    """Split text into sentences using the shared structural rules."""
+    return [text[s:e] for s, e in analyze_structure(text)["sentences"]]
 
 
 def split_paragraphs(text: str) -> list[str]:
     """Split text into paragraphs by blank lines."""
-    paragraphs = re.split(r'\n\s*\n', text.strip())
-    return [p.strip() for p in paragraphs if len(p.strip()) > 0]
+    return [text[s:e] for s, e in analyze_structure(text)["paragraphs"]]
 
 
 def get_words(text: str) -> list[str]:
@@ -503,10 +502,15 @@ def compute_composite_probability(metrics: dict) -> float:
     return round(weighted_sum / total_weight, 4)
 
 
-def analyze_text(text: str, min_words: int = DEFAULT_MIN_WORDS) -> dict:
+def analyze_text(text: str, min_words: int = DEFAULT_MIN_WORDS,
+                 structure: dict | None = None) -> dict:
     """
     Run full forensic analysis on text content.
 
+    ``structure`` is the payload's precomputed analyze_structure() result for
+    ``text``; when given, its sentence and paragraph spans are reused so
+    counts match the payload metadata.
+
     Returns dict with all metrics + composite AI probability.
     """
     words = get_words(text)
@@ -528,8 +532,10 @@ def analyze_text(text: str, min_words: int = DEFAULT_MIN_WORDS) -> dict:
             "caveat": "Insufficient text for reliable analysis.",
         }
 
-    sentences = split_sentences(text)
-    paragraphs = split_paragraphs(text)
+    if structure is None:
+        structure = analyze_structure(text)
+    sentences = [text[s:e] for s, e in structure["sentences"]]
+    paragraphs = [text[s:e] for s, e in structure["paragraphs"]]
 
     burstiness = compute_burstiness(sentences)
     ttr = compute_windowed_ttr(words)
@@ -581,15 +587,20 @@ def extract_text_from_payload(payload: dict) -> str:
     """Extract analyzable text from a Themis payload JSON."""
     content_type = payload.get("content_type", "video")
 
+    if "structure" in payload:
+        # Structure offsets refer to transcript.text; analyze that buffer
+        return payload.get("transcript", {}).get("text", "")
+
     if content_type == "text":
         # Text content: concatenate sections
         sections = payload.get("sections", [])
         if sections:
+            full_text = payload.get("transcript", {}).get("text", "")
             parts = []
             for section in sections:
                 if isinstance(section, dict):
                     heading = section.get("heading", "")
-                    content = section.get("content", "")
+                    content = section_text(full_text, section)
                     if heading:
                         parts.append(heading)
                     if content:
@@ -619,7 +630,7 @@ def main():
     parser.add_argument(
         "payload",
         nargs="?",
-        help="Path to Themis payload JSON"
+        help="Path to Themis payload (.json or binary .themis)"
     )
     parser.add_argument(
         "--text-file",
@@ -635,23 +646,40 @@ def main():
         default=DEFAULT_MIN_WORDS,
         help=f"Minimum word count for analysis (default: {DEFAULT_MIN_WORDS})"
     )
+    parser.add_argument(
+        "--inject",
+        action="store_true",
+        help="Write the result into the payload as 'text_forensics' (keeps its index valid)"
+    )
     args = parser.parse_args()
 
+    if args.inject and not args.payload:
+        parser.error("--inject requires a payload path")
+
+    structure = None
     if args.text_file:
         with open(args.text_file) as f:
             text = f.read()
     elif args.payload:
-        with open(args.payload) as f:
-            payload = json.load(f)
+        payload = open_payload(args.payload)
         text = extract_text_from_payload(payload)
+        structure = payload.get("structure")
     else:
         parser.error("Either payload path or --text-file is required")
         return
 
-    result = analyze_text(text, min_words=args.min_words)
+    result = analyze_text(text, min_words=args.min_words, structure=structure)
 
     output_json = json.dumps(result, indent=2)
 
+    if args.inject:
+        full_payload = payload.to_dict()
+        compression = payload.compression
+        payload.close()
+        full_payload["text_forensics"] = result
+        write_payload(full_payload, args.payload, compression)
+        print(f"Forensics injected into {args.payload}", file=sys.stderr)
+
     if args.output:
         with open(args.output, 'w') as f:
             f.write(output_json)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Token estimation for Themis judge payloads.
+
+Images: dimensions are read from the JPEG/PNG header (no pixel decoding) and
+converted with Claude's pixel-based formula, tokens = width * height / 750,
+after the API's downscaling to a 1568 px long edge and ~1600 tokens.
+
+Text: a BPE-approximating counter. Text is pre-tokenized the way byte-level
+BPE tokenizers split it (words with their leading space, short digit groups,
+punctuation runs, whitespace runs) and each piece is charged by its length.
+TEXT_TOKEN_SCALE multiplies the result; it is uncalibrated (1.0) until
+refit with fit_text_token_scale() / --fit from texts with known token
+counts (e.g. from the count_tokens API).
+
+Both estimators are memoized on a digest of their content, so repeated
+payload fields across judges and batch runs are counted once without the
+cache holding on to the images or texts themselves.
+"""
+
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+
+# Claude vision sizing rules
+IMAGE_PIXELS_PER_TOKEN = 750
+IMAGE_MAX_LONG_EDGE = 1568
+IMAGE_MAX_TOKENS = 1600
+# Used when an image header cannot be parsed
+IMAGE_FALLBACK_TOKENS = IMAGE_MAX_TOKENS
+
+# Base64 characters decoded per attempt when looking for an image header
+HEADER_PROBE_CHARS = 16 * 1024
+
+# Text estimator: pieces in the style of byte-level BPE pre-tokenization
+_PIECE_RE = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)"
+    r"| ?[A-Za-z]+"
+    r"| ?[0-9]{1,3}"
+    r"| ?[^\sA-Za-z0-9]+"
+    r"|\s+"
+)
+# Words up to this length (including the leading space) are usually one token
+WORD_SINGLE_TOKEN_CHARS = 8
+# Longer words and punctuation runs split into pieces of about this size
+WORD_CHARS_PER_TOKEN = 4
+PUNCT_CHARS_PER_TOKEN = 2
+WHITESPACE_CHARS_PER_TOKEN = 4
+# Multiplier on the raw piece count. Not yet calibrated: refit with
+# fit_text_token_scale() (or --fit) from texts with known token counts
+TEXT_TOKEN_SCALE = 1.0
+
+# Entries kept by the content-digest memos
+IMAGE_DIMS_CACHE_SIZE = 4096
+TEXT_TOKENS_CACHE_SIZE = 8192
+
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class _DigestMemo:
+    """LRU memo keyed on a 128-bit content digest rather than the content."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[bytes, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, content: str, compute):
+        key = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = compute(content)
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+
+_image_dims_memo = _DigestMemo(IMAGE_DIMS_CACHE_SIZE)
+_text_tokens_memo = _DigestMemo(TEXT_TOKENS_CACHE_SIZE)
+
+
+def jpeg_dimensions(data: bytes) -> tuple[int, int] | None:
+    """
+    Read (width, height) from a JPEG's SOF segment.
+
+    Walks the marker segments without decoding image data. Returns None if
+    the bytes end before a frame header is found.
+    """
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def image_dimensions(data: bytes) -> tuple[int, int] | None:
+    """Read (width, height) from JPEG or PNG header bytes."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return (int.from_bytes(data[16:20], "big"),
+                int.from_bytes(data[20:24], "big"))
+    return jpeg_dimensions(data)
+
+
+def base64_image_dimensions(b64: str) -> tuple[int, int] | None:
+    """
+    Read image dimensions from base64 data, decoding only as much as needed.
+
+    Decodes a growing prefix (headers with large EXIF blocks need more) and
+    stops as soon as the frame header is found. Memoized per content digest.
+    """
+    return _image_dims_memo.get(b64, _base64_image_dimensions)
+
+
+def _base64_image_dimensions(b64: str) -> tuple[int, int] | None:
+    probe = HEADER_PROBE_CHARS
+    while True:
+        chunk = b64[:probe - probe % 4]
+        try:
+            dims = image_dimensions(base64.b64decode(chunk))
+        except (binascii.Error, ValueError):
+            return None
+        if dims or probe >= len(b64):
+            return dims
+        probe *= 4
+
+
+@lru_cache(maxsize=4096)
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Tokens for an image of the given size after API downscaling."""
+    if width <= 0 or height <= 0:
+        return IMAGE_FALLBACK_TOKENS
+    scale = min(
+        1.0,
+        IMAGE_MAX_LONG_EDGE / max(width, height),
+        math.sqrt(IMAGE_MAX_TOKENS * IMAGE_PIXELS_PER_TOKEN / (width * height)),
+    )
+    w = max(1, int(width * scale))
+    h = max(1, int(height * scale))
+    return min(IMAGE_MAX_TOKENS, math.ceil(w * h / IMAGE_PIXELS_PER_TOKEN))
+
+
+def frame_image_tokens(frame: dict) -> int:
+    """
+    Tokens for one keyframe.
+
+    Uses width/height recorded at preprocessing time when present, otherwise
+    the image header in the base64 data. Frames without image data cost 0.
+    """
+    width, height = frame.get("width"), frame.get("height")
+    if not (width and height):
+        if "base64" not in frame:
+            return 0
+        dims = base64_image_dimensions(frame["base64"])
+        if dims is None:
+            return IMAGE_FALLBACK_TOKENS
+        width, height = dims
+    return estimate_image_tokens(width, height)
+
+
+def _piece_tokens(piece: str) -> int:
+    """Token cost of one pre-tokenized piece."""
+    first = piece[0]
+    if piece.isspace():
+        return math.ceil(len(piece) / WHITESPACE_CHARS_PER_TOKEN)
+    core = piece[1:] if first == " " else piece
+    if core.isalpha():
+        if len(piece) <= WORD_SINGLE_TOKEN_CHARS:
+            return 1
+        return math.ceil(len(piece) / WORD_CHARS_PER_TOKEN)
+    if core.isdigit():
+        return 1
+    return math.ceil(len(piece) / PUNCT_CHARS_PER_TOKEN)
+
+
+def _count_pieces(text: str) -> int:
+    return sum(_piece_tokens(m.group()) for m in _PIECE_RE.finditer(text))
+
+
+def _raw_text_tokens(text: str) -> int:
+    return _text_tokens_memo.get(text, _count_pieces)
+
+
+def estimate_text_tokens(text: str, scale: float | None = None) -> int:
+    """Estimate the token count of a string (memoized on its content)."""
+    if not text:
+        return 0
+    raw = _raw_text_tokens(text)
+    return max(1, round(raw * (TEXT_TOKEN_SCALE if scale is None else scale)))
+
+
+def fit_text_token_scale(samples: list[tuple[str, int]]) -> float:
+    """
+    Fit TEXT_TOKEN_SCALE from (text, actual_tokens) pairs.
+
+    Least-squares scale through the origin, so large samples dominate.
+    """
+    num = den = 0.0
+    for text, actual in samples:
+        raw = _raw_text_tokens(text)
+        num += raw * actual
+        den += raw * raw
+    return num / den if den else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate tokens for text or image files")
+    parser.add_argument("files", nargs="*", help="Text or image files (.jpg, .jpeg, .png)")
+    parser.add_argument("--fit", metavar="SAMPLES",
+                        help='Fit TEXT_TOKEN_SCALE from JSONL lines {"text": ..., "tokens": N} '
+                             "with token counts from the real tokenizer")
+    args = parser.parse_args()
+
+    if args.fit:
+        with open(args.fit) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        samples = [(r["text"], r["tokens"]) for r in rows]
+        scale = fit_text_token_scale(samples)
+        print(f"TEXT_TOKEN_SCALE = {scale:.4f}  (from {len(samples):,} samples)")
+        return 0
+    if not args.files:
+        parser.error("files are required unless --fit is given")
+
+    for path in args.files:
+        with open(path, "rb") as f:
+            data = f.read()
+        dims = image_dimensions(data)
+        if dims:
+            tokens = estimate_image_tokens(*dims)
+            print(f"{path}: {tokens:,} tokens (image {dims[0]}x{dims[1]})")
+        else:
+            text = data.decode("utf-8", errors="replace")
+            print(f"{path}: {estimate_text_tokens(text):,} tokens "
+                  f"({len(text):,} chars)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,18 @@ model pricing tiers.
 """
 
 import json
+import re
 import sys
 from datetime import datetime, timezone
+from pathlib import Path
+
+from format_payload import (
+    estimate_token_sizes,
+    format_all_judges,
+    format_cache_layout,
+    shared_judge_fields,
+)
+from token_estimator import estimate_text_tokens
 
 
 # Model pricing per million tokens (as of 2025)
@@ -125,25 +135,102 @@ CACHE_HIT_RATES = {
 # Cache pricing discount (cached input tokens cost 90% less)
 CACHE_DISCOUNT = 0.10  # cached tokens cost 10% of normal input price
 
+# Cache writes cost more than normal input, depending on the cache TTL
+CACHE_WRITE_MULTIPLIER = {"5m": 1.25, "1h": 2.0}
+CACHE_TTL_SEC = {"5m": 300, "1h": 3600}
+# Shortest prefix each model will cache
+CACHE_MIN_TOKENS = {"haiku": 2048, "sonnet": 1024, "opus": 1024}
+# A cache entry is readable once the writing request has processed its prompt
+CACHE_READY_SEC = 3.0
+
+# Typical wall time per stage kind (seconds), used to time cache expiry
+STAGE_WALL_SEC = {
+    "preprocess": 30,
+    "judge_r1": 75,
+    "judge_r2": 60,
+    "consensus": 45,
+    "cross_council": 40,
+    "critic": 90,
+    "synthesis": 120,
+}
+
+# Input besides the judge payload (instructions, references, earlier
+# outputs) for stages that receive a payload view; sent after the payload
+STAGE_CONTEXT_TOKENS = {
+    "judge_r1": 4000,
+    "judge_r2": 7000,
+    "critic": 13000,
+    "synthesis": 10000,
+}
+
+JUDGE_STAGES = ("hook_analyst", "emotion_analyst", "production_analyst",
+                "authenticity_analyst", "trend_analyst", "subject_analyst",
+                "audience_mapper")
+JUDGE_COUNCILS = {
+    "content": ("hook_analyst", "emotion_analyst", "production_analyst", "authenticity_analyst"),
+    "market": ("trend_analyst", "subject_analyst", "audience_mapper"),
+}
+
+# Stages dispatched together, in pipeline order (see themis-evaluate SKILL.md)
+DISPATCH_ORDER = {
+    "full": [
+        ["preprocess", "text_forensics"],
+        [f"{j}_r1" for j in JUDGE_STAGES],
+        [f"{j}_r2" for j in JUDGE_STAGES],
+        ["content_council_consensus", "market_council_consensus"],
+        ["cross_council_content", "cross_council_market"],
+        ["critic"],
+        ["synthesis"],
+    ],
+    "fast": [
+        ["preprocess", "text_forensics"],
+        [f"{j}_r1" for j in JUDGE_STAGES],
+        ["content_council_consensus", "market_council_consensus"],
+        ["critic"],
+        ["synthesis"],
+    ],
+}
+
+# Judge names as they appear in Task descriptions / subagent types
+JUDGE_KEYWORDS = {
+    "hook": "hook_analyst",
+    "emotion": "emotion_analyst",
+    "production": "production_analyst",
+    "authenticity": "authenticity_analyst",
+    "trend": "trend_analyst",
+    "subject": "subject_analyst",
+    "audience": "audience_mapper",
+}
+ROUND_2_MARKERS = ("round 2", "round2", " r2", "revis")
+# Tool names that dispatch a subagent
+SUBAGENT_TOOLS = ("Task", "Agent")
+# Stage for the orchestrating session's own API calls (it writes the synthesis)
+MAIN_THREAD_STAGE = "synthesis"
+UNATTRIBUTED_STAGE = "unattributed"
+
 
 class TokenTracker:
     """Track token usage across pipeline stages."""
 
-    def __init__(self, mode: str = "full"):
+    def __init__(self, mode: str = "full", cache_ttl: str = "5m"):
         self.mode = mode
+        self.cache_ttl = cache_ttl
         self.stages: dict[str, dict] = {}
         self.models = STAGE_MODELS.get(mode, STAGE_MODELS["full"])
 
     def record(self, stage: str, input_tokens: int, output_tokens: int,
-               cache_hit_tokens: int = 0):
+               cache_hit_tokens: int = 0, wall_sec: float | None = None,
+               model: str | None = None, cache_write_tokens: int = 0):
         """Record actual token usage for a stage."""
-        model = self.models.get(stage, "sonnet")
         self.stages[stage] = {
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
             "cache_hit_tokens": cache_hit_tokens,
-            "model": model,
+            "cache_write_tokens": cache_write_tokens,
+            "model": model or self.models.get(stage, "sonnet"),
         }
+        if wall_sec is not None:
+            self.stages[stage]["wall_sec"] = wall_sec
 
     def estimate_all(self) -> dict:
         """Generate estimates for all stages based on mode defaults."""
@@ -164,53 +251,66 @@ class TokenTracker:
         total_input = 0
         total_output = 0
         total_cache_hits = 0
+        total_cache_writes = 0
         total_cost = 0.0
+        write_multiplier = CACHE_WRITE_MULTIPLIER[self.cache_ttl]
 
         stage_details = {}
         for stage, data in self.stages.items():
             inp = data["input_tokens"]
             out = data["output_tokens"]
             cache = data.get("cache_hit_tokens", 0)
+            writes = data.get("cache_write_tokens", 0)
             model = data["model"]
             if model == "none":
                 # Local script, no API call — zero cost
                 stage_details[stage] = {
-                    "input": 0, "output": 0, "cache_hits": 0,
+                    "input": 0, "output": 0, "cache_hits": 0, "cache_writes": 0,
                     "model": "none", "cost_usd": 0.0,
                 }
                 continue
             pricing = MODEL_PRICING.get(model, MODEL_PRICING["sonnet"])
 
-            # Non-cached input tokens pay full price
-            regular_input = inp - cache
+            # Non-cached input tokens pay full price, cache writes a premium
+            regular_input = inp - cache - writes
             cache_cost = cache * pricing["input"] * CACHE_DISCOUNT / 1_000_000
+            write_cost = writes * pricing["input"] * write_multiplier / 1_000_000
             regular_cost = regular_input * pricing["input"] / 1_000_000
             output_cost = out * pricing["output"] / 1_000_000
-            stage_cost = cache_cost + regular_cost + output_cost
+            stage_cost = cache_cost + write_cost + regular_cost + output_cost
 
             total_input += inp
             total_output += out
             total_cache_hits += cache
+            total_cache_writes += writes
             total_cost += stage_cost
 
             stage_details[stage] = {
                 "input": inp,
                 "output": out,
                 "cache_hits": cache,
+                "cache_writes": writes,
                 "model": model,
                 "cost_usd": round(stage_cost, 4),
             }
+            if "wall_sec" in data:
+                stage_details[stage]["wall_sec"] = data["wall_sec"]
 
         return {
             "total_input_tokens": total_input,
             "total_output_tokens": total_output,
             "total_tokens": total_input + total_output,
             "total_cache_hit_tokens": total_cache_hits,
+            "total_cache_write_tokens": total_cache_writes,
             "estimated_cost_usd": round(total_cost, 2),
             "mode": self.mode,
             "stages": stage_details,
         }
 
+    def _dispatch_position(self, stage: str) -> int:
+        order = [s for wave in DISPATCH_ORDER.get(self.mode, DISPATCH_ORDER["full"]) for s in wave]
+        return order.index(stage) if stage in order else len(order)
+
     def apply_cache_estimates(self):
         """Apply estimated cache hit rates to recorded/estimated stages."""
         cache_rates = CACHE_HIT_RATES.get(self.mode, {})
@@ -219,9 +319,9 @@ class TokenTracker:
         r1_payload_rate = cache_rates.get("round_1_shared_payload", 0)
         r1_judges = [s for s in self.stages if s.endswith("_r1")]
         if r1_judges and r1_payload_rate > 0:
-            # First judge gets no cache, rest get cache hits on shared content
+            # First judge dispatched gets no cache, rest get cache hits on shared content
             # Shared content is roughly 60% of input tokens (payload portion)
-            for i, stage in enumerate(sorted(r1_judges)):
+            for i, stage in enumerate(sorted(r1_judges, key=self._dispatch_position)):
                 if i > 0:  # skip first judge (cache miss)
                     shared = int(self.stages[stage]["input_tokens"] * 0.6)
                     self.stages[stage]["cache_hit_tokens"] = int(shared * r1_payload_rate)
@@ -230,21 +330,359 @@ class TokenTracker:
         r2_rate = cache_rates.get("round_2_shared_context", 0)
         r2_judges = [s for s in self.stages if s.endswith("_r2")]
         if r2_judges and r2_rate > 0:
-            for i, stage in enumerate(sorted(r2_judges)):
+            for i, stage in enumerate(sorted(r2_judges, key=self._dispatch_position)):
                 if i > 0:
                     shared = int(self.stages[stage]["input_tokens"] * 0.5)
                     self.stages[stage]["cache_hit_tokens"] = int(shared * r2_rate)
 
+    def estimate_from_payload(self, payload: dict, budgets: dict[str, int] | None = None,
+                              stagger_sec: float = 0.0) -> dict:
+        """
+        Estimate every stage from an actual payload, including prompt caching.
+
+        Stages that receive a judge view (judges, critic, synthesis) send
+        format_payload's cache layout: the shared prefix, the transcript
+        block shared by judges with the same transcript policy, then their
+        own view and STAGE_CONTEXT_TOKENS. Each of those ends at a cache
+        breakpoint. Other stages use STAGE_TOKEN_ESTIMATES. Caching is then
+        simulated over DISPATCH_ORDER with simulate_prompt_cache(). The model
+        has not been checked against billed usage; run --payload with
+        --ingest to measure its error on a real session.
+        """
+        views = format_all_judges(payload, budgets=budgets)
+        view_tokens = estimate_token_sizes(views)
+        shared = shared_judge_fields(payload, budgets=budgets)
+        layouts = {view: format_cache_layout(payload, view, include_images=False,
+                                             budgets=budgets, shared=shared)
+                   for view in views}
+        prefix_tokens = estimate_text_tokens(next(iter(layouts.values()))["prefix"])
+
+        estimates = STAGE_TOKEN_ESTIMATES.get(self.mode, STAGE_TOKEN_ESTIMATES["full"])
+        prompts = {}
+        for stage, tokens in estimates.items():
+            view = payload_view(stage)
+            model = self.models.get(stage, "sonnet")
+            if view is None:
+                levels = []
+                inp = tokens["input"]
+            else:
+                # Shared prefix, the policy group's transcript, then the view's own part
+                levels = [(("shared",), prefix_tokens)]
+                key = ("shared",)
+                layout = layouts[view]
+                if layout["transcript"]:
+                    key = ("shared", layout["transcript_sha256"])
+                    levels.append((key, estimate_text_tokens(layout["transcript"])))
+                sent = sum(t for _, t in levels)
+                levels.append((key + (view,), max(view_tokens[view] - sent, 0)))
+                inp = max(view_tokens[view], sent) + STAGE_CONTEXT_TOKENS[stage_kind(stage)]
+            self.record(stage, inp, tokens["output"], model=model)
+            prompts[stage] = levels
+
+        cache = simulate_prompt_cache(self.mode, prompts, self.models,
+                                      self.cache_ttl, stagger_sec)
+        for stage, (hits, writes) in cache.items():
+            self.stages[stage]["cache_hit_tokens"] = hits
+            self.stages[stage]["cache_write_tokens"] = writes
+        return self.summary()
+
+
+def stage_kind(stage: str) -> str:
+    """Kind of a pipeline stage, as used by STAGE_WALL_SEC and STAGE_CONTEXT_TOKENS."""
+    if stage.endswith(("_r1", "_r2")):
+        return f"judge{stage[-3:]}"
+    if stage.endswith("_consensus"):
+        return "consensus"
+    if stage.startswith("cross_council"):
+        return "cross_council"
+    if stage == "text_forensics":
+        return "preprocess"
+    return stage
+
+
+def payload_view(stage: str) -> str | None:
+    """Judge view (format_payload judge name) a stage receives, if any."""
+    kind = stage_kind(stage)
+    if kind.startswith("judge"):
+        return stage[:-3]
+    if kind == "critic":
+        return "critic"
+    if kind == "synthesis":
+        return "orchestrator"
+    return None
+
+
+def simulate_prompt_cache(mode: str, prompts: dict[str, list], models: dict[str, str],
+                          cache_ttl: str = "5m", stagger_sec: float = 0.0) -> dict:
+    """
+    Cache-read and cache-write tokens per stage over the real dispatch order.
+
+    ``prompts`` maps each stage to its cacheable prefix levels
+    ``[(key, tokens), ...]``, each ending at a cache breakpoint. Waves of
+    DISPATCH_ORDER start when the previous wave's slowest stage (by
+    STAGE_WALL_SEC) ends; within a wave, request i starts i * stagger_sec
+    after the first. Caches are per model. The longest prefix with a
+    readable entry (written at least CACHE_READY_SEC earlier, not expired)
+    is read and its TTL refreshed; the rest up to the last breakpoint is
+    written. Breakpoints whose prefix is under CACHE_MIN_TOKENS are ignored.
+    Requests sent at the same moment all miss, so an unstaggered parallel
+    dispatch writes once per request.
+    """
+    ttl = CACHE_TTL_SEC[cache_ttl]
+    entries: dict[tuple, list[float]] = {}   # (model, key) -> [ready_at, expires_at]
+    result = {}
+    now = 0.0
+    for wave in DISPATCH_ORDER.get(mode, DISPATCH_ORDER["full"]):
+        wave = [stage for stage in wave if stage in prompts]
+        for i, stage in enumerate(wave):
+            t = now + i * stagger_sec
+            model = models.get(stage, "sonnet")
+            minimum = CACHE_MIN_TOKENS.get(model, 1024)
+            keys, cumulative, total = [], [], 0
+            for key, tokens in prompts[stage]:
+                total += tokens
+                if total >= minimum:  # shorter prefixes are not cached
+                    keys.append((model, key))
+                    cumulative.append(total)
+            readable = [k in entries and entries[k][0] <= t < entries[k][1] for k in keys]
+            # The longest cached prefix is read; the rest up to the last breakpoint is written
+            hit = max((i for i, ok in enumerate(readable) if ok), default=-1)
+            hits = cumulative[hit] if hit >= 0 else 0
+            writes = cumulative[-1] - hits if keys else 0
+            if hit >= 0:
+                entries[keys[hit]][1] = t + ttl
+            for key in keys[hit + 1:]:
+                if key not in entries or entries[key][1] <= t:
+                    entries[key] = [t + CACHE_READY_SEC, t + CACHE_READY_SEC + ttl]
+            result[stage] = (hits, writes)
+        if wave:
+            now += (len(wave) - 1) * stagger_sec + max(
+                STAGE_WALL_SEC.get(stage_kind(stage), 60) for stage in wave)
+    return result
 
-def estimate_pipeline_cost(mode: str = "full", apply_caching: bool = True) -> dict:
-    """Estimate total pipeline cost for a given mode."""
-    tracker = TokenTracker(mode)
+
+def model_family(model: str | None) -> str:
+    """Pricing family ("haiku", "sonnet", "opus") of an API model name."""
+    name = (model or "").lower()
+    for family in MODEL_PRICING:
+        if family in name:
+            return family
+    return "sonnet"
+
+
+def stage_for_task(text: str, seen: set[str], mode: str = "full") -> str:
+    """
+    Map a subagent call ("<subagent type> <description>") to a pipeline stage.
+
+    Council-level stages (cross-council, consensus) are matched before
+    judge names, since their descriptions mention the judges. "critic" must
+    be a whole word ("critical" is not the critic). A judge call without a
+    round marker counts as Round 2 once its Round 1 stage has been seen
+    (full mode).
+    """
+    text = " " + text.lower().replace("_", " ").replace("-", " ")
+    # The dispatched council is the first one named (subagent type comes first)
+    positions = {c: text.find(f"{c} council") for c in ("content", "market")}
+    named = [c for c in positions if positions[c] >= 0]
+    council = min(named, key=positions.get) if named else None
+    if "cross council" in text and council:
+        return f"cross_council_{council}"
+    if council and "consensus" in text:
+        return f"{council}_council_consensus"
+    if re.search(r"\bcritic\b", text):
+        return "critic"
+    if "synthes" in text or "orchestrat" in text:
+        return "synthesis"
+    if "preprocess" in text:
+        return "preprocess"
+    for keyword, judge in JUDGE_KEYWORDS.items():
+        if keyword in text:
+            explicit_r2 = any(marker in text for marker in ROUND_2_MARKERS)
+            if mode == "full" and (explicit_r2 or f"{judge}_r1" in seen):
+                return f"{judge}_r2"
+            return f"{judge}_r1"
+    if council:
+        return f"{council}_council_consensus"
+    return UNATTRIBUTED_STAGE
+
+
+def _usage_tokens(usage: dict) -> tuple[int, int, int, int]:
+    """(input incl. cache reads and writes, output, cache reads, cache writes) of an API usage object."""
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    input_tokens = (usage.get("input_tokens") or 0) + cache_read + cache_write
+    return input_tokens, usage.get("output_tokens") or 0, cache_read, cache_write
+
+
+def _timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def session_log_paths(path: str) -> list[Path]:
+    """A session transcript plus the subagent transcripts stored beside it."""
+    path = Path(path)
+    return [path] + sorted(path.with_suffix("").glob("subagents/*.jsonl"))
+
+
+def ingest_usage(paths: list[str], mode: str = "full", cache_ttl: str = "5m") -> TokenTracker:
+    """
+    Build a TokenTracker from recorded usage instead of estimates.
+
+    Reads Claude Code session transcripts (JSONL) or API usage records,
+    priced with ``cache_ttl`` cache writes. In
+    transcripts, every subagent (Task) call is mapped to a stage with
+    stage_for_task(); its tokens are the subagent's own API calls (from the
+    subagent transcript when available, else the usage reported with the
+    tool result) and its wall time is the call's duration. The session's own
+    calls are recorded as MAIN_THREAD_STAGE. Usage records are lines with a
+    ``usage`` object and a ``stage`` (top level or under ``metadata``),
+    optionally ``model`` and ``duration_ms``.
+    """
+    messages: dict[str, tuple] = {}   # message id -> (agent, model, usage)
+    calls: dict[str, dict] = {}       # tool_use id -> call
+    results: dict[str, dict] = {}     # tool_use id -> result
+    records: list[tuple] = []         # (stage, model, usage, wall_sec)
+
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                stage = entry.get("stage") or (entry.get("metadata") or {}).get("stage")
+                if stage and "usage" in entry:
+                    duration = entry.get("duration_ms")
+                    records.append((stage, entry.get("model"), entry["usage"],
+                                    duration / 1000 if duration is not None else None))
+                    continue
+                message = entry.get("message")
+                if not isinstance(message, dict):
+                    continue
+                agent = entry.get("agentId") if entry.get("isSidechain") else None
+                content = message.get("content")
+                blocks = content if isinstance(content, list) else []
+                if entry.get("type") == "assistant":
+                    if message.get("usage"):
+                        # Transcripts repeat a message once per content block
+                        key = message.get("id") or entry.get("uuid")
+                        messages[key] = (agent, message.get("model"), message["usage"])
+                    for block in blocks:
+                        if block.get("type") == "tool_use" and block.get("name") in SUBAGENT_TOOLS:
+                            args = block.get("input") or {}
+                            calls[block["id"]] = {
+                                "text": f"{args.get('subagent_type', '')} {args.get('description', '')}",
+                                "start": _timestamp(entry.get("timestamp")),
+                            }
+                elif entry.get("type") == "user" and isinstance(entry.get("toolUseResult"), dict):
+                    for block in blocks:
+                        if block.get("type") == "tool_result":
+                            results[block.get("tool_use_id")] = {
+                                **entry["toolUseResult"],
+                                "end": _timestamp(entry.get("timestamp")),
+                            }
+
+    agent_usage: dict[str | None, list[tuple]] = {}
+    for agent, model, usage in messages.values():
+        agent_usage.setdefault(agent, []).append((model, usage))
+
+    seen: set[str] = set()
+    ordered = sorted(calls.items(), key=lambda item: item[1]["start"] or datetime.min.replace(tzinfo=timezone.utc))
+    for call_id, call in ordered:
+        stage = stage_for_task(call["text"], seen, mode)
+        seen.add(stage)
+        result = results.get(call_id, {})
+        wall_sec = None
+        if result.get("totalDurationMs") is not None:
+            wall_sec = result["totalDurationMs"] / 1000
+        elif call["start"] and result.get("end"):
+            wall_sec = (result["end"] - call["start"]).total_seconds()
+        agent_id = result.get("agentId")
+        if agent_id in agent_usage:
+            for i, (model, usage) in enumerate(agent_usage.pop(agent_id)):
+                records.append((stage, model, usage, wall_sec if i == 0 else None))
+        elif result.get("usage"):
+            records.append((stage, None, result["usage"], wall_sec))
+        elif wall_sec is not None:
+            records.append((stage, None, {}, wall_sec))
+    for model, usage in agent_usage.pop(None, []):
+        records.append((MAIN_THREAD_STAGE, model, usage, None))
+    # Subagents whose Task call was not in the logs
+    for entries in agent_usage.values():
+        records.extend((UNATTRIBUTED_STAGE, model, usage, None) for model, usage in entries)
+
+    tracker = TokenTracker(mode, cache_ttl)
+    totals: dict[str, list] = {}
+    for stage, model, usage, wall_sec in records:
+        inp, out, cache, writes = _usage_tokens(usage)
+        total = totals.setdefault(stage, [0, 0, 0, 0, None, None])
+        total[0] += inp
+        total[1] += out
+        total[2] += cache
+        total[3] += writes
+        if wall_sec is not None:
+            total[4] = (total[4] or 0.0) + wall_sec
+        if model and total[5] is None:
+            total[5] = model_family(model)
+    for stage, (inp, out, cache, writes, wall_sec, model) in totals.items():
+        tracker.record(stage, inp, out, cache,
+                       round(wall_sec, 3) if wall_sec is not None else None, model, writes)
+    return tracker
+
+
+def estimate_pipeline_cost(mode: str = "full", apply_caching: bool = True,
+                           payload: dict | None = None,
+                           budgets: dict[str, int] | None = None,
+                           cache_ttl: str = "5m", stagger_sec: float = 0.0) -> dict:
+    """
+    Estimate total pipeline cost for a given mode.
+
+    With a payload, stage inputs and caching are modeled from it
+    (TokenTracker.estimate_from_payload); otherwise the fixed
+    STAGE_TOKEN_ESTIMATES and CACHE_HIT_RATES are used.
+    """
+    tracker = TokenTracker(mode, cache_ttl)
+    if payload is not None:
+        summary = tracker.estimate_from_payload(payload, budgets, stagger_sec)
+        if not apply_caching:
+            for data in tracker.stages.values():
+                data["cache_hit_tokens"] = data["cache_write_tokens"] = 0
+            summary = tracker.summary()
+        return summary
     tracker.estimate_all()
     if apply_caching:
         tracker.apply_cache_estimates()
     return tracker.summary()
 
 
+def compare_usage(estimate: dict, actual: dict) -> dict:
+    """Per-stage and total cost of an estimate against recorded usage."""
+    stages = {}
+    for stage in sorted(set(estimate["stages"]) | set(actual["stages"])):
+        est = estimate["stages"].get(stage, {})
+        act = actual["stages"].get(stage, {})
+        stages[stage] = {
+            "estimated_usd": est.get("cost_usd", 0.0),
+            "actual_usd": act.get("cost_usd", 0.0),
+            "estimated_cache_hits": est.get("cache_hits", 0),
+            "actual_cache_hits": act.get("cache_hits", 0),
+            "estimated_cache_writes": est.get("cache_writes", 0),
+            "actual_cache_writes": act.get("cache_writes", 0),
+        }
+    est_total = estimate["estimated_cost_usd"]
+    act_total = actual["estimated_cost_usd"]
+    return {
+        "estimated_cost_usd": est_total,
+        "actual_cost_usd": act_total,
+        "error_pct": round((est_total - act_total) / act_total * 100, 1) if act_total else None,
+        "stages": stages,
+    }
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Estimate Themis pipeline token usage and cost")
@@ -254,30 +692,72 @@ def main():
                         help="Disable prompt caching estimates")
     parser.add_argument("--compare", action="store_true",
                         help="Show side-by-side comparison of full vs fast mode")
+    parser.add_argument("--ingest", nargs="+", metavar="LOG",
+                        help="Report actual usage from session transcripts or usage records (JSONL)")
+    parser.add_argument("--payload",
+                        help="Model stage inputs and prompt caching from this payload "
+                             "(with --ingest: compare the estimate against actual usage)")
+    parser.add_argument("--budget", action="store_true",
+                        help="With --payload: judges get budget-mode views (format_payload --budget)")
+    parser.add_argument("--cache-ttl", default="5m", choices=list(CACHE_TTL_SEC),
+                        help="Prompt cache TTL, which sets cache-write pricing (default: 5m)")
+    parser.add_argument("--stagger", type=float, default=0.0, metavar="SEC",
+                        help="With --payload: delay between parallel dispatches within a wave "
+                             "(0 = all at once, so every parallel request writes the cache)")
     args = parser.parse_args()
 
-    if args.compare:
+    try:
+        payload = None
+        budgets = None
+        if args.payload:
+            from format_payload import JUDGE_TOKEN_BUDGETS
+            from payload_io import open_payload
+            payload = open_payload(args.payload)
+            budgets = dict(JUDGE_TOKEN_BUDGETS) if args.budget else None
+        actual = None
+        if args.ingest:
+            paths = [p for log in args.ingest for p in session_log_paths(log)]
+            actual = ingest_usage(paths, args.mode, args.cache_ttl).summary()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    def estimate(mode):
+        return estimate_pipeline_cost(mode, apply_caching=not args.no_cache, payload=payload,
+                                      budgets=budgets, cache_ttl=args.cache_ttl,
+                                      stagger_sec=args.stagger)
+
+    if actual is not None:
+        if UNATTRIBUTED_STAGE in actual["stages"]:
+            print(f"  Warning: {actual['stages'][UNATTRIBUTED_STAGE]['input']:,} input tokens "
+                  f"could not be mapped to a stage", file=sys.stderr)
+        if payload is not None:
+            print(json.dumps(compare_usage(estimate(args.mode), actual), indent=2))
+        else:
+            print(json.dumps(actual, indent=2))
+    elif args.compare:
         print("Themis Pipeline Cost Comparison")
         print("=" * 60)
         for mode in ["full", "fast"]:
-            summary = estimate_pipeline_cost(mode, apply_caching=not args.no_cache)
+            summary = estimate(mode)
             print(f"\n{mode.upper()} MODE:")
             print(f"  Total tokens:      {summary['total_tokens']:>10,}")
             print(f"  Input tokens:      {summary['total_input_tokens']:>10,}")
             print(f"  Output tokens:     {summary['total_output_tokens']:>10,}")
             if not args.no_cache:
                 print(f"  Cache hit tokens:  {summary['total_cache_hit_tokens']:>10,}")
+                if summary["total_cache_write_tokens"]:
+                    print(f"  Cache write tokens:{summary['total_cache_write_tokens']:>10,}")
             print(f"  Estimated cost:    ${summary['estimated_cost_usd']:>9.2f}")
         print()
 
-        full = estimate_pipeline_cost("full", apply_caching=not args.no_cache)
-        fast = estimate_pipeline_cost("fast", apply_caching=not args.no_cache)
+        full = estimate("full")
+        fast = estimate("fast")
         if full["estimated_cost_usd"] > 0:
             savings = (1 - fast["estimated_cost_usd"] / full["estimated_cost_usd"]) * 100
             print(f"Fast mode saves ~{savings:.0f}% vs full mode")
     else:
-        summary = estimate_pipeline_cost(args.mode, apply_caching=not args.no_cache)
-        print(json.dumps(summary, indent=2))
+        print(json.dumps(estimate(args.mode), indent=2))
 
 
 if __name__ == "__main__":
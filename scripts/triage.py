@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Triage gate: route a submission to skip, fast or full before any judge runs.
+
+Uses cheap payload features (duration, word count, keyframe count, audio,
+speech density) and the text_forensics AI probability. The forensics
+result already injected into the payload is reused, and otherwise only the
+first TRIAGE_FORENSICS_MAX_WORDS words are analyzed, so a decision takes
+milliseconds. Routing is by ordered rules (TRIAGE_RULES, or a JSON file
+of the same shape), or by a small softmax-regression model trained
+locally from labelled feature rows with --train.
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from payload_io import open_payload
+from text_forensics import DEFAULT_MIN_WORDS, analyze_text, extract_text_from_payload
+
+
+ROUTES = ("skip", "fast", "full")
+TRIAGE_FORENSICS_MAX_WORDS = 1500
+
+FEATURES = ("is_text", "duration_sec", "word_count", "keyframe_count", "has_audio",
+            "words_per_min", "ai_probability")
+
+# First matching rule wins; every condition in "when" must hold.
+# Conditions are [operator, value] on a feature (None features never match).
+TRIAGE_RULES = [
+    {"route": "skip", "reason": "nothing to evaluate",
+     "when": {"word_count": ["==", 0], "keyframe_count": ["==", 0]}},
+    {"route": "skip", "reason": "video shorter than 2 seconds",
+     "when": {"is_text": ["==", 0], "duration_sec": ["<", 2]}},
+    {"route": "skip", "reason": f"text under {DEFAULT_MIN_WORDS} words",
+     "when": {"is_text": ["==", 1], "word_count": ["<", DEFAULT_MIN_WORDS]}},
+    {"route": "fast", "reason": "silent video with few keyframes",
+     "when": {"is_text": ["==", 0], "has_audio": ["==", 0], "keyframe_count": ["<=", 3]}},
+    {"route": "fast", "reason": "video shorter than 10 seconds",
+     "when": {"is_text": ["==", 0], "duration_sec": ["<", 10]}},
+    {"route": "fast", "reason": "short text",
+     "when": {"is_text": ["==", 1], "word_count": ["<", 300]}},
+    {"route": "fast", "reason": "forensics strongly indicate AI-generated text",
+     "when": {"ai_probability": [">=", 0.85]}},
+]
+DEFAULT_ROUTE = "full"
+
+_OPERATORS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
+
+
+def triage_features(payload) -> dict:
+    """Cheap routing features of a payload (a dict or lazy PayloadReader)."""
+    content_type = payload.get("content_type", "video")
+    metadata = payload.get("metadata", {})
+    text = extract_text_from_payload(payload)
+    word_count = metadata.get("word_count") if content_type == "text" else None
+    if word_count is None:
+        word_count = len(text.split())
+    duration = metadata.get("duration_sec")
+
+    forensics = payload.get("text_forensics")
+    if forensics is None and word_count >= DEFAULT_MIN_WORDS:
+        words = text.split()
+        if len(words) > TRIAGE_FORENSICS_MAX_WORDS:
+            text = " ".join(words[:TRIAGE_FORENSICS_MAX_WORDS])
+        forensics = analyze_text(text)
+
+    return {
+        "is_text": int(content_type == "text"),
+        "duration_sec": duration,
+        "word_count": word_count,
+        "keyframe_count": payload.get("keyframe_count", 0) or 0,
+        "has_audio": int(metadata.get("has_audio", word_count > 0)),
+        "words_per_min": round(word_count / duration * 60, 1) if duration else None,
+        "ai_probability": (forensics or {}).get("composite_ai_probability"),
+    }
+
+
+def _matches(rule: dict, features: dict) -> bool:
+    for name, (op, value) in rule["when"].items():
+        actual = features.get(name)
+        if actual is None or not _OPERATORS[op](actual, value):
+            return False
+    return True
+
+
+def route_by_rules(features: dict, rules: list[dict] = TRIAGE_RULES) -> dict:
+    """Route with the first matching rule (DEFAULT_ROUTE if none match)."""
+    for rule in rules:
+        if _matches(rule, features):
+            return {"route": rule["route"], "reason": rule.get("reason", "rule match")}
+    return {"route": DEFAULT_ROUTE, "reason": "no triage rule matched"}
+
+
+def _vector(features: dict, model: dict) -> list[float]:
+    """Standardized feature vector (missing features at the training mean) plus bias."""
+    return [
+        ((features.get(name) if features.get(name) is not None else mean) - mean) / std
+        for name, mean, std in zip(model["features"], model["mean"], model["std"])
+    ] + [1.0]
+
+
+def _softmax(logits: list[float]) -> list[float]:
+    top = max(logits)
+    exps = [math.exp(v - top) for v in logits]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def train_model(rows: list[dict], epochs: int = 300, rate: float = 0.5,
+                l2: float = 1e-3, seed: int = 0) -> dict:
+    """
+    Fit a softmax regression on rows of {"features": {...}, "route": ...}.
+
+    Features are standardized with the training mean/std; full-batch
+    gradient descent keeps it deterministic.
+    """
+    if not rows:
+        raise ValueError("No training rows")
+    columns = [[r["features"].get(name) for r in rows] for name in FEATURES]
+    mean, std = [], []
+    for col in columns:
+        present = [v for v in col if v is not None]
+        m = sum(present) / len(present) if present else 0.0
+        var = sum((v - m) ** 2 for v in present) / len(present) if present else 0.0
+        mean.append(m)
+        std.append(math.sqrt(var) or 1.0)
+    model = {"features": list(FEATURES), "mean": mean, "std": std, "routes": list(ROUTES)}
+
+    xs = [_vector(r["features"], model) for r in rows]
+    ys = [ROUTES.index(r["route"]) for r in rows]
+    rng = random.Random(seed)
+    weights = [[rng.gauss(0, 0.01) for _ in xs[0]] for _ in ROUTES]
+    n = len(xs)
+    for _ in range(epochs):
+        grads = [[0.0] * len(xs[0]) for _ in ROUTES]
+        for x, y in zip(xs, ys):
+            probs = _softmax([sum(w * v for w, v in zip(ws, x)) for ws in weights])
+            for k, p in enumerate(probs):
+                err = p - (k == y)
+                for j, v in enumerate(x):
+                    grads[k][j] += err * v
+        for k in range(len(ROUTES)):
+            for j in range(len(xs[0])):
+                weights[k][j] -= rate * (grads[k][j] / n + l2 * weights[k][j])
+    model["weights"] = weights
+
+    correct = sum(route_by_model(r["features"], model)["route"] == r["route"] for r in rows)
+    model["training_accuracy"] = round(correct / n, 4)
+    model["training_rows"] = n
+    return model
+
+
+def route_by_model(features: dict, model: dict) -> dict:
+    """Route with a trained model; includes per-route probabilities."""
+    x = _vector(features, model)
+    probs = _softmax([sum(w * v for w, v in zip(ws, x)) for ws in model["weights"]])
+    best = max(range(len(probs)), key=probs.__getitem__)
+    return {
+        "route": model["routes"][best],
+        "reason": "model",
+        "probabilities": {r: round(p, 4) for r, p in zip(model["routes"], probs)},
+    }
+
+
+def triage(payload, rules: list[dict] | None = None, model: dict | None = None) -> dict:
+    """Features and routing decision for one payload."""
+    start = time.perf_counter()
+    features = triage_features(payload)
+    decision = route_by_model(features, model) if model else route_by_rules(
+        features, rules if rules is not None else TRIAGE_RULES)
+    decision["features"] = features
+    decision["triage_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return decision
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route submissions to skip, fast or full evaluation")
+    parser.add_argument("payloads", nargs="*", help="Preprocessed payloads (.json or .themis)")
+    parser.add_argument("--rules", help="JSON file of routing rules (same shape as TRIAGE_RULES)")
+    parser.add_argument("--model", help="Trained model JSON (from --train) instead of rules")
+    parser.add_argument("--train", metavar="ROWS",
+                        help='Train a model from JSONL rows {"features": {...}, "route": ...} '
+                             '(or {"payload": path, "route": ...}) and write it to -o')
+    parser.add_argument("-o", "--output", help="Output file (model with --train)")
+    args = parser.parse_args()
+
+    try:
+        if args.train:
+            rows = []
+            with open(args.train) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    if "features" not in row:
+                        row["features"] = triage_features(open_payload(row["payload"]))
+                    if row["route"] not in ROUTES:
+                        raise ValueError(f"Unknown route: {row['route']}")
+                    rows.append(row)
+            model = train_model(rows)
+            print(f"  Trained on {model['training_rows']:,} rows, "
+                  f"training accuracy {model['training_accuracy']:.1%}", file=sys.stderr)
+            if not args.output:
+                raise ValueError("--train needs -o for the model file")
+            with open(args.output, "w") as f:
+                json.dump(model, f, indent=2)
+            return
+
+        if not args.payloads:
+            parser.error("payloads are required unless --train is given")
+        rules = model = None
+        if args.rules:
+            with open(args.rules) as f:
+                rules = json.load(f)
+        if args.model:
+            with open(args.model) as f:
+                model = json.load(f)
+        decisions = []
+        for path in args.payloads:
+            decision = triage(open_payload(path), rules, model)
+            decision["payload"] = path
+            print(f"  {path}: {decision['route']} ({decision['reason']}, "
+                  f"{decision['triage_ms']:.1f} ms)", file=sys.stderr)
+            decisions.append(decision)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    result = decisions[0] if len(decisions) == 1 else decisions
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+What-if sweeps of virality weights and adjustment caps over an archive.
+
+Built on batch_rescore: the adjusted component matrix is computed once per
+cap setting, identical rows are merged with a count, and every candidate
+weight vector is then a matrix-vector product done as one pass per column.
+Every statistic derives from the joint (current score, new score)
+histogram, which has at most 101 x 101 cells. Pure Python does a few
+hundred configurations per second per 5,000 distinct rows, so use
+--sample on large archives. For each configuration
+the sweep reports the tier distribution and its shift against the current
+merge_scores settings, the Spearman rank correlation with current scores,
+and the mean score change. A per-component sensitivity table shows what
+nudging each weight does.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import operator
+import random
+import sys
+import time
+from collections import Counter
+
+from batch_rescore import (
+    COMPONENTS,
+    TIERS,
+    adjusted_components,
+    load_archive,
+    scoring_config,
+    tier_lookup,
+    weighted_scores,
+)
+
+
+DEFAULT_GRID_STEP = 0.05
+DEFAULT_SENSITIVITY_STEP = 0.05
+
+
+def component_rows(cols, config: dict, baseline: list[int],
+                   sample: list[int] | None = None) -> dict:
+    """
+    Adjusted component matrix for ``config``, with identical rows merged.
+
+    Rows are grouped by (components, baseline score). Returns the component
+    columns of the distinct rows, their baseline keys (score * 101, for the
+    joint histogram) and their counts.
+    """
+    components = adjusted_components(cols, config)
+    columns = [components[dim] for dim in COMPONENTS]
+    groups: dict[tuple, int] = {}
+    indices = sample if sample is not None else range(len(cols))
+    for i in indices:
+        key = (tuple(col[i] for col in columns), baseline[i])
+        groups[key] = groups.get(key, 0) + 1
+    rows = list(groups)
+    return {
+        "columns": [list(col) for col in zip(*(row for row, _ in rows))] if rows else [],
+        "base_keys": [b * 101 for _, b in rows],
+        "counts": list(groups.values()),
+        "unweighted": all(c == 1 for c in groups.values()),
+    }
+
+
+def weight_vector(weights: dict) -> tuple[float, ...]:
+    """Weights as a tuple in COMPONENTS order (missing components weigh 0)."""
+    return tuple(float(weights.get(dim, 0.0)) for dim in COMPONENTS)
+
+
+def simplex_grid(step: float, total: float = 1.0):
+    """All weight vectors with components on a ``step`` grid summing to ``total``."""
+    units = round(total / step)
+    for cuts in itertools.combinations(range(units + len(COMPONENTS) - 1), len(COMPONENTS) - 1):
+        parts = []
+        prev = -1
+        for cut in cuts + (units + len(COMPONENTS) - 1,):
+            parts.append(cut - prev - 1)
+            prev = cut
+        yield tuple(round(p * step, 10) for p in parts)
+
+
+def random_weights(count: int, seed: int = 0):
+    """Uniform samples from the weight simplex (Dirichlet(1, ..., 1))."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        draws = [rng.expovariate(1.0) for _ in COMPONENTS]
+        total = sum(draws)
+        yield tuple(round(d / total, 4) for d in draws)
+
+
+def _rank_table(hist: list[int]) -> list[float]:
+    """Average rank of each integer score given its histogram (ties share ranks)."""
+    ranks = []
+    below = 0
+    for n in hist:
+        ranks.append(below + (n + 1) / 2)
+        below += n
+    return ranks
+
+
+def score_matrix(matrix: dict, weights: tuple[float, ...]) -> list[int]:
+    """Virality score of every distinct row (one pass per column)."""
+    total = None
+    for col, weight in zip(matrix["columns"], weights):
+        if not weight:
+            continue
+        products = map(operator.mul, col, itertools.repeat(weight))
+        total = list(products) if total is None else list(map(operator.add, total, products))
+    if total is None:
+        return [0] * len(matrix["counts"])
+    scores = map(max, map(round, total), itertools.repeat(0))
+    return list(map(min, scores, itertools.repeat(100)))
+
+
+def joint_histogram(matrix: dict, scores: list[int]) -> dict[int, int]:
+    """Counts of (baseline score, new score) pairs, keyed baseline * 101 + new."""
+    keys = map(operator.add, matrix["base_keys"], scores)
+    if matrix["unweighted"]:
+        return Counter(keys)
+    hist: dict[int, int] = {}
+    for key, count in zip(keys, matrix["counts"]):
+        hist[key] = hist.get(key, 0) + count
+    return hist
+
+
+def histogram_stats(joint: dict[int, int], table: list[int]) -> dict:
+    """Tier distribution, tier shift, Spearman and mean change from a joint histogram."""
+    total = sum(joint.values())
+    hist_b = [0] * 101
+    hist_n = [0] * 101
+    tiers = [0] * len(TIERS)
+    shifted = abs_delta = 0
+    for key, count in joint.items():
+        b, s = divmod(key, 101)
+        hist_b[b] += count
+        hist_n[s] += count
+        tiers[table[s]] += count
+        if table[b] != table[s]:
+            shifted += count
+        abs_delta += count * abs(s - b)
+
+    rank_b = _rank_table(hist_b)
+    rank_n = _rank_table(hist_n)
+    mean = (total + 1) / 2
+    cov = var_b = var_n = 0.0
+    for key, count in joint.items():
+        b, s = divmod(key, 101)
+        db = rank_b[b] - mean
+        dn = rank_n[s] - mean
+        cov += count * db * dn
+        var_b += count * db * db
+        var_n += count * dn * dn
+    rho = cov / math.sqrt(var_b * var_n) if var_b and var_n else None
+    return {
+        "tier_distribution": dict(zip(TIERS, tiers)),
+        "tier_shift": round(shifted / total, 4) if total else 0.0,
+        "spearman": round(rho, 4) if rho is not None else None,
+        "mean_abs_delta": round(abs_delta / total, 3) if total else 0.0,
+    }
+
+
+def evaluate(matrix: dict, weights: tuple[float, ...], table: list[int]) -> dict:
+    """Tier distribution and shift against the baseline for one weight vector."""
+    return histogram_stats(joint_histogram(matrix, score_matrix(matrix, weights)), table)
+
+
+def sensitivity(matrix: dict, weights: tuple[float, ...], table: list[int],
+                step: float) -> dict:
+    """
+    Effect of raising each component's weight by ``step``.
+
+    The other weights are scaled down so the total stays the same.
+    """
+    total = sum(weights)
+    report = {}
+    for d, dim in enumerate(COMPONENTS):
+        bumped = list(weights)
+        bumped[d] += step
+        scale = total / sum(bumped)
+        bumped = tuple(w * scale for w in bumped)
+        result = evaluate(matrix, bumped, table)
+        report[dim] = {
+            "tier_shift": result["tier_shift"],
+            "spearman": result["spearman"],
+            "mean_abs_delta": result["mean_abs_delta"],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep virality weights and adjustment caps")
+    parser.add_argument("archive", nargs="+",
+                        help="Archive JSONL file(s), or a columns file from batch_rescore.py")
+    parser.add_argument("--grid", type=float, nargs="?", const=DEFAULT_GRID_STEP,
+                        help=f"Sweep every weight vector on a simplex grid "
+                             f"(step, default {DEFAULT_GRID_STEP})")
+    parser.add_argument("--random", type=int, default=0,
+                        help="Sweep this many random weight vectors")
+    parser.add_argument("--candidate", action="append", default=[],
+                        help="Extra weight vector to evaluate, as JSON {component: weight}")
+    parser.add_argument("--cross-caps", type=int, nargs="+",
+                        help="Cross-council adjustment caps to sweep")
+    parser.add_argument("--critic-caps", type=int, nargs="+",
+                        help="Critic adjustment caps to sweep")
+    parser.add_argument("--sample", type=int,
+                        help="Evaluate a random sample of this many evaluations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sensitivity-step", type=float, default=DEFAULT_SENSITIVITY_STEP,
+                        help=f"Weight bump for the sensitivity table "
+                             f"(default {DEFAULT_SENSITIVITY_STEP})")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Configurations to list by largest tier shift (default 10)")
+    parser.add_argument("-o", "--output", help="Write every configuration's result as JSONL")
+    args = parser.parse_args()
+
+    try:
+        current = scoring_config()
+        cols = load_archive(args.archive)
+        if not len(cols):
+            raise ValueError("Archive has no evaluations")
+        print(f"  Loaded {len(cols):,} evaluations", file=sys.stderr)
+
+        baseline = weighted_scores(adjusted_components(cols, current), current["component_weights"])
+        table = tier_lookup(current["tier_thresholds"])
+        sample = None
+        if args.sample and args.sample < len(cols):
+            sample = sorted(random.Random(args.seed).sample(range(len(cols)), args.sample))
+
+        current_weights = weight_vector(current["component_weights"])
+        candidates = [weight_vector(json.loads(c)) for c in args.candidate]
+
+        # Current settings: baseline, explicit candidates and sensitivity
+        matrix = component_rows(cols, current, baseline, sample)
+        baseline_result = evaluate(matrix, current_weights, table)
+        candidate_results = []
+        for weights in candidates:
+            result = evaluate(matrix, weights, table)
+            result["weights"] = dict(zip(COMPONENTS, weights))
+            candidate_results.append(result)
+        sens = sensitivity(matrix, current_weights, table, args.sensitivity_step)
+
+        vectors = [current_weights] + candidates
+        if args.grid:
+            vectors += list(simplex_grid(args.grid))
+        vectors += list(random_weights(args.random, args.seed))
+
+        cap_settings = list(itertools.product(
+            args.cross_caps or [current["max_cross_council_adjustment"]],
+            args.critic_caps or [current["max_critic_adjustment"]],
+        ))
+
+        results = []
+        start = time.perf_counter()
+        for cross_cap, critic_cap in cap_settings:
+            config = dict(current, max_cross_council_adjustment=cross_cap,
+                          max_critic_adjustment=critic_cap)
+            matrix = component_rows(cols, config, baseline, sample)
+            for weights in vectors:
+                result = evaluate(matrix, weights, table)
+                result["weights"] = dict(zip(COMPONENTS, weights))
+                result["max_cross_council_adjustment"] = cross_cap
+                result["max_critic_adjustment"] = critic_cap
+                results.append(result)
+        sweep_sec = time.perf_counter() - start
+
+        if args.output:
+            with open(args.output, "w") as f:
+                for result in results:
+                    f.write(json.dumps(result))
+                    f.write("\n")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    rows = len(matrix["counts"])
+    print(f"  Evaluated {len(results):,} configurations over ~{rows:,} distinct rows "
+          f"in {sweep_sec:.2f}s ({len(results) / max(sweep_sec, 1e-9):,.0f}/s)", file=sys.stderr)
+    summary = {
+        "evaluations": len(sample) if sample is not None else len(cols),
+        "distinct_rows": rows,
+        "configurations": len(results),
+        "sweep_sec": round(sweep_sec, 3),
+        "baseline": baseline_result,
+        "candidates": candidate_results,
+        "largest_tier_shift": sorted(results, key=lambda r: -r["tier_shift"])[:args.top],
+        "sensitivity": sens,
+    }
+    if args.output:
+        summary["output"] = args.output
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()